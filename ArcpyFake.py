@@ -0,0 +1,1257 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: ArcpyFake.py
+# In-memory stand-in for the parts of arcpy and arcpy.da used by EBARUtils, so that engines can be tested and
+# benchmarked on machines without ArcGIS Pro
+
+# Notes:
+# - Call install() before importing EBARUtils (or any tool), then create tables with createTable, loadCSV or
+#   loadJSON using the same paths the code will use (e.g. 'C:/GIS/EBAR/EBAR.gdb/InputPoint')
+# - Cursors support where clauses (comparison, AND/OR/NOT, IN/NOT IN lists and simple subqueries, IS [NOT] NULL,
+#   [NOT] LIKE, BETWEEN, LOWER/UPPER, date/timestamp literals), sql_clause DISTINCT/TOP and ORDER BY, and the
+#   OID@, SHAPE@, SHAPE@XY, SHAPE@X and SHAPE@Y tokens
+# - Geometry is stored as given; points are (x, y) tuples, anything else is passed through unchanged
+# - Geoprocessing tools and classes not implemented here are absent, so using them raises AttributeError
+
+
+import sys
+import types
+import re
+import csv
+import json
+import copy
+import datetime
+
+
+# registered tables and layers/views
+tables = {}
+layers = {}
+domains = {}
+
+
+class ExecuteError(Exception):
+    """Raised by fake geoprocessing calls, like arcpy.ExecuteError"""
+    pass
+
+
+class Env(object):
+    """Fake arcpy.env"""
+    def __init__(self):
+        self.workspace = None
+        self.scratchWorkspace = None
+        self.scratchGDB = 'memory'
+        self.overwriteOutput = False
+        self.outputCoordinateSystem = None
+        self.parallelProcessingFactor = None
+
+
+env = Env()
+
+
+def _key(path):
+    """normalized registry key for a table or layer path"""
+    return str(path).replace('\\', '/').rstrip('/').lower()
+
+
+def _baseName(name):
+    """table name without workspace path or database/owner prefix (e.g. ebarkba.sde.InputPoint -> InputPoint)"""
+    return str(name).replace('\\', '/').rsplit('/', 1)[-1].split('.')[-1]
+
+
+def _workspace(path):
+    """workspace part of a table path"""
+    path = str(path).replace('\\', '/')
+    if '/' in path:
+        return path.rsplit('/', 1)[0]
+    return env.workspace
+
+
+# field types, keyed by the names accepted by AddField, with the names Describe/ListFields report
+field_type_dict = {'TEXT': 'String', 'STRING': 'String', 'LONG': 'Integer', 'INTEGER': 'Integer',
+                   'SHORT': 'SmallInteger', 'SMALLINTEGER': 'SmallInteger', 'DOUBLE': 'Double', 'FLOAT': 'Single',
+                   'SINGLE': 'Single', 'DATE': 'Date', 'GUID': 'Guid', 'OID': 'OID', 'GEOMETRY': 'Geometry',
+                   'BLOB': 'Blob'}
+
+
+class Field(object):
+    """Fake arcpy.Field"""
+    def __init__(self, name, field_type='String', alias=None, length=255, domain=''):
+        self.name = name
+        self.type = field_type_dict.get(str(field_type).upper(), field_type)
+        self.aliasName = alias if alias else name
+        self.length = length
+        self.domain = domain
+        self.baseName = name
+        self.isNullable = True
+
+    def __repr__(self):
+        return 'Field(' + self.name + ', ' + self.type + ')'
+
+
+class Point(object):
+    """Fake arcpy.Point"""
+    def __init__(self, X=None, Y=None):
+        self.X = X
+        self.Y = Y
+
+
+class Geometry(object):
+    """Minimal stand-in for arcpy geometry objects returned for SHAPE@"""
+    def __init__(self, shape, spatial_reference=None):
+        self.shape = shape
+        self.spatialReference = spatial_reference
+        if isinstance(shape, (tuple, list)) and len(shape) == 2 and not isinstance(shape[0], (tuple, list)):
+            self.type = 'point'
+            self.firstPoint = Point(shape[0], shape[1])
+            self.centroid = self.firstPoint
+        else:
+            self.type = 'polygon'
+            self.firstPoint = None
+            self.centroid = None
+
+    @property
+    def WKT(self):
+        if self.type == 'point':
+            return 'POINT (' + str(self.firstPoint.X) + ' ' + str(self.firstPoint.Y) + ')'
+        return str(self.shape)
+
+    def __eq__(self, other):
+        if isinstance(other, Geometry):
+            return self.shape == other.shape
+        return self.shape == other
+
+
+def PointGeometry(point, spatial_reference=None):
+    """Fake arcpy.PointGeometry"""
+    return Geometry((point.X, point.Y), spatial_reference)
+
+
+class SpatialReference(object):
+    """Fake arcpy.SpatialReference"""
+    def __init__(self, item=None):
+        self.factoryCode = item if isinstance(item, int) else 0
+        self.name = str(item)
+
+
+class Table(object):
+    """In-memory table or feature class"""
+    def __init__(self, path, fields, rows=None, shape_type=None, unique_id_field=None, editor_tracking=False):
+        self.path = str(path).replace('\\', '/')
+        self.name = _baseName(self.path)
+        self.shape_type = shape_type
+        self.unique_id_field = unique_id_field
+        self.editor_tracking = editor_tracking
+        self.fields = [Field('OBJECTID', 'OID')]
+        if shape_type:
+            self.fields.append(Field('Shape', 'Geometry'))
+        for field in fields:
+            if isinstance(field, Field):
+                self.fields.append(field)
+            elif isinstance(field, (tuple, list)):
+                self.fields.append(Field(*field))
+            else:
+                self.fields.append(Field(field))
+        if editor_tracking:
+            for name in ('created_user', 'created_date', 'last_edited_user', 'last_edited_date'):
+                if not self.fieldName(name):
+                    self.fields.append(Field(name, 'Date' if name.endswith('date') else 'String'))
+        self.rows = []
+        self.next_oid = 1
+        self.next_unique_id = 1
+        for row in rows or []:
+            self.insert(row)
+
+    def fieldName(self, name):
+        """actual name of a field, matched case-insensitively"""
+        lower_name = name.lower()
+        if lower_name in ('oid@', 'objectid'):
+            return 'OBJECTID'
+        if lower_name.startswith('shape@') or lower_name == 'shape':
+            return 'Shape' if self.shape_type else None
+        for field in self.fields:
+            if field.name.lower() == lower_name:
+                return field.name
+        return None
+
+    def insert(self, values):
+        """add a row from a dict of field name to value, returning the new OBJECTID"""
+        row = {}
+        for field in self.fields:
+            row[field.name] = None
+        for name in values:
+            field_name = self.fieldName(name)
+            if not field_name:
+                raise RuntimeError('Cannot find field ' + name + ' in ' + self.path)
+            if field_name != 'OBJECTID':
+                row[field_name] = _convert(values[name], self.field(field_name).type)
+        row['OBJECTID'] = self.next_oid
+        self.next_oid += 1
+        if self.unique_id_field and row[self.unique_id_field] is None:
+            row[self.unique_id_field] = self.next_unique_id
+        if self.unique_id_field and row[self.unique_id_field] >= self.next_unique_id:
+            self.next_unique_id = row[self.unique_id_field] + 1
+        if self.editor_tracking:
+            row['created_date'] = datetime.datetime.now()
+            row['last_edited_date'] = row['created_date']
+        self.rows.append(row)
+        return row['OBJECTID']
+
+    def field(self, name):
+        """Field object for a name"""
+        field_name = self.fieldName(name)
+        for field in self.fields:
+            if field.name == field_name:
+                return field
+        return None
+
+    def touch(self, row):
+        """maintain editor tracking on update"""
+        if self.editor_tracking:
+            row['last_edited_date'] = datetime.datetime.now()
+
+
+def _convert(value, field_type):
+    """coerce a fixture or inserted value to the field type"""
+    if value is None or value == '':
+        return None
+    if field_type in ('Integer', 'SmallInteger', 'OID'):
+        return int(value)
+    if field_type in ('Double', 'Single'):
+        return float(value)
+    if field_type == 'Date' and isinstance(value, str):
+        return _parseDate(value)
+    if field_type == 'Geometry':
+        if isinstance(value, Geometry):
+            return value.shape
+        if isinstance(value, list) and len(value) == 2 and not isinstance(value[0], (tuple, list)):
+            return tuple(value)
+    return value
+
+
+def _parseDate(value):
+    """parse ISO style date strings"""
+    value = value.strip().replace('T', ' ')
+    for date_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise ValueError('Unsupported date ' + value)
+
+
+class Layer(object):
+    """Feature layer or table view, with definition query, selection and joins"""
+    def __init__(self, name, source, where_clause=None):
+        self.name = name
+        self.source = source
+        self.where_clause = where_clause
+        self.selection = None
+        # list of (in_field, join table, join_field, keep_all)
+        self.joins = []
+
+    def table(self):
+        """underlying Table"""
+        return _resolve(self.source)
+
+    def fields(self):
+        """fields, qualified with table names when joined"""
+        table = self.table()
+        if not self.joins:
+            return list(table.fields)
+        fields = [Field(table.name + '.' + field.name, field.type, field.aliasName) for field in table.fields]
+        for in_field, join_table, join_field, keep_all in self.joins:
+            fields += [Field(join_table.name + '.' + field.name, field.type, field.aliasName)
+                       for field in join_table.fields]
+        return fields
+
+    def rows(self, apply_selection=True):
+        """(base row, view row) pairs passing definition query and selection"""
+        table = self.table()
+        for row in _filter(table, _source_rows(self.source), self.where_clause):
+            if apply_selection and self.selection is not None and row['OBJECTID'] not in self.selection:
+                continue
+            view_row = self.viewRow(row)
+            if view_row is not None:
+                yield row, view_row
+
+    def viewRow(self, row):
+        """row as seen through the joins, or None if excluded by a KEEP_COMMON join"""
+        if not self.joins:
+            return row
+        table = self.table()
+        view_row = {}
+        for name in row:
+            view_row[table.name + '.' + name] = row[name]
+        for in_field, join_table, join_field, keep_all in self.joins:
+            in_value = _lookup(view_row, in_field)
+            match = None
+            join_field_name = join_table.fieldName(join_field)
+            for join_row in join_table.rows:
+                if in_value is not None and join_row[join_field_name] == in_value:
+                    match = join_row
+                    break
+            if match is None and not keep_all:
+                return None
+            for field in join_table.fields:
+                view_row[join_table.name + '.' + field.name] = match[field.name] if match else None
+        return view_row
+
+
+def _source_rows(source):
+    """rows of a table, or of a layer's table after its own definition query"""
+    if _key(source) in layers:
+        return [row for row, view_row in layers[_key(source)].rows(apply_selection=True)]
+    return _resolve(source).rows
+
+
+def _resolve(path):
+    """Table for a path or layer name"""
+    key = _key(path)
+    if key in layers:
+        return layers[key].table()
+    if key in tables:
+        return tables[key]
+    # allow database/owner prefixed names (e.g. gdb/ebarkba.sde.InputPoint)
+    workspace = _workspace(path)
+    if workspace:
+        key = _key(workspace + '/' + _baseName(path))
+        if key in tables:
+            return tables[key]
+    if env.workspace:
+        key = _key(env.workspace + '/' + _baseName(path))
+        if key in tables:
+            return tables[key]
+    raise RuntimeError('Cannot open ' + str(path))
+
+
+def _lookup(row, name):
+    """value of a (possibly qualified or prefixed) field in a row dict, matched case-insensitively"""
+    if name in row:
+        return row[name]
+    lower_name = name.lower()
+    for key in row:
+        if key.lower() == lower_name:
+            return row[key]
+    # strip database/owner prefix from qualified names (e.g. ebarkba.sde.InputPoint.SpeciesID)
+    parts = lower_name.split('.')
+    candidates = [key for key in row if key.lower().split('.')[-len(parts[-2:]):] == parts[-2:]]
+    if len(candidates) == 1:
+        return row[candidates[0]]
+    # unqualified name against a joined row
+    candidates = [key for key in row if key.lower().split('.')[-1] == parts[-1]]
+    if len(candidates) >= 1:
+        return row[candidates[0]]
+    raise RuntimeError('Cannot find field ' + name)
+
+
+# where clause parsing
+_token_re = re.compile(r"\s*(?:(?P<number>\d+\.\d*|\.\d+|\d+)|(?P<string>'(?:[^']|'')*')|"
+                       r"(?P<name>[A-Za-z_@][\w@$]*(?:\.[A-Za-z_@][\w@$]*)*)|(?P<op><>|!=|<=|>=|\|\||[=<>(),+\-*/]))")
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _token_re.match(text, position)
+        if not match or match.end() == position:
+            raise RuntimeError('Invalid SQL at: ' + text[position:])
+        position = match.end()
+        if match.group('number'):
+            number = match.group('number')
+            tokens.append(('value', float(number) if '.' in number else int(number)))
+        elif match.group('string'):
+            tokens.append(('value', match.group('string')[1:-1].replace("''", "'")))
+        elif match.group('name'):
+            tokens.append(('name', match.group('name')))
+        elif match.group('op'):
+            tokens.append(('op', match.group('op')))
+    return tokens
+
+
+class _Parser(object):
+    """recursive descent parser turning a where clause into a function of a row dict"""
+    def __init__(self, text, workspace):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.workspace = workspace
+
+    def peek(self, offset=0):
+        if self.position + offset < len(self.tokens):
+            return self.tokens[self.position + offset]
+        return (None, None)
+
+    def keyword(self, word, offset=0):
+        token = self.peek(offset)
+        return token[0] == 'name' and token[1].upper() == word
+
+    def accept(self, word):
+        if self.keyword(word) or self.peek() == ('op', word):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, word):
+        if not self.accept(word):
+            raise RuntimeError('Expected ' + word + ' in where clause')
+
+    def parse(self):
+        expr = self.orExpr()
+        if self.position != len(self.tokens):
+            raise RuntimeError('Unexpected ' + str(self.peek()[1]) + ' in where clause')
+        return expr
+
+    def orExpr(self):
+        left = self.andExpr()
+        while self.accept('OR'):
+            right = self.andExpr()
+            left = (lambda a, b: lambda row: _or(a(row), b(row)))(left, right)
+        return left
+
+    def andExpr(self):
+        left = self.notExpr()
+        while self.accept('AND'):
+            right = self.notExpr()
+            left = (lambda a, b: lambda row: _and(a(row), b(row)))(left, right)
+        return left
+
+    def notExpr(self):
+        if self.accept('NOT'):
+            operand = self.notExpr()
+            return lambda row: _not(operand(row))
+        return self.predicate()
+
+    def predicate(self):
+        left = self.additive()
+        negate = False
+        if self.keyword('NOT') and (self.keyword('IN', 1) or self.keyword('LIKE', 1) or self.keyword('BETWEEN', 1)):
+            self.position += 1
+            negate = True
+        if self.accept('IS'):
+            is_not = self.accept('NOT')
+            self.expect('NULL')
+            return lambda row: (left(row) is not None) if is_not else (left(row) is None)
+        if self.accept('IN'):
+            values = self.inList()
+            result = lambda row: _in(left(row), values(row))
+        elif self.accept('LIKE'):
+            pattern = self.additive()
+            result = lambda row: _like(left(row), pattern(row))
+        elif self.accept('BETWEEN'):
+            low = self.additive()
+            self.expect('AND')
+            high = self.additive()
+            result = lambda row: _and(_compare('>=', left(row), low(row)), _compare('<=', left(row), high(row)))
+        elif self.peek()[0] == 'op' and self.peek()[1] in ('=', '<>', '!=', '<', '>', '<=', '>='):
+            op = self.peek()[1]
+            self.position += 1
+            right = self.additive()
+            return lambda row: _compare(op, left(row), right(row))
+        else:
+            return left
+        if negate:
+            return lambda row: _not(result(row))
+        return result
+
+    def inList(self):
+        self.expect('(')
+        if self.keyword('SELECT'):
+            subquery = self.subquery()
+            self.expect(')')
+            return subquery
+        items = [self.additive()]
+        while self.accept(','):
+            items.append(self.additive())
+        self.expect(')')
+        return lambda row: [item(row) for item in items]
+
+    def subquery(self):
+        """SELECT [DISTINCT] field FROM table [WHERE ...], evaluated once"""
+        self.expect('SELECT')
+        self.accept('DISTINCT')
+        field = self.peek()[1]
+        self.position += 1
+        self.expect('FROM')
+        table_name = self.peek()[1]
+        self.position += 1
+        where_start = None
+        if self.accept('WHERE'):
+            where_start = self.position
+            depth = 0
+            while self.position < len(self.tokens):
+                if self.peek() == ('op', '('):
+                    depth += 1
+                elif self.peek() == ('op', ')'):
+                    if depth == 0:
+                        break
+                    depth -= 1
+                self.position += 1
+        sub_tokens = self.tokens[where_start:self.position] if where_start is not None else None
+        workspace = self.workspace
+        cache = []
+
+        def evaluate(row):
+            if not cache:
+                table = _resolve((workspace + '/' if workspace else '') + table_name)
+                condition = None
+                if sub_tokens:
+                    parser = _Parser('', workspace)
+                    parser.tokens = sub_tokens
+                    condition = parser.parse()
+                cache.append([_lookup(sub_row, field) for sub_row in table.rows
+                              if condition is None or condition(sub_row)])
+            return cache[0]
+        return evaluate
+
+    def additive(self):
+        left = self.multiplicative()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('+', '-', '||'):
+            op = self.peek()[1]
+            self.position += 1
+            right = self.multiplicative()
+            left = (lambda a, b, o: lambda row: _arithmetic(o, a(row), b(row)))(left, right, op)
+        return left
+
+    def multiplicative(self):
+        left = self.unary()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('*', '/'):
+            op = self.peek()[1]
+            self.position += 1
+            right = self.unary()
+            left = (lambda a, b, o: lambda row: _arithmetic(o, a(row), b(row)))(left, right, op)
+        return left
+
+    def unary(self):
+        if self.accept('-'):
+            operand = self.unary()
+            return lambda row: None if operand(row) is None else -operand(row)
+        return self.primary()
+
+    def primary(self):
+        token_type, token = self.peek()
+        if token_type == 'value':
+            self.position += 1
+            return lambda row: token
+        if token == '(':
+            self.position += 1
+            if self.keyword('SELECT'):
+                subquery = self.subquery()
+                self.expect(')')
+                return lambda row: subquery(row)[0] if subquery(row) else None
+            expr = self.orExpr()
+            self.expect(')')
+            return expr
+        if token_type == 'name':
+            upper_token = token.upper()
+            if upper_token == 'NULL':
+                self.position += 1
+                return lambda row: None
+            if upper_token in ('DATE', 'TIMESTAMP') and self.peek(1)[0] == 'value':
+                self.position += 2
+                date_value = _parseDate(self.tokens[self.position - 1][1])
+                return lambda row: date_value
+            if upper_token in ('CURRENT_DATE', 'CURRENT_TIMESTAMP'):
+                self.position += 1
+                return lambda row: datetime.datetime.now()
+            if self.peek(1) == ('op', '('):
+                return self.function(upper_token)
+            self.position += 1
+            return lambda row: _lookup(row, token)
+        raise RuntimeError('Unexpected ' + str(token) + ' in where clause')
+
+    def function(self, name):
+        self.position += 2
+        args = []
+        if not self.accept(')'):
+            args.append(self.orExpr())
+            while self.accept(','):
+                args.append(self.orExpr())
+            self.expect(')')
+        functions = {'LOWER': lambda v: v.lower() if v is not None else None,
+                     'UPPER': lambda v: v.upper() if v is not None else None,
+                     'TRIM': lambda v: v.strip() if v is not None else None,
+                     'ABS': lambda v: abs(v) if v is not None else None,
+                     'CHAR_LENGTH': lambda v: len(v) if v is not None else None,
+                     'COALESCE': lambda *v: next((x for x in v if x is not None), None)}
+        if name not in functions:
+            raise RuntimeError('Unsupported function ' + name + ' in where clause')
+        function = functions[name]
+        return lambda row: function(*[arg(row) for arg in args])
+
+
+def _and(a, b):
+    if a is False or b is False:
+        return False
+    if a is None or b is None:
+        return None
+    return bool(a) and bool(b)
+
+
+def _or(a, b):
+    if a is True or b is True:
+        return True
+    if a is None or b is None:
+        return None
+    return bool(a) or bool(b)
+
+
+def _not(a):
+    if a is None:
+        return None
+    return not a
+
+
+def _compare(op, a, b):
+    if a is None or b is None:
+        return None
+    if isinstance(a, datetime.datetime) and isinstance(b, str):
+        b = _parseDate(b)
+    if isinstance(b, datetime.datetime) and isinstance(a, str):
+        a = _parseDate(a)
+    if op == '=':
+        return a == b
+    if op in ('<>', '!='):
+        return a != b
+    if op == '<':
+        return a < b
+    if op == '>':
+        return a > b
+    if op == '<=':
+        return a <= b
+    return a >= b
+
+
+def _arithmetic(op, a, b):
+    if a is None or b is None:
+        return None
+    if op == '||':
+        return str(a) + str(b)
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    return a / b
+
+
+def _in(value, values):
+    if value is None:
+        return None
+    return value in values
+
+
+def _like(value, pattern):
+    if value is None or pattern is None:
+        return None
+    regex = ''
+    for char in pattern:
+        if char == '%':
+            regex += '.*'
+        elif char == '_':
+            regex += '.'
+        else:
+            regex += re.escape(char)
+    return re.fullmatch(regex, str(value), re.DOTALL) is not None
+
+
+_condition_cache = {}
+
+
+def _condition(where_clause, workspace):
+    """compiled where clause (None if no clause)"""
+    if not where_clause or not str(where_clause).strip():
+        return None
+    key = (where_clause, workspace)
+    if key not in _condition_cache:
+        _condition_cache[key] = _Parser(where_clause, workspace).parse()
+    return _condition_cache[key]
+
+
+def _filter(table, rows, where_clause):
+    """rows passing a where clause"""
+    condition = _condition(where_clause, _workspace(table.path))
+    if condition is None:
+        return list(rows)
+    return [row for row in rows if condition(row) is True]
+
+
+class _Cursor(object):
+    """shared behaviour of fake search and update cursors"""
+    def __init__(self, in_table, field_names, where_clause=None, spatial_reference=None, explode_to_points=False,
+                 sql_clause=(None, None)):
+        self.layer = layers.get(_key(in_table))
+        self.table = _resolve(in_table)
+        if self.layer:
+            self.available_fields = self.layer.fields()
+        else:
+            self.available_fields = self.table.fields
+        if field_names == '*' or field_names == ['*']:
+            field_names = [field.name for field in self.available_fields]
+        elif isinstance(field_names, str):
+            field_names = [field_names]
+        self.fields = tuple(field_names)
+        self.where_clause = where_clause
+        self.sql_clause = sql_clause if sql_clause else (None, None)
+        self.reset()
+
+    def _pairs(self):
+        """(base row, view row) pairs honouring layer query/selection and where clause"""
+        if self.layer:
+            pairs = list(self.layer.rows())
+        else:
+            pairs = [(row, row) for row in self.table.rows]
+        condition = _condition(self.where_clause, _workspace(self.table.path))
+        if condition is not None:
+            pairs = [pair for pair in pairs if condition(pair[1]) is True]
+        return pairs
+
+    def reset(self):
+        pairs = self._pairs()
+        prefix, postfix = self.sql_clause
+        if postfix:
+            match = re.search(r'ORDER\s+BY\s+(.+)$', postfix, re.IGNORECASE)
+            if match:
+                for item in reversed([item.strip() for item in match.group(1).split(',')]):
+                    parts = item.split()
+                    descending = len(parts) > 1 and parts[1].upper() == 'DESC'
+                    # NULLs first ascending, last descending, as in SQL Server
+                    pairs.sort(key=lambda pair, f=parts[0]: (_lookup(pair[1], f) is not None,
+                                                             _lookup(pair[1], f)),
+                               reverse=descending)
+        self.pairs = pairs
+        self.values = [self._values(pair[1]) for pair in pairs]
+        if prefix:
+            if re.search(r'DISTINCT', prefix, re.IGNORECASE):
+                distinct_pairs = []
+                distinct_values = []
+                for pair, values in zip(self.pairs, self.values):
+                    if values not in distinct_values:
+                        distinct_pairs.append(pair)
+                        distinct_values.append(values)
+                self.pairs, self.values = distinct_pairs, distinct_values
+            match = re.search(r'TOP\s+(\d+)', prefix, re.IGNORECASE)
+            if match:
+                self.pairs = self.pairs[:int(match.group(1))]
+                self.values = self.values[:int(match.group(1))]
+        self.position = -1
+
+    def _values(self, view_row):
+        values = []
+        for field in self.fields:
+            upper_field = field.upper()
+            if upper_field == 'OID@':
+                values.append(_lookup(view_row, 'OBJECTID') if not self.layer or not self.layer.joins
+                              else view_row[self.table.name + '.OBJECTID'])
+            elif upper_field.startswith('SHAPE@'):
+                shape = _lookup(view_row, 'Shape')
+                if shape is None:
+                    values.append(None)
+                elif upper_field == 'SHAPE@XY':
+                    values.append(tuple(shape[:2]) if isinstance(shape, (tuple, list)) else None)
+                elif upper_field == 'SHAPE@X':
+                    values.append(shape[0])
+                elif upper_field == 'SHAPE@Y':
+                    values.append(shape[1])
+                elif upper_field == 'SHAPE@WKT':
+                    values.append(Geometry(shape).WKT)
+                else:
+                    values.append(Geometry(shape))
+            else:
+                values.append(_lookup(view_row, field))
+        return tuple(values)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.position += 1
+        if self.position >= len(self.values):
+            raise StopIteration
+        return self.values[self.position]
+
+    def next(self):
+        return self.__next__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class SearchCursor(_Cursor):
+    """Fake arcpy.da.SearchCursor"""
+    pass
+
+
+class UpdateCursor(_Cursor):
+    """Fake arcpy.da.UpdateCursor"""
+    def updateRow(self, values):
+        row = self.pairs[self.position][0]
+        for field, value in zip(self.fields, values):
+            upper_field = field.upper()
+            if upper_field == 'OID@':
+                continue
+            if upper_field.startswith('SHAPE@'):
+                row['Shape'] = value.shape if isinstance(value, Geometry) else value
+                continue
+            field_name = self.table.fieldName(_baseName(field) if '.' in field else field)
+            if not field_name:
+                raise RuntimeError('Cannot update field ' + field)
+            row[field_name] = _convert(value, self.table.field(field_name).type)
+        self.table.touch(row)
+        self.values[self.position] = tuple(values)
+
+    def deleteRow(self):
+        row = self.pairs[self.position][0]
+        self.table.rows.remove(row)
+
+
+class InsertCursor(object):
+    """Fake arcpy.da.InsertCursor"""
+    def __init__(self, in_table, field_names, datum_transformation=None, explicit=False):
+        self.table = _resolve(in_table)
+        if field_names == '*' or field_names == ['*']:
+            field_names = [field.name for field in self.table.fields]
+        elif isinstance(field_names, str):
+            field_names = [field_names]
+        self.fields = tuple(field_names)
+
+    def insertRow(self, values):
+        if len(values) != len(self.fields):
+            raise TypeError('sequence size must match size of the row')
+        row = {}
+        for field, value in zip(self.fields, values):
+            upper_field = field.upper()
+            if upper_field == 'OID@':
+                continue
+            if upper_field.startswith('SHAPE@'):
+                row['Shape'] = value.shape if isinstance(value, Geometry) else value
+            else:
+                row[field] = value
+        return self.table.insert(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class Editor(object):
+    """Fake arcpy.da.Editor (edits are applied immediately; abortOperation is not supported)"""
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.isEditing = False
+
+    def startEditing(self, with_undo=True, multiuser_mode=True):
+        self.isEditing = True
+
+    def stopEditing(self, save_changes=True):
+        self.isEditing = False
+
+    def startOperation(self):
+        pass
+
+    def stopOperation(self):
+        pass
+
+    def abortOperation(self):
+        pass
+
+    def __enter__(self):
+        self.startEditing()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopEditing(exc_type is None)
+        return False
+
+
+class Domain(object):
+    """Fake arcpy.da.Domain"""
+    def __init__(self, name, coded_values):
+        self.name = name
+        self.codedValues = dict(coded_values)
+        self.domainType = 'CodedValue'
+
+
+def ListDomains(workspace):
+    """Fake arcpy.da.ListDomains"""
+    return list(domains.values())
+
+
+class Result(object):
+    """Fake arcpy Result"""
+    def __init__(self, *outputs):
+        self.outputs = outputs
+
+    def __getitem__(self, index):
+        return self.outputs[index]
+
+    def getOutput(self, index):
+        return self.outputs[index]
+
+
+class Description(object):
+    """Fake arcpy.Describe result"""
+    pass
+
+
+def Describe(value):
+    """Fake arcpy.Describe"""
+    desc = Description()
+    key = _key(value)
+    if key.endswith('.gdb') or key.endswith('.sde') or key == 'memory':
+        desc.dataType = 'Workspace'
+        desc.workspaceType = 'RemoteDatabase' if key.endswith('.sde') else 'LocalDatabase'
+        desc.name = _baseName(value)
+        desc.catalogPath = str(value)
+        return desc
+    layer = layers.get(key)
+    table = _resolve(value)
+    desc.name = layer.name if layer else table.name
+    desc.baseName = desc.name
+    desc.catalogPath = table.path
+    desc.fields = layer.fields() if layer else list(table.fields)
+    desc.OIDFieldName = 'OBJECTID'
+    desc.hasOID = True
+    desc.shapeType = table.shape_type.capitalize() if table.shape_type else None
+    desc.shapeFieldName = 'Shape' if table.shape_type else None
+    if layer:
+        desc.dataType = 'FeatureLayer' if table.shape_type else 'TableView'
+        desc.FIDSet = '; '.join(str(oid) for oid in sorted(layer.selection)) if layer.selection is not None else ''
+        desc.whereClause = layer.where_clause
+    else:
+        desc.dataType = 'FeatureClass' if table.shape_type else 'Table'
+    desc.editorTrackingEnabled = table.editor_tracking
+    desc.editedAtFieldName = 'last_edited_date' if table.editor_tracking else ''
+    desc.createdAtFieldName = 'created_date' if table.editor_tracking else ''
+    desc.spatialReference = SpatialReference()
+    return desc
+
+
+def ListFields(dataset, wild_card=None, field_type=None):
+    """Fake arcpy.ListFields"""
+    fields = Describe(dataset).fields
+    if wild_card:
+        regex = re.compile('^' + re.escape(wild_card).replace('\\*', '.*') + '$', re.IGNORECASE)
+        fields = [field for field in fields if regex.match(field.name)]
+    if field_type and field_type != 'All':
+        fields = [field for field in fields if field.type == field_type]
+    return fields
+
+
+def Exists(dataset):
+    """Fake arcpy.Exists"""
+    key = _key(dataset)
+    if key in layers or key in tables:
+        return True
+    # workspaces exist if any table is registered in them
+    return any(table_key.startswith(key + '/') for table_key in tables)
+
+
+def Delete_management(in_data, data_type=None):
+    """Fake arcpy.Delete_management / arcpy.management.Delete"""
+    key = _key(in_data)
+    if key in layers:
+        del layers[key]
+    elif key in tables:
+        del tables[key]
+    return Result(str(in_data))
+
+
+def GetCount_management(in_rows):
+    """Fake arcpy.GetCount_management / arcpy.management.GetCount"""
+    key = _key(in_rows)
+    if key in layers:
+        return Result(str(len(list(layers[key].rows()))))
+    return Result(str(len(_resolve(in_rows).rows)))
+
+
+def MakeTableView_management(in_table, out_view, where_clause=None, workspace=None, field_info=None):
+    """Fake arcpy.MakeTableView_management / arcpy.management.MakeTableView"""
+    source = in_table
+    if _key(in_table) in layers:
+        # a view of a view sees only the source's selection
+        source = in_table
+    layers[_key(out_view)] = Layer(str(out_view), source, where_clause)
+    return Result(str(out_view))
+
+
+def MakeFeatureLayer_management(in_features, out_layer, where_clause=None, workspace=None, field_info=None):
+    """Fake arcpy.MakeFeatureLayer_management / arcpy.management.MakeFeatureLayer"""
+    return MakeTableView_management(in_features, out_layer, where_clause)
+
+
+def SelectLayerByAttribute_management(in_layer_or_view, selection_type='NEW_SELECTION', where_clause=None,
+                                      invert_where_clause=None):
+    """Fake arcpy.SelectLayerByAttribute_management / arcpy.management.SelectLayerByAttribute"""
+    layer = layers[_key(in_layer_or_view)]
+    condition = _condition(where_clause, _workspace(layer.table().path))
+    matching = set()
+    for row, view_row in layer.rows(apply_selection=False):
+        if condition is None or condition(view_row) is True:
+            matching.add(row['OBJECTID'])
+    if invert_where_clause == 'INVERT':
+        matching = set(row['OBJECTID'] for row, view_row in layer.rows(apply_selection=False)) - matching
+    current = layer.selection
+    if selection_type == 'CLEAR_SELECTION':
+        layer.selection = None
+    elif selection_type == 'NEW_SELECTION' or current is None and selection_type == 'ADD_TO_SELECTION':
+        layer.selection = matching
+    elif selection_type == 'ADD_TO_SELECTION':
+        layer.selection = current | matching
+    elif selection_type == 'REMOVE_FROM_SELECTION':
+        layer.selection = (current or set()) - matching
+    elif selection_type == 'SUBSET_SELECTION':
+        layer.selection = (current if current is not None else matching) & matching
+    elif selection_type == 'SWITCH_SELECTION':
+        all_ids = set(row['OBJECTID'] for row, view_row in layer.rows(apply_selection=False))
+        layer.selection = all_ids - (current or set())
+    return Result(str(in_layer_or_view), str(len(layer.selection or [])))
+
+
+def DeleteRows_management(in_rows):
+    """Fake arcpy.DeleteRows_management / arcpy.management.DeleteRows"""
+    key = _key(in_rows)
+    table = _resolve(in_rows)
+    if key in layers:
+        delete_rows = [row for row, view_row in layers[key].rows()]
+    else:
+        delete_rows = list(table.rows)
+    for row in delete_rows:
+        table.rows.remove(row)
+    return Result(str(in_rows))
+
+
+def AddField_management(in_table, field_name, field_type, field_precision=None, field_scale=None,
+                        field_length=None, field_alias=None, field_is_nullable=None, field_is_required=None,
+                        field_domain=None):
+    """Fake arcpy.AddField_management / arcpy.management.AddField"""
+    table = _resolve(in_table)
+    if table.fieldName(field_name):
+        raise ExecuteError('ERROR 000012: ' + field_name + ' already exists')
+    table.fields.append(Field(field_name, field_type, field_alias, field_length or 255, field_domain or ''))
+    for row in table.rows:
+        row[field_name] = None
+    return Result(str(in_table))
+
+
+def DeleteField_management(in_table, drop_field):
+    """Fake arcpy.DeleteField_management / arcpy.management.DeleteField"""
+    table = _resolve(in_table)
+    if isinstance(drop_field, str):
+        drop_field = drop_field.split(';')
+    for name in drop_field:
+        field = table.field(name)
+        if field:
+            table.fields.remove(field)
+            for row in table.rows:
+                del row[field.name]
+    return Result(str(in_table))
+
+
+def CalculateField_management(in_table, field, expression, expression_type='PYTHON3', code_block=None,
+                              field_type=None, enforce_domains=None):
+    """Fake arcpy.CalculateField_management / arcpy.management.CalculateField (Python expressions only)"""
+    key = _key(in_table)
+    table = _resolve(in_table)
+    if key in layers:
+        pairs = list(layers[key].rows())
+    else:
+        pairs = [(row, row) for row in table.rows]
+    namespace = {'datetime': datetime}
+    if code_block:
+        exec(code_block, namespace)
+    if not table.fieldName(field):
+        AddField_management(in_table, field, field_type or 'TEXT')
+    field_name = table.fieldName(field)
+    compiled = None
+    for row, view_row in pairs:
+        python_expression = re.sub(r'!([^!]+)!', lambda match: '__row[' + repr(match.group(1)) + ']', str(expression))
+        if compiled is None:
+            compiled = compile(python_expression, '<expression>', 'eval')
+        namespace['__row'] = _RowAccessor(view_row)
+        row[field_name] = _convert(eval(compiled, namespace), table.field(field_name).type)
+        table.touch(row)
+    return Result(str(in_table))
+
+
+class _RowAccessor(object):
+    """lets CalculateField expressions use !Field! with qualified or unqualified names"""
+    def __init__(self, row):
+        self.row = row
+
+    def __getitem__(self, name):
+        return _lookup(self.row, name)
+
+
+def AddJoin_management(in_layer_or_view, in_field, join_table, join_field, join_type='KEEP_ALL',
+                       index_join_fields=None):
+    """Fake arcpy.AddJoin_management / arcpy.management.AddJoin"""
+    layer = layers[_key(in_layer_or_view)]
+    layer.joins.append((in_field, _resolve(join_table), join_field, join_type != 'KEEP_COMMON'))
+    return Result(str(in_layer_or_view))
+
+
+def RemoveJoin_management(in_layer_or_view, join_name=None):
+    """Fake arcpy.RemoveJoin_management / arcpy.management.RemoveJoin"""
+    layer = layers[_key(in_layer_or_view)]
+    if join_name:
+        layer.joins = [join for join in layer.joins if join[1].name.lower() != _baseName(join_name).lower()]
+    else:
+        layer.joins = []
+    return Result(str(in_layer_or_view))
+
+
+def CopyRows_management(in_rows, out_table, config_keyword=None):
+    """Fake arcpy.CopyRows_management / arcpy.management.CopyRows"""
+    source = _resolve(in_rows)
+    key = _key(in_rows)
+    if key in layers:
+        rows = [row for row, view_row in layers[key].rows()]
+    else:
+        rows = source.rows
+    fields = [copy.copy(field) for field in source.fields if field.type not in ('OID', 'Geometry')]
+    tables[_key(out_table)] = Table(out_table, fields, [dict((k, v) for k, v in row.items() if k != 'OBJECTID')
+                                                        for row in rows],
+                                    shape_type=source.shape_type)
+    return Result(str(out_table))
+
+
+def CopyFeatures_management(in_features, out_feature_class, config_keyword=None):
+    """Fake arcpy.CopyFeatures_management / arcpy.management.CopyFeatures"""
+    return CopyRows_management(in_features, out_feature_class)
+
+
+def Append_management(inputs, target, schema_type='TEST', field_mapping=None, subtype=None, expression=None):
+    """Fake arcpy.Append_management / arcpy.management.Append (matching field names only)"""
+    target_table = _resolve(target)
+    if isinstance(inputs, str):
+        inputs = inputs.split(';')
+    for in_rows in inputs:
+        key = _key(in_rows)
+        if key in layers:
+            rows = [row for row, view_row in layers[key].rows()]
+        else:
+            rows = _resolve(in_rows).rows
+        condition = _condition(expression, _workspace(target_table.path))
+        for row in rows:
+            if condition is None or condition(row) is True:
+                target_table.insert(dict((k, v) for k, v in row.items()
+                                         if k != 'OBJECTID' and target_table.fieldName(k)))
+    return Result(str(target))
+
+
+def _message(msg):
+    print(msg)
+
+
+# fixtures
+def createTable(path, fields, rows=None, shape_type=None, unique_id_field=None, editor_tracking=False):
+    """register an in-memory table/feature class; fields are names, (name, type) tuples or Field objects and
+    rows are dicts (or sequences in field order)"""
+    field_names = [field.name if isinstance(field, Field) else field[0] if isinstance(field, (tuple, list))
+                   else field for field in fields]
+    dict_rows = []
+    for row in rows or []:
+        if isinstance(row, dict):
+            dict_rows.append(row)
+        else:
+            dict_rows.append(dict(zip(field_names + (['Shape'] if shape_type else []), row)))
+    table = Table(path, fields, dict_rows, shape_type, unique_id_field, editor_tracking)
+    tables[_key(path)] = table
+    return table
+
+
+def loadCSV(path, csv_file, field_types=None, shape_type=None, x_field=None, y_field=None, unique_id_field=None,
+            editor_tracking=False):
+    """register a table from a CSV file; field_types maps field names to types (default String), and x_field and
+    y_field (if given) build point shapes"""
+    field_types = field_types or {}
+    with open(csv_file, 'r', encoding='utf-8', newline='') as infile:
+        reader = csv.DictReader(infile)
+        fields = [(name, field_types.get(name, 'String')) for name in reader.fieldnames if name != 'OBJECTID']
+        rows = []
+        for line in reader:
+            row = dict((name, line[name]) for name in reader.fieldnames if name != 'OBJECTID')
+            if x_field and y_field and line[x_field] and line[y_field]:
+                row['Shape'] = (float(line[x_field]), float(line[y_field]))
+            rows.append(row)
+    if x_field and y_field and not shape_type:
+        shape_type = 'point'
+    return createTable(path, fields, rows, shape_type, unique_id_field, editor_tracking)
+
+
+def loadJSON(json_file, workspace=None):
+    """register tables from a JSON fixture:
+    {"tables": [{"path"|"name", "fields": [[name, type], ...], "rows": [{...}], "shapeType", "uniqueIDField",
+    "editorTracking"}], "domains": {"name": {"code": "description"}}}"""
+    with open(json_file, 'r', encoding='utf-8') as infile:
+        fixture = json.load(infile)
+    loaded = []
+    for spec in fixture.get('tables', []):
+        path = spec.get('path') or (workspace + '/' + spec['name'])
+        loaded.append(createTable(path, [tuple(field) if isinstance(field, list) else field
+                                         for field in spec['fields']],
+                                  spec.get('rows'), spec.get('shapeType'), spec.get('uniqueIDField'),
+                                  spec.get('editorTracking', False)))
+    for name, coded_values in fixture.get('domains', {}).items():
+        domains[name] = Domain(name, coded_values)
+    return loaded
+
+
+def reset():
+    """forget all tables, layers and domains"""
+    tables.clear()
+    layers.clear()
+    domains.clear()
+    _condition_cache.clear()
+
+
+def install():
+    """register this module as arcpy (with arcpy.da and arcpy.management) and return it"""
+    module = sys.modules[__name__]
+    da = types.ModuleType('arcpy.da')
+    for name in ('SearchCursor', 'UpdateCursor', 'InsertCursor', 'Editor', 'ListDomains', 'Domain'):
+        setattr(da, name, getattr(module, name))
+    management = types.ModuleType('arcpy.management')
+    for name in dir(module):
+        if name.endswith('_management'):
+            setattr(management, name[:-len('_management')], getattr(module, name))
+    module.da = da
+    module.management = management
+    module.Parameter = Parameter
+    module.AddMessage = _message
+    module.AddWarning = _message
+    module.AddError = _message
+    module.Append = Append_management
+    sys.modules['arcpy'] = module
+    sys.modules['arcpy.da'] = da
+    sys.modules['arcpy.management'] = management
+    return module
+
+
+class Parameter(object):
+    """Fake arcpy.Parameter"""
+    def __init__(self, name=None, displayName=None, direction=None, datatype=None, parameterType=None,
+                 enabled=None, category=None, symbology=None, multiValue=None):
+        self.name = name
+        self.displayName = displayName
+        self.value = None
+        self.filter = types.SimpleNamespace(type=None, list=[])
+
+    @property
+    def valueAsText(self):
+        if self.value is None:
+            return None
+        if isinstance(self.value, bool):
+            return 'true' if self.value else 'false'
+        return str(self.value)
@@ -0,0 +1,143 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: CalculateFieldBenchmark.py
+# Benchmark of EBARUtils.calculateFields, comparing the RangeMapID, OriginalGeometryType and TempDate calculations of
+# GenerateRangeMapTool with the previous CalculateField (Python code block) and two cursor path, and checking that
+# both give the same values
+
+# Notes:
+# - Uses a synthetic table shaped like TempAllInputs, created in the scratch geodatabase (memory with ArcpyFake)
+# - Optionally pass a row count (default 500000)
+# - Without ArcGIS Pro, runs against the in-memory ArcpyFake
+
+
+import sys
+import time
+import datetime
+try:
+    import arcpy
+    faked = False
+except ImportError:
+    import ArcpyFake
+    arcpy = ArcpyFake.install()
+    faked = True
+import EBARUtils
+import PresenceRules
+
+
+fields = [('InputPointID', 'LONG'), ('InputLineID', 'LONG'), ('InputPolygonID', 'LONG'), ('MaxDate', 'DATE'),
+          ('EORank', 'TEXT')]
+calculated_fields = [('RangeMapID', 'LONG'), ('OriginalGeometryType', 'TEXT'), ('TempDate', 'DATE')]
+eo_ranks = [None, 'A', 'B', 'H', 'X', 'E', 'NR']
+range_map_id = 1234
+
+
+def buildRows(row_count):
+    """synthetic rows, a third each point, line and polygon inputs"""
+    rows = []
+    for i in range(row_count):
+        rows.append((i if i % 3 == 0 else None, i if i % 3 == 1 else None, i if i % 3 == 2 else None,
+                     datetime.datetime(1900 + i % 120, 1 + i % 12, 1) if i % 10 else None, eo_ranks[i % 7]))
+    return rows
+
+
+def buildTable(path, rows):
+    """table with fields and rows, plus empty calculated fields"""
+    if faked:
+        arcpy.createTable(path, fields + calculated_fields)
+    else:
+        workspace, name = path.rsplit('/', 1)
+        arcpy.CreateTable_management(workspace, name)
+        for field, field_type in fields + calculated_fields:
+            arcpy.AddField_management(path, field, field_type)
+    with arcpy.da.InsertCursor(path, [field for field, field_type in fields]) as cursor:
+        for row in rows:
+            cursor.insertRow(row)
+    del cursor
+
+
+def oldPath(table):
+    """previous implementation"""
+    arcpy.CalculateField_management(table, 'RangeMapID', range_map_id)
+    code_block = '''
+def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
+    ret = 'P'
+    if input_line_id:
+        ret = 'L'
+    elif input_polygon_id:
+        ret = 'Y'
+    return ret'''
+    arcpy.CalculateField_management(table, 'OriginalGeometryType',
+                                    'GetGeometryType(!InputPointID!, !InputLineID!, !InputPolygonID!)', 'PYTHON3',
+                                    code_block)
+    with arcpy.da.SearchCursor(table, ['OID@', 'MaxDate', 'EORank']) as search_cursor:
+        input_dates = [row for row in search_cursor]
+    del search_cursor
+    temp_dates = dict(zip([row[0] for row in input_dates],
+                          PresenceRules.fakeEORankDates([row[1] for row in input_dates],
+                                                        [row[2] for row in input_dates]).tolist()))
+    with arcpy.da.UpdateCursor(table, ['OID@', 'TempDate']) as update_cursor:
+        for row in update_cursor:
+            update_cursor.updateRow([row[0], temp_dates[row[0]]])
+    del update_cursor
+
+
+def newPath(table):
+    """current implementation"""
+    EBARUtils.calculateFields(
+        table,
+        {'RangeMapID': range_map_id,
+         'OriginalGeometryType': lambda row: 'L' if row['InputLineID'] else ('Y' if row['InputPolygonID'] else 'P'),
+         'TempDate': EBARUtils.ColumnCalculation(
+             lambda columns: PresenceRules.fakeEORankDates(columns['MaxDate'], columns['EORank']).tolist())},
+        ['InputLineID', 'InputPolygonID', 'MaxDate', 'EORank'])
+
+
+def calculatedValues(table):
+    """calculated field values by OID"""
+    with arcpy.da.SearchCursor(table, ['OID@'] + [field for field, field_type in calculated_fields]) as cursor:
+        values = {row[0]: row[1:] for row in cursor}
+    del cursor
+    return values
+
+
+def runPath(table, rows, path):
+    """build table and time one path over it; return (seconds, calculated values)"""
+    buildTable(table, rows)
+    start = time.perf_counter()
+    path(table)
+    seconds = time.perf_counter() - start
+    return seconds, calculatedValues(table)
+
+
+def main(row_count):
+    rows = buildRows(row_count)
+    timings = {}
+    values = {}
+    for label, path in [('CalculateField', oldPath), ('calculateFields', newPath)]:
+        if faked:
+            table = 'memory/TempBenchmark' + label
+            timings[label], values[label] = runPath(table, rows, path)
+        else:
+            with EBARUtils.ScratchWorkspace() as scratch:
+                table = scratch.name('TempBenchmark' + label)
+                timings[label], values[label] = runPath(table, rows, path)
+    print(str(row_count) + ' rows')
+    print('CalculateField and cursors: ' + str(round(timings['CalculateField'], 2)) + 's')
+    print('calculateFields:            ' + str(round(timings['calculateFields'], 2)) + 's (' +
+          str(round(timings['CalculateField'] / timings['calculateFields'], 1)) + 'x)')
+    if values['CalculateField'] == values['calculateFields']:
+        print('Values match')
+    else:
+        mismatches = [oid for oid in values['CalculateField']
+                      if values['CalculateField'][oid] != values['calculateFields'].get(oid)]
+        print('MISMATCH: ' + str(len(mismatches)) + ' row(s) differ')
+
+
+# controlling process
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
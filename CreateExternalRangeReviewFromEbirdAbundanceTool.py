@@ -89,8 +89,11 @@ class CreateExternalRangeReviewFromEbirdAbundanceTool:
         #     EBARUtils.displayMessage(messages, 'ERROR: Failed to Download Full Year raster with status code ' +
         #                              str(response.status_code))
         #     return
+        # local indexed copy of ecoshapes, rather than pulling them from the feature service for each raster
+        ecoshapes = EBARUtils.localEcoshapes(param_geodatabase, 'Ecoshape', messages)
+
         EBARUtils.displayMessage(messages, 'Processing Full Year raster')
-        self.ProcessRaster(messages, param_ebird_full_year_raster, param_percent_of_population_cutoff,
+        self.ProcessRaster(messages, ecoshapes, param_ebird_full_year_raster, param_percent_of_population_cutoff,
                            param_label, True)
         # self.ProcessRaster(messages, full_year_tif, param_percent_of_population_cutoff, param_label, True)
         # arcpy.Delete_management(full_year_tif)
@@ -98,7 +101,7 @@ class CreateExternalRangeReviewFromEbirdAbundanceTool:
         # breeding season raster is optional
         if param_ebird_breeding_season_raster:
             EBARUtils.displayMessage(messages, 'Processing Breeding Season raster')
-            self.ProcessRaster(messages, param_ebird_breeding_season_raster, param_percent_of_population_cutoff,
+            self.ProcessRaster(messages, ecoshapes, param_ebird_breeding_season_raster, param_percent_of_population_cutoff,
                                param_label, False)
             
         # # process removals based on param_range_map_id
@@ -126,11 +129,11 @@ class CreateExternalRangeReviewFromEbirdAbundanceTool:
         arcpy.Delete_management(param_geodatabase + '/' + param_label + '_' + param_percent_of_population_cutoff)
 
 
-    def ProcessRaster(self, messages, ebird_raster, percent_of_population_cutoff,
+    def ProcessRaster(self, messages, ecoshapes, ebird_raster, percent_of_population_cutoff,
                       label, is_full_year):
         # Extract by Mask to Canada
         EBARUtils.displayMessage(messages, 'Extracting by Mask for Canada only')
-        arcpy.MakeFeatureLayer_management(EBARUtils.ebar_feature_service + '/3', 'cdn_ecoshapes',
+        arcpy.MakeFeatureLayer_management(ecoshapes, 'cdn_ecoshapes',
                                           'JurisdictionID IN ' + EBARUtils.national_jur_ids)
         cdn_raster = arcpy.sa.ExtractByMask(ebird_raster, 'cdn_ecoshapes', 'INSIDE')
         #cdn_raster.save('cdn_raster')
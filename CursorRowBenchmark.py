@@ -0,0 +1,100 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: CursorRowBenchmark.py
+# Micro-benchmark of the named rows yielded by EBARUtils.searchCursor/updateCursor, comparing the compact
+# CursorRow classes with the previous MutableNamedTuple rows
+
+# Notes:
+# - Uses synthetic rows shaped like InputPoint, so no geodatabase is needed
+# - Optionally pass a table path to also time a real arcpy.da.SearchCursor pass over it
+# - Without ArcGIS Pro, runs against the in-memory ArcpyFake
+
+
+import sys
+import timeit
+import tracemalloc
+import datetime
+try:
+    import arcpy
+except ImportError:
+    import ArcpyFake
+    arcpy = ArcpyFake.install()
+import EBARUtils
+
+
+fields = ['InputPointID', 'InputDatasetID', 'SpeciesID', 'SynonymID', 'DatasetSourceUniqueID', 'URI', 'Accuracy',
+          'MinDate', 'MaxDate', 'CoordinatesObscured', 'EORank', 'BreedingAndBehaviourCode', 'LocUseClass',
+          'SHAPE@XY']
+row_count = 200000
+
+
+def buildRows():
+    """synthetic rows, as tuples like those returned by arcpy.da.SearchCursor"""
+    rows = []
+    for i in range(row_count):
+        rows.append((i, i % 50, i % 700, None, 'UID' + str(i), None, 100 + i % 1000,
+                     datetime.datetime(2000, 1, 1), datetime.datetime(2020, 1, 1), 0, None, None, None,
+                     (-75.0 + i / row_count, 45.0)))
+    return rows
+
+
+def oldRows(rows):
+    """previous implementation"""
+    for row in rows:
+        yield EBARUtils.MutableNamedTuple(zip(fields, row))
+
+
+def newRows(rows):
+    """current implementation"""
+    row_class = EBARUtils._rowClass(fields)
+    for row in rows:
+        yield row_class(row)
+
+
+def consume(generator):
+    """read a few fields from each row, as typical tool code does"""
+    total = 0
+    for row in generator:
+        total += row['Accuracy']
+        if row['EORank']:
+            total += 1
+        total += row.SpeciesID
+    return total
+
+
+def peakMemory(rows, build):
+    """peak memory (bytes) of materializing every row"""
+    tracemalloc.start()
+    kept = list(build(rows))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del kept
+    return peak
+
+
+# controlling process
+if __name__ == '__main__':
+    rows = buildRows()
+    # sanity check that both implementations agree
+    if consume(oldRows(rows)) != consume(newRows(rows)):
+        print('ERROR: row implementations disagree')
+        sys.exit(1)
+    old_time = min(timeit.repeat(lambda: consume(oldRows(rows)), number=1, repeat=3))
+    new_time = min(timeit.repeat(lambda: consume(newRows(rows)), number=1, repeat=3))
+    print('Rows: ' + str(row_count))
+    print('MutableNamedTuple: ' + str(round(old_time, 3)) + 's, ' + str(peakMemory(rows, oldRows)) + ' bytes peak')
+    print('CursorRow: ' + str(round(new_time, 3)) + 's, ' + str(peakMemory(rows, newRows)) + ' bytes peak')
+    print('Speed-up: ' + str(round(old_time / new_time, 1)) + 'x')
+
+    # optional pass over a real table
+    if len(sys.argv) > 1:
+        start = timeit.default_timer()
+        count = 0
+        with arcpy.da.SearchCursor(sys.argv[1], ['OID@']) as cursor:
+            for row in EBARUtils.searchCursor(cursor):
+                count += 1
+        print(sys.argv[1] + ': ' + str(count) + ' rows in ' + str(round(timeit.default_timer() - start, 3)) + 's')
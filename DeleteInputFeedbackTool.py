@@ -50,6 +50,17 @@ class DeleteInputFeedbackTool:
                 EBARUtils.displayMessage(messages, 'ERROR: InputFeedback record with ID ' + id_value + ' not found')
                 # terminate with error
                 return
+            # inputs no longer excluded from all range maps need their ecoshape associations back
+            reassociate = []
+            with arcpy.da.SearchCursor('feedback_view', ['ExcludeFromAllRangeMaps'] +
+                                       [input_features + 'ID' for input_features in
+                                        EBARUtils.input_ecoshape_types]) as cursor:
+                for row in cursor:
+                    if row[0] == 1:
+                        for input_features, input_id in zip(EBARUtils.input_ecoshape_types, row[1:]):
+                            if input_id:
+                                reassociate.append((input_features, input_id))
+            del cursor
             # delete
             delete_count = EBARUtils.deleteRows(param_geodatabase + '/InputFeedback', 'if_view', where_clause)
             if delete_count == 0:
@@ -57,6 +68,9 @@ class DeleteInputFeedbackTool:
                 # terminate with error
                 return
             EBARUtils.displayMessage(messages, ' InputFeedback record ' + id_value + ' deleted')
+            for input_features, input_id in reassociate:
+                EBARUtils.updateInputEcoshapes(param_geodatabase, input_features, input_ids=[input_id],
+                                               messages=messages)
         
         # end time
         end_time = datetime.datetime.now()
@@ -10,6 +10,7 @@
 
 import collections
 import arcpy
+import functools
 import datetime
 import os
 import pathlib
@@ -17,9 +18,16 @@ import shutil
 import time
 import zipfile
 import csv
-import requests
+import hashlib
+import pickle
 import json
-import deepl
+import re
+import tracemalloc
+try:
+    import psutil
+except ImportError:
+    psutil = None
+import PresenceRules
 
 #from xarray import where
 
@@ -27,6 +35,10 @@ import deepl
 # shared folders and addresses
 resources_folder = 'C:/GIS/EBAR/EBARTools/resources'
 temp_folder = 'C:/GIS/EBAR/temp'
+reference_cache_folder = temp_folder + '/ReferenceCache'
+scratch_folder = temp_folder + '/Scratch'
+ecoshape_cache_folder = temp_folder + '/EcoshapeCache'
+buffer_cache_folder = temp_folder + '/BufferCache'
 #download_folder = 'D:/GIS/EBAR/pub/download'
 download_folder = 'F:/download'
 download_url = 'https://gis.natureserve.ca/download'
@@ -55,8 +67,8 @@ default_buffer_size = 10
 #buffer_proportion_overlap = 0.6
 
 
-# number of years beyond which Presence gets set to Historical
-age_for_historical = 40
+# number of years beyond which Presence gets set to Historical (defined with the presence rules)
+age_for_historical = PresenceRules.age_for_historical
 
 
 # WKIDs for datums/SRSs
@@ -145,13 +157,8 @@ subnation_dict = {'Alberta': 'AB',
                   'Yukon Territory': 'YT'}
 
 
-# breeding land use classes
-breeding_land_use_classes = ['breeding',
-                             'maternity colony',
-                             'roost',
-                             'nesting area',
-                             'calving area',
-                             'nursery area']
+# breeding land use classes (defined with the presence rules)
+breeding_land_use_classes = PresenceRules.breeding_land_use_classes
 
 
 # # for emailNoticeWithAttachment below
@@ -166,11 +173,42 @@ breeding_land_use_classes = ['breeding',
 portal_file = 'C:/Users/rgreene/Documents/Portal.txt'
 
 
+# local ecoshape copies (see localEcoshapes) are refreshed when the source edit timestamp changes, or every
+# ecoshape_cache_max_age_days if the source has no editor tracking; other processes wait up to
+# ecoshape_cache_wait_seconds for a refresh in progress
+ecoshape_cache_max_age_days = 7
+ecoshape_cache_wait_seconds = 600
+
+
+# buffered inputs (see inputSelectAndBuffer) are cached locally by content fingerprint of the selected inputs, and
+# swept once unused for buffer_cache_max_age_days; a store lock is taken over once its process has died or it is
+# older than buffer_cache_lock_seconds
+buffer_cache_enabled = True
+buffer_cache_max_age_days = 14
+buffer_cache_lock_seconds = 600
+
+
+# hours after which local scratch geodatabases are assumed orphaned and swept (see ScratchWorkspace)
+scratch_stale_hours = 24
+
+
+# run profiles (see RunProfile) are written as JSON to profile_folder; set profile_print_stages to also display a
+# stage breakdown at the end of each run
+profile_folder = temp_folder + '/Profiles'
+profile_print_stages = False
+
+
 # DeepL key
 deepl_key_file = 'C:/GIS/EBAR/DeepL/DeepL.txt'
 deepl_key = None
 
 
+def tempName(name, start_time):
+    """unique name for temporary table/feature class"""
+    return name + str(start_time.year) + str(start_time.month) + str(start_time.day) + str(start_time.hour) + \
+        str(start_time.minute) + str(start_time.second)
+
+
 def displayMessage(messages, msg):
     """Output message to arcpy message object or to Python standard output."""
     if messages:
@@ -209,6 +247,75 @@ class MutableNamedTuple(collections.OrderedDict):
             super(MutableNamedTuple, self).__setattr__(name, value)
 
 
+class CursorRow(object):
+    """Compact row used by enhanced cursor functions below (one subclass per distinct field list, see _rowClass)"""
+    __slots__ = ('_values',)
+    _fields = ()
+    _index = {}
+
+    def __init__(self, values):
+        object.__setattr__(self, '_values', values)
+
+    def __getitem__(self, name):
+        return self._values[self._index[name]]
+
+    def __setitem__(self, name, value):
+        # search cursors return tuples, so switch to a list on first write
+        if isinstance(self._values, tuple):
+            object.__setattr__(self, '_values', list(self._values))
+        self._values[self._index[name]] = value
+
+    def __getattr__(self, name):
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name not in self._index:
+            raise AttributeError(name)
+        self[name] = value
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return type(self).__name__ + '(' + ', '.join(field + '=' + repr(self[field]) for field in self._fields) + ')'
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return [self[field] for field in self._fields]
+
+    def items(self):
+        return [(field, self[field]) for field in self._fields]
+
+
+# row classes already built, keyed by field list
+_row_classes = {}
+
+
+def _rowClass(fields):
+    """Private factory returning the CursorRow subclass for the passed field list (built once, then cached)"""
+    fields = tuple(fields)
+    row_class = _row_classes.get(fields)
+    if not row_class:
+        index = {}
+        for position, field in enumerate(fields):
+            # later duplicates win, as with the previous dict-based rows
+            index[field] = position
+        row_class = type('CursorRow', (CursorRow,), {'__slots__': (), '_fields': tuple(index), '_index': index})
+        _row_classes[fields] = row_class
+    return row_class
+
+
 def searchCursor(cursor):
     """Enables named fields in an arcpy.da.SearchCursor"""
     return _name_cursor(cursor)
@@ -229,8 +336,9 @@ def _name_cursor(cursor):
     """Private generator to enable named fields in an arcpy.da cursor (search_cursor or update_cursor)"""
     if (isinstance(cursor, arcpy.da.SearchCursor) or
         isinstance(cursor, arcpy.da.UpdateCursor)):
+        row_class = _rowClass(cursor.fields)
         for row in cursor:
-            yield MutableNamedTuple(zip(cursor.fields, row))
+            yield row_class(row)
 
 
 #def setNewID(table, id_field, where_clause):
@@ -247,17 +355,96 @@ def _name_cursor(cursor):
 #    return new_id
 
 
+# maximum number of key values in each IN (...) list issued by fetchByKeys
+max_keys_per_query = 1000
+
+
+def _sqlValue(value):
+    """format a key value for use in a where clause"""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def fetchByKeys(table, key_field, keys, fields, where_clause=None):
+    """read rows for many key values with one query per chunk of keys and return dict of key to list of rows"""
+    # unique, non-null keys in original order
+    keys = [key for key in dict.fromkeys(keys) if key is not None]
+    rows_dict = {}
+    cursor_fields = [key_field] + [field for field in fields if field != key_field]
+    for start in range(0, len(keys), max_keys_per_query):
+        chunk_where_clause = key_field + ' IN (' + \
+            ','.join(_sqlValue(key) for key in keys[start:start + max_keys_per_query]) + ')'
+        if where_clause:
+            chunk_where_clause += ' AND (' + where_clause + ')'
+        row = None
+        with arcpy.da.SearchCursor(table, cursor_fields, chunk_where_clause) as cursor:
+            for row in searchCursor(cursor):
+                rows_dict.setdefault(row[key_field], []).append(row)
+        if row:
+            del row
+    return rows_dict
+
+
+def getUniqueIDs(table, id_field, object_ids):
+    """Retrieve the Unique IDs for many ObjectIDs as dict of ObjectID to Unique ID"""
+    unique_ids = {}
+    rows_dict = fetchByKeys(table, 'OBJECTID', object_ids, [id_field])
+    for object_id in rows_dict:
+        unique_ids[object_id] = rows_dict[object_id][0][id_field]
+    return unique_ids
+
+
 def getUniqueID(table, id_field, object_id):
     """Retrieve the Unique ID based on the ObjectID"""
-    unique_id = None
-    row = None
-    with arcpy.da.SearchCursor(table, [id_field], 'OBJECTID = ' + str(object_id)) as search_cursor:
-        for row in searchCursor(search_cursor):
-            unique_id = row[id_field]
-    if row:
-        del row
-    del search_cursor
-    return unique_id
+    return getUniqueIDs(table, id_field, [object_id]).get(object_id)
+
+
+def addRowsWithParents(parent_table, parent_values, parent_id_field, child_table, child_fields, child_rows,
+                       chunk_size=1000):
+    """add a parent_table row (parent_values dict of field to value) for each of child_rows, then the child rows with
+    their new parent's parent_id_field value, a chunk at a time in one edit session (enterprise) so that no parent is
+    left without its child; raise if a chunk fails; return count added"""
+    workspace = parent_table.rsplit('/', 1)[0]
+    remote = arcpy.Describe(workspace).workspaceType == 'RemoteDatabase'
+    added = 0
+    for start in range(0, len(child_rows), chunk_size):
+        chunk = child_rows[start:start + chunk_size]
+        editor = None
+        if remote:
+            editor = arcpy.da.Editor(workspace)
+            editor.startEditing(False, False)
+            editor.startOperation()
+        object_ids = []
+        parent_ids = {}
+        try:
+            with arcpy.da.InsertCursor(parent_table, list(parent_values)) as cursor:
+                for child_row in chunk:
+                    object_ids.append(cursor.insertRow(list(parent_values.values())))
+            del cursor
+            parent_ids = getUniqueIDs(parent_table, parent_id_field, object_ids)
+            with arcpy.da.InsertCursor(child_table, child_fields + [parent_id_field]) as cursor:
+                for object_id, child_row in zip(object_ids, chunk):
+                    cursor.insertRow(list(child_row) + [parent_ids[object_id]])
+            del cursor
+        except Exception:
+            if editor:
+                editor.abortOperation()
+                editor.stopEditing(False)
+            else:
+                # nothing to roll back, so remove what the chunk added
+                with BulkWriter(child_table, quiet=True) as writer:
+                    for ids in _idChunks(parent_ids.values()):
+                        writer.deleteRows(parent_id_field + ' IN (' + ids + ')')
+                with BulkWriter(parent_table, quiet=True) as writer:
+                    for ids in _idChunks(object_ids):
+                        writer.deleteRows('OBJECTID IN (' + ids + ')')
+            raise
+        if editor:
+            editor.stopOperation()
+            editor.stopEditing(True)
+        added += len(chunk)
+    return added
 
 
 def checkAddInputDataset(geodatabase, dataset_name, dataset_source_id, date_received,
@@ -294,6 +481,55 @@ def checkField(table, field_name):
     return False
 
 
+# actual field names by table, keyed by logical name (see resolveFieldNames)
+_field_names = {}
+
+
+def _logicalFieldName(name):
+    """lower case field name or alias without join qualification (e.g. MAX_ebarkba.sde.TempX.TempDate ->
+    max_tempdate)"""
+    return re.sub(r'^([a-z]+_)?(?:[\w$]+\.)+', r'\1', name.lower())
+
+
+def resolveFieldNames(table, logical_names):
+    """get dict of logical to actual field names, reading the table's fields only once per table
+    (Enterprise gdbs rename joined and statistics fields, but keep the logical name in the alias); pass a qualified
+    name (e.g. DatasetSource.DatasetType) where joined tables share a field name, as ambiguous names raise"""
+    if table not in _field_names:
+        # alias matches take precedence over name matches
+        table_field_names = ({}, {})
+        for field in arcpy.ListFields(table):
+            for index, name in enumerate([field.aliasName, field.name]):
+                table_field_names[index].setdefault(_logicalFieldName(name), {})[field.name] = name.lower()
+        _field_names[table] = table_field_names
+    resolved = collections.OrderedDict()
+    for logical_name in logical_names:
+        key = _logicalFieldName(logical_name)
+        qualifier = None
+        if '.' in logical_name:
+            qualifier = logical_name.lower().rsplit('.', 1)[0].rsplit('.', 1)[-1]
+        matches = []
+        for table_field_names in _field_names[table]:
+            matches = list(table_field_names.get(key, {}).items())
+            if len(matches) > 0:
+                break
+        if qualifier and len(matches) > 1:
+            matches = [(name, full_name) for name, full_name in matches
+                       if re.search(r'(^|[._])' + re.escape(qualifier) + r'[._]', full_name)]
+        if len(matches) == 0:
+            raise ValueError('Field ' + logical_name + ' not found in ' + table)
+        if len(matches) > 1:
+            raise ValueError('Field ' + logical_name + ' is ambiguous in ' + table + ' (' +
+                             ', '.join(sorted(name for name, full_name in matches)) + ')')
+        resolved[logical_name] = matches[0][0]
+    return resolved
+
+
+def forgetFieldNames(table):
+    """drop cached field names for a table that has been deleted or altered"""
+    _field_names.pop(table, None)
+
+
 def checkAddField(table, field_name, field_type):
     if checkField(table, field_name):
         return True
@@ -301,76 +537,317 @@ def checkAddField(table, field_name, field_type):
     return False
 
 
+class ColumnCalculation:
+    """Calculation for calculateFields that takes whole source columns (dict of field name to list of values, e.g. for
+    NumPy) and returns a list of values, one per row"""
+    def __init__(self, function):
+        self.function = function
+
+
+def calculateFields(table, calculations, source_fields=None, where_clause=None):
+    """set derived fields in one update cursor pass, in place of a CalculateField call (and Python expression/code
+    block evaluation) per field; calculations is a dict of field name to a constant, a function of the source row (dict
+    of source_fields values) or a ColumnCalculation (which takes an extra read pass); return count of rows updated"""
+    source_fields = list(source_fields or [])
+    column_values = {}
+    column_calculations = {field: calculation for field, calculation in calculations.items()
+                           if isinstance(calculation, ColumnCalculation)}
+    if len(column_calculations) > 0:
+        with arcpy.da.SearchCursor(table, ['OID@'] + source_fields, where_clause) as cursor:
+            rows = [row for row in cursor]
+        del cursor
+        columns = {}
+        for index, field in enumerate(source_fields, 1):
+            columns[field] = [row[index] for row in rows]
+        for field, calculation in column_calculations.items():
+            column_values[field] = dict(zip([row[0] for row in rows], calculation.function(columns)))
+
+    cursor_fields = ['OID@'] + source_fields + [field for field in calculations if field not in source_fields]
+    count = 0
+    with arcpy.da.UpdateCursor(table, cursor_fields, where_clause) as cursor:
+        for row in cursor:
+            source_row = dict(zip(source_fields, row[1:len(source_fields) + 1]))
+            values = dict(zip(cursor_fields, row))
+            for field, calculation in calculations.items():
+                if field in column_values:
+                    values[field] = column_values[field][row[0]]
+                elif callable(calculation):
+                    values[field] = calculation(source_row)
+                else:
+                    values[field] = calculation
+            cursor.updateRow([values[field] for field in cursor_fields])
+            count += 1
+    del cursor
+    return count
+
+
+# lookups built from each reference table in a single pass
+# table name: {lookup name: (key field, value field, lower case key)}
+reference_lookups = {'BIOTICS_ELEMENT_NATIONAL': {'species': ('NATIONAL_SCIENTIFIC_NAME', 'SpeciesID', True),
+                                                  'element_species': ('ELEMENT_NATIONAL_ID', 'SpeciesID', False),
+                                                  'species_names': ('SpeciesID', 'NATIONAL_SCIENTIFIC_NAME', False)},
+                     'BIOTICS_ECOSYSTEM': {'ecosystems': ('IVC_SCIENTIFIC_NAME', 'EcosystemID', True),
+                                           #'element_ecosystem': ('ELEMENT_GLOBAL_ID', 'EcosystemID', False)},
+                                           'element_ecosystem': ('ELEMENT_NATIONAL_ID', 'EcosystemID', False)},
+                     'Synonym': {'synonyms': ('SynonymName', 'SynonymID', True),
+                                 'synonym_species': ('SynonymName', 'SpeciesID', True),
+                                 'synonym_names': ('SynonymID', 'SynonymName', False)},
+                     # names and permissions for RangeMapInput (see rangeMapInputCalculations)
+                     'ESTH': {'esth_species': ('SpeciesID', 'SpeciesID', False)},
+                     'InputDataset': {'dataset_sources': ('InputDatasetID', 'DatasetSourceID', False)},
+                     'DatasetSource': {'source_names': ('DatasetSourceID', 'DatasetSourceName', False),
+                                       'source_types': ('DatasetSourceID', 'DatasetType', False),
+                                       'source_jurisdictions': ('DatasetSourceID', 'CDCJurisdictionID', False),
+                                       'source_permit_reviewer': ('DatasetSourceID', 'PermitEBARReviewerApp', False),
+                                       'source_permit_all': ('DatasetSourceID', 'PermitAll', False)}}
+# bump when the snapshot layout changes
+reference_cache_version = 2
+# in-process copy of the lookups, keyed by table path
+_reference_cache = {}
+# open RunProfile, within which lookups of tables without editor tracking are reused
+_reference_run = None
+
+
+def _referenceTableStamp(table):
+    """get (latest edit date, row count) used to decide whether cached lookups are still current"""
+    desc = arcpy.Describe(table)
+    if not getattr(desc, 'editorTrackingEnabled', False) or not desc.editedAtFieldName:
+        # no high-water mark available, so cached only for the current run
+        return None
+    edited_at_field = desc.editedAtFieldName
+    last_edited_date = None
+    with arcpy.da.SearchCursor(table, [edited_at_field], edited_at_field + ' IS NOT NULL',
+                               sql_clause=(None, 'ORDER BY ' + edited_at_field + ' DESC')) as cursor:
+        for row in cursor:
+            last_edited_date = row[0]
+            break
+    return (last_edited_date, int(arcpy.GetCount_management(table)[0]))
+
+
+def _referenceSnapshotFile(table):
+    """path of the local snapshot file for a reference table"""
+    return reference_cache_folder + '/' + hashlib.md5(table.lower().encode('utf-8')).hexdigest() + '.pickle'
+
+
+def _loadReferenceSnapshot(table, stamp):
+    """load lookups from the local snapshot, or return None if missing or stale"""
+    snapshot_file = _referenceSnapshotFile(table)
+    if not os.path.exists(snapshot_file):
+        return None
+    try:
+        with open(snapshot_file, 'rb') as snapshot:
+            snapshot_dict = pickle.load(snapshot)
+    except Exception:
+        return None
+    if snapshot_dict.get('version') != reference_cache_version or snapshot_dict.get('table') != table or \
+        snapshot_dict.get('stamp') != stamp:
+        return None
+    return snapshot_dict['lookups']
+
+
+def _saveReferenceSnapshot(table, stamp, lookups):
+    """save lookups to the local snapshot (failure only costs a re-read next time)"""
+    try:
+        pathlib.Path(reference_cache_folder).mkdir(parents=True, exist_ok=True)
+        snapshot_file = _referenceSnapshotFile(table)
+        with open(snapshot_file + '.tmp', 'wb') as snapshot:
+            pickle.dump({'version': reference_cache_version, 'table': table, 'stamp': stamp, 'lookups': lookups},
+                        snapshot, pickle.HIGHEST_PROTOCOL)
+        os.replace(snapshot_file + '.tmp', snapshot_file)
+    except Exception:
+        pass
+
+
+def readReferenceLookups(geodatabase, table_name):
+    """read all lookups for a reference table in one pass, using in-process and snapshot caches when current (tables
+    without editor tracking are cached in-process only, for the current RunProfile)"""
+    table = geodatabase + '/' + table_name
+    stamp = _referenceTableStamp(table)
+    cache_stamp = stamp or _reference_run
+    if cache_stamp and table in _reference_cache and _reference_cache[table][0] == cache_stamp:
+        return _reference_cache[table][1]
+    if stamp:
+        lookups = _loadReferenceSnapshot(table, stamp)
+        if lookups is not None:
+            _reference_cache[table] = (stamp, lookups)
+            return lookups
+
+    # read table
+    lookup_specs = reference_lookups[table_name]
+    lookups = {}
+    fields = []
+    for lookup in lookup_specs:
+        lookups[lookup] = {}
+        for field in lookup_specs[lookup][0:2]:
+            if field not in fields:
+                fields.append(field)
+    with arcpy.da.SearchCursor(table, fields) as cursor:
+        for row in cursor:
+            for lookup in lookup_specs:
+                key_field, value_field, lower_key = lookup_specs[lookup]
+                key = row[fields.index(key_field)]
+                if lower_key:
+                    key = key.lower()
+                lookups[lookup][key] = row[fields.index(value_field)]
+
+    if cache_stamp:
+        _reference_cache[table] = (cache_stamp, lookups)
+    if stamp:
+        _saveReferenceSnapshot(table, stamp, lookups)
+    return lookups
+
+
+def clearReferenceCache(geodatabase=None):
+    """forget cached lookups (for all geodatabases if none specified), including local snapshots"""
+    for table_name in reference_lookups:
+        for table in list(_reference_cache):
+            if not geodatabase or table == geodatabase + '/' + table_name:
+                del _reference_cache[table]
+        if geodatabase and os.path.exists(_referenceSnapshotFile(geodatabase + '/' + table_name)):
+            os.remove(_referenceSnapshotFile(geodatabase + '/' + table_name))
+    if not geodatabase and os.path.exists(reference_cache_folder):
+        shutil.rmtree(reference_cache_folder, ignore_errors=True)
+
+
+def localEcoshapes(geodatabase, feature_class='EcoshapeCoastalBuffer', messages=None):
+    """path of local file geodatabase copy (spatial and EcoshapeID/JurisdictionID indexed) of ecoshape feature class,
+    refreshed only when the source changes; falls back to the source if the copy can't be built"""
+    source = geodatabase + '/' + feature_class
+    stamp = _referenceTableStamp(source)
+    if not stamp:
+        stamp = (datetime.date.today().toordinal() // ecoshape_cache_max_age_days,
+                 int(arcpy.GetCount_management(source)[0]))
+    cache_prefix = feature_class + '_' + hashlib.md5(source.lower().encode('utf-8')).hexdigest()[:8] + '_'
+    cache_name = cache_prefix + hashlib.md5(repr(stamp).encode('utf-8')).hexdigest()[:8] + '.gdb'
+    cache_gdb = ecoshape_cache_folder + '/' + cache_name
+    ready_file = cache_gdb + '.ready'
+    lock_file = cache_gdb + '.lock'
+    if os.path.exists(ready_file):
+        return cache_gdb + '/' + feature_class
+
+    # only one process refreshes, others wait for it
+    pathlib.Path(ecoshape_cache_folder).mkdir(parents=True, exist_ok=True)
+    lock = None
+    while not lock:
+        try:
+            lock = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if os.path.exists(ready_file):
+                return cache_gdb + '/' + feature_class
+            try:
+                if time.time() - os.path.getmtime(lock_file) > ecoshape_cache_wait_seconds:
+                    # refresh died, so take over
+                    os.remove(lock_file)
+                    continue
+            except OSError:
+                continue
+            time.sleep(5)
+    try:
+        displayMessage(messages, 'Refreshing local copy of ' + feature_class)
+        if arcpy.Exists(cache_gdb):
+            arcpy.Delete_management(cache_gdb)
+        arcpy.CreateFileGDB_management(ecoshape_cache_folder, cache_name)
+        arcpy.CopyFeatures_management(source, cache_gdb + '/' + feature_class)
+        arcpy.AddSpatialIndex_management(cache_gdb + '/' + feature_class)
+        arcpy.AddIndex_management(cache_gdb + '/' + feature_class, 'EcoshapeID', 'ecoshapeid_idx')
+        arcpy.AddIndex_management(cache_gdb + '/' + feature_class, 'JurisdictionID', 'jurisdictionid_idx')
+        with open(ready_file, 'w') as ready:
+            ready.write(repr(stamp))
+    except Exception as e:
+        displayMessage(messages, 'WARNING: could not refresh local copy of ' + feature_class + ' (' + str(e) +
+                       '), so using ' + source)
+        return source
+    finally:
+        os.close(lock)
+        os.remove(lock_file)
+
+    # remove superseded copies (best effort, as they may still be in use)
+    for entry in os.scandir(ecoshape_cache_folder):
+        if entry.name.startswith(cache_prefix) and not entry.name.startswith(cache_name):
+            try:
+                if entry.name.endswith('.gdb'):
+                    arcpy.Delete_management(entry.path)
+                elif entry.name.endswith('.ready'):
+                    os.remove(entry.path)
+            except Exception:
+                pass
+    return cache_gdb + '/' + feature_class
+
+
 def readSpecies(geodatabase):
     """read existing species names and IDs into dict and return"""
-    species_dict = {}
-    with arcpy.da.SearchCursor(geodatabase + '/BIOTICS_ELEMENT_NATIONAL',
-                               ['NATIONAL_SCIENTIFIC_NAME', 'SpeciesID']) as cursor:
-        for row in searchCursor(cursor):
-            species_dict[row['NATIONAL_SCIENTIFIC_NAME'].lower()] = row['SpeciesID']
-        if len(species_dict) > 0:
-            del row
-    return species_dict
+    return dict(readReferenceLookups(geodatabase, 'BIOTICS_ELEMENT_NATIONAL')['species'])
 
 
 def readEcosystems(geodatabase):
     """read existing ecosystem names and IDs into dict and return"""
-    ecosystems_dict = {}
-    with arcpy.da.SearchCursor(geodatabase + '/BIOTICS_ECOSYSTEM',
-                               ['IVC_SCIENTIFIC_NAME', 'EcosystemID']) as cursor:
-        for row in searchCursor(cursor):
-            ecosystems_dict[row['IVC_SCIENTIFIC_NAME'].lower()] = row['EcosystemID']
-        if len(ecosystems_dict) > 0:
-            del row
-    return ecosystems_dict
+    return dict(readReferenceLookups(geodatabase, 'BIOTICS_ECOSYSTEM')['ecosystems'])
 
 
 def readSynonyms(geodatabase):
     """read existing synonyms and IDS into dict and return"""
-    synonym_id_dict = {}
-    with arcpy.da.SearchCursor(geodatabase + '/Synonym', ['SynonymName', 'SynonymID']) as cursor:
-        for row in searchCursor(cursor):
-            synonym_id_dict[row['SynonymName'].lower()] = row['SynonymID']
-    if len(synonym_id_dict) > 0:
-        del row
-    return synonym_id_dict
+    return dict(readReferenceLookups(geodatabase, 'Synonym')['synonyms'])
 
 
 def readSynonymSpecies(geodatabase):
     """read existing synonyms and species IDs into dict return"""
-    synonym_species_id_dict = {}
-    with arcpy.da.SearchCursor(geodatabase + '/Synonym', ['SynonymName', 'SpeciesID']) as cursor:
-        for row in searchCursor(cursor):
-            synonym_species_id_dict[row['SynonymName'].lower()] = row['SpeciesID']
-    if len(synonym_species_id_dict) > 0:
-        del row
-    return synonym_species_id_dict
+    return dict(readReferenceLookups(geodatabase, 'Synonym')['synonym_species'])
 
 
 def readElementSpecies(geodatabase):
     """read existing element and species IDs into dict and return"""
-    element_species_dict = {}
-    with arcpy.da.SearchCursor(geodatabase + '/BIOTICS_ELEMENT_NATIONAL',
-                               ['ELEMENT_NATIONAL_ID', 'SpeciesID']) as cursor:
-        for row in searchCursor(cursor):
-            element_species_dict[row['ELEMENT_NATIONAL_ID']] = row['SpeciesID']
-    if len(element_species_dict) > 0:
-        del row
-    return element_species_dict
+    return dict(readReferenceLookups(geodatabase, 'BIOTICS_ELEMENT_NATIONAL')['element_species'])
 
 
 def readElementEcosystem(geodatabase):
     """read existing element and ecosystem IDs into dict and return"""
-    element_ecosystem_dict = {}
-    with arcpy.da.SearchCursor(geodatabase + '/BIOTICS_ECOSYSTEM',
-                               #['ELEMENT_GLOBAL_ID', 'EcosystemID']) as cursor:
-                               ['ELEMENT_NATIONAL_ID', 'EcosystemID']) as cursor:
-        for row in searchCursor(cursor):
-            element_ecosystem_dict[row['ELEMENT_NATIONAL_ID']] = row['EcosystemID']
-            #element_ecosystem_dict[row['ELEMENT_GLOBAL_ID']] = row['EcosystemID']
-    if len(element_ecosystem_dict) > 0:
-        del row
-    return element_ecosystem_dict
+    return dict(readReferenceLookups(geodatabase, 'BIOTICS_ECOSYSTEM')['element_ecosystem'])
+
+
+# RangeMapInput attributes added to intersected inputs by rangeMapInputCalculations
+range_map_input_attribute_fields = [('NationalScientificName', 'TEXT'), ('SynonymName', 'TEXT'),
+                                    ('DatasetSourceName', 'TEXT'), ('DatasetType', 'TEXT'),
+                                    ('RangeMapInputPermitted', 'SHORT')]
+
+
+def refreshRangeMapInputLookups(geodatabase):
+    """re-read the reference lookups used by rangeMapInputCalculations (e.g. after a sync), so that the next range map
+    run finds current snapshots"""
+    for table_name in ['BIOTICS_ELEMENT_NATIONAL', 'Synonym', 'ESTH', 'InputDataset', 'DatasetSource']:
+        table = geodatabase + '/' + table_name
+        if table in _reference_cache:
+            del _reference_cache[table]
+        if os.path.exists(_referenceSnapshotFile(table)):
+            os.remove(_referenceSnapshotFile(table))
+        readReferenceLookups(geodatabase, table_name)
+
+
+def rangeMapInputCalculations(geodatabase):
+    """calculateFields calculations (from SpeciesID, SynonymID and InputDatasetID) of range_map_input_attribute_fields,
+    using cached lookups in place of BIOTICS_ELEMENT_NATIONAL, Synonym, ESTH, InputDataset and DatasetSource joins;
+    RangeMapInputPermitted is 1 for inputs of species with a national name that may be shown in EBAR Reviewer
+    (dataset source permits it, and it is not a restricted CDC source for a species with ESTH rules)"""
+    species_names = readReferenceLookups(geodatabase, 'BIOTICS_ELEMENT_NATIONAL')['species_names']
+    synonym_names = readReferenceLookups(geodatabase, 'Synonym')['synonym_names']
+    esth_species = readReferenceLookups(geodatabase, 'ESTH')['esth_species']
+    dataset_sources = readReferenceLookups(geodatabase, 'InputDataset')['dataset_sources']
+    sources = readReferenceLookups(geodatabase, 'DatasetSource')
+
+    def permitted(row):
+        source_id = dataset_sources.get(row['InputDatasetID'])
+        if row['SpeciesID'] not in species_names or source_id not in sources['source_names']:
+            return 0
+        if row['SpeciesID'] in esth_species and sources['source_jurisdictions'][source_id] is not None:
+            return 0
+        if sources['source_permit_reviewer'][source_id] == 'Y' or sources['source_permit_all'][source_id] == 'Y':
+            return 1
+        return 0
+
+    return {'NationalScientificName': lambda row: species_names.get(row['SpeciesID']),
+            'SynonymName': lambda row: synonym_names.get(row['SynonymID']),
+            'DatasetSourceName': lambda row: sources['source_names'].get(dataset_sources.get(row['InputDatasetID'])),
+            'DatasetType': lambda row: sources['source_types'].get(dataset_sources.get(row['InputDatasetID'])),
+            'RangeMapInputPermitted': permitted}
 
 
 def checkSpecies(scientific_name, geodatabase):
@@ -541,6 +1018,53 @@ def readDatasetSources(geodatabase, dataset_source_type):
 #     return restriction
 
 
+def readExperts(geodatabase):
+    """read expert names and publish settings into dict keyed by Username and return"""
+    experts_dict = {}
+    row = None
+    with arcpy.da.SearchCursor(geodatabase + '/Expert',
+                               ['Username', 'ExpertName', 'PublishName', 'PublishComments']) as cursor:
+        for row in searchCursor(cursor):
+            experts_dict.setdefault(row['Username'], []).append(row)
+    if row:
+        del row
+    return experts_dict
+
+
+def formatExpertComment(expert_row, review_notes):
+    """format expert name (or Anonymous) and review notes (if published) for reviewer comments"""
+    if expert_row['PublishName']:
+        expert_comment = expert_row['ExpertName']
+    else:
+        expert_comment = 'Anonymous'
+    expert_comment += ' Reviewer Comment - '
+    if expert_row['PublishComments']:
+        if review_notes:
+            expert_comment += review_notes
+    else:
+        expert_comment += 'Unpublished'
+    return expert_comment
+
+
+def readEcoshapeReviews(ecoshape_review_view, table_name_prefix, range_map_ids):
+    """read EcoshapeReviews used for map generation into dict of lists (in view order) keyed by EcoshapeID and return
+    (ecoshape_review_view must join EcoshapeReview to Review)"""
+    ecoshape_reviews = {}
+    review_fields = ['EcoshapeID', 'Markup', 'UsageTypeMarkup', 'EcoshapeReviewNotes', 'Username', 'MigrantStatus']
+    row = None
+    with arcpy.da.SearchCursor(ecoshape_review_view,
+                               [table_name_prefix + 'EcoshapeReview.' + field for field in review_fields],
+                               table_name_prefix + 'Review.RangeMapID IN (' + range_map_ids + ') AND ' +
+                               table_name_prefix + 'Review.UseForMapGen = 1 AND ' + table_name_prefix +
+                               'EcoshapeReview.UseForMapGen = 1') as cursor:
+        for row in cursor:
+            review = dict(zip(review_fields, row))
+            ecoshape_reviews.setdefault(review['EcoshapeID'], []).append(review)
+    if row:
+        del row
+    return ecoshape_reviews
+
+
 def getTableNamePrefix(geodatabase):
     """get table name prefix (needed for joined tables and feature classes in enterprise geodatabases)"""
     table_name_prefix = ''
@@ -1048,6 +1572,8 @@ def getTaxonAttributes(global_unique_id, element_global_id, range_map_id, messag
     #results = content['results']
 
     # try NSX
+    # imported here so that EBARUtils loads on machines without it (e.g. with ArcpyFake)
+    import requests
     results = None
     try:
         result = requests.get(nsx_taxon_search_url + global_unique_id)
@@ -1291,52 +1817,263 @@ def getDetailsForRangeMap(geodatabase, range_map_id):
 
 def getRelatedRangeMapIDs(geodatabase, range_map_id):
     """Get all RangeMapIDs as string based on primary and secondary species and scope for passed range map"""
-    range_map_ids = None
-    secondary_species = {}
-
     # primary
-    range_map_ids = str(range_map_id)
+    primary_species_id = None
+    scope = None
     with arcpy.da.SearchCursor(geodatabase + '/RangeMap', ['SpeciesID', 'RangeMapScope'],
                                'RangeMapID = ' + str(range_map_id)) as cursor:
         for row in searchCursor(cursor):
             primary_species_id = row['SpeciesID']
             scope = row['RangeMapScope']
-    del row
-    del cursor
-
-    # secondary
-    with arcpy.da.SearchCursor(geodatabase + '/SecondarySpecies', ['SpeciesID'],
-                               'RangeMapID = ' + str(range_map_id)) as cursor:
-        for row in searchCursor(cursor):
-            # add to dict with unmatched flag
-            secondary_species[row['SpeciesID']] = False
-    if len(secondary_species) > 0:
-        # found at least one
-        del row
-    del cursor
+        if primary_species_id:
+            del row
+    if not primary_species_id:
+        return str(range_map_id)
 
-    # get related
+    # candidates with same primary species and scope
+    candidate_ids = []
     with arcpy.da.SearchCursor(geodatabase + '/RangeMap', ['RangeMapID'],
                                'SpeciesID = ' + str(primary_species_id) + " AND RangeMapScope = '" + scope +
                                "'") as cursor:
-        row = None
         for row in searchCursor(cursor):
-            # ensure SecondarySpecies, if any, also match
-            sec_row = None
-            with arcpy.da.SearchCursor(geodatabase + '/SecondarySpecies', ['SpeciesID'],
-                                       'RangeMapID = ' + str(row['RangeMapID'])) as sec_cursor:
-                for sec_row in searchCursor(sec_cursor):
-                    # add/update dict with matched flag
-                    secondary_species[sec_row['SpeciesID']] = True
-            if all(secondary_species.values()):
-                range_map_ids + ',' +  str(row['RangeMapID']) 
+            if row['RangeMapID'] != range_map_id:
+                candidate_ids.append(row['RangeMapID'])
+        if len(candidate_ids) > 0:
+            del row
 
+    # secondary species for passed range map and all candidates in one pass
+    secondary_rows = fetchByKeys(geodatabase + '/SecondarySpecies', 'RangeMapID', [range_map_id] + candidate_ids,
+                                 ['SpeciesID'])
+    secondary_species = set(row['SpeciesID'] for row in secondary_rows.get(range_map_id, []))
+
+    # related if candidate SecondarySpecies, if any, also match (same species, no more and no fewer)
+    range_map_ids = str(range_map_id)
+    for candidate_id in candidate_ids:
+        # dict with unmatched flag
+        matched = dict.fromkeys(secondary_species, False)
+        extra = False
+        for row in secondary_rows.get(candidate_id, []):
+            if row['SpeciesID'] in matched:
+                matched[row['SpeciesID']] = True
+            else:
+                extra = True
+        if all(matched.values()) and not extra:
+            range_map_ids += ',' + str(candidate_id)
     return range_map_ids
 
 
+def mergeByKey(left_rows, right_rows, left_key, right_key):
+    """yield each left row with list of matching right rows, for named rows both sorted ascending by key
+    (sort-merge, so each input is read only once)"""
+    right_rows = iter(right_rows)
+    right_row = next(right_rows, None)
+    group_key = None
+    group = []
+    for left_row in left_rows:
+        key = left_row[left_key]
+        if key != group_key or len(group) == 0:
+            group_key = key
+            group = []
+            # skip unmatched right rows
+            while right_row is not None and right_row[right_key] < key:
+                right_row = next(right_rows, None)
+            while right_row is not None and right_row[right_key] == key:
+                group.append(right_row)
+                right_row = next(right_rows, None)
+        yield left_row, group
+
+
+def formatSourceSummary(frequency, dataset_source_name, min_min_date, max_max_date, min_max_date):
+    """format count, dataset source name and year range for range map input summaries"""
+    summary = str(frequency) + ' ' + dataset_source_name
+    if max_max_date:
+        min_year = max_max_date.year
+        max_year = max_max_date.year
+        if min_max_date.year < min_year:
+            min_year = min_max_date.year
+        if min_min_date:
+            if min_min_date.year < min_year:
+                min_year = min_min_date.year
+        summary += ' ('
+        if min_year < max_year:
+            summary += str(min_year) + '-'
+        summary += str(max_year) + ')'
+    return summary
+
+
+# InputFeedback exclusions, read once per geodatabase and shared by all callers of inputSelect
+# exclusions are removed by IN (...) lists of up to this many IDs
+exclusion_list_max_ids = 1000
+# in-process copy of the exclusion index, keyed by InputFeedback table path
+_exclusion_cache = {}
+
+
+def readInputExclusions(geodatabase):
+    """read InputFeedback exclusions in one pass into {input type: {'all': set of IDs excluded from all range maps,
+    'range_maps': {RangeMapID: set of IDs}}}, using the in-process copy when InputFeedback is unchanged"""
+    table = geodatabase + '/InputFeedback'
+    stamp = _referenceTableStamp(table)
+    if stamp and table in _exclusion_cache and _exclusion_cache[table][0] == stamp:
+        return _exclusion_cache[table][1]
+
+    exclusions = {}
+    for input_features in input_ecoshape_types:
+        exclusions[input_features] = {'all': set(), 'range_maps': {}}
+    with arcpy.da.SearchCursor(table, [input_features + 'ID' for input_features in input_ecoshape_types] +
+                               ['ExcludeFromRangeMapID', 'ExcludeFromAllRangeMaps'],
+                               'ExcludeFromAllRangeMaps = 1 OR ExcludeFromRangeMapID IS NOT NULL') as cursor:
+        for row in cursor:
+            for index, input_features in enumerate(input_ecoshape_types):
+                if not row[index]:
+                    continue
+                if row[4] == 1:
+                    exclusions[input_features]['all'].add(row[index])
+                if row[3]:
+                    exclusions[input_features]['range_maps'].setdefault(row[3], set()).add(row[index])
+    del cursor
+
+    if stamp:
+        _exclusion_cache[table] = (stamp, exclusions)
+    return exclusions
+
+
+def clearExclusionCache(geodatabase=None):
+    """forget cached exclusions (for all geodatabases if none specified)"""
+    for table in list(_exclusion_cache):
+        if not geodatabase or table == geodatabase + '/InputFeedback':
+            del _exclusion_cache[table]
+
+
+def excludedInputIDs(exclusions, input_features, range_map_id):
+    """set of input_features IDs excluded from range_map_id (directly or from all range maps)"""
+    return exclusions[input_features]['all'] | exclusions[input_features]['range_maps'].get(range_map_id, set())
+
+
+def removeExcluded(input_layer, input_features, excluded_ids, table_name_prefix):
+    """remove excluded_ids from the selection on input_layer, by IN (...) lists of up to exclusion_list_max_ids"""
+    id_field = table_name_prefix + input_features + '.' + input_features + 'ID'
+    excluded_ids = sorted(excluded_ids)
+    for start in range(0, len(excluded_ids), exclusion_list_max_ids):
+        arcpy.SelectLayerByAttribute_management(input_layer, 'REMOVE_FROM_SELECTION', id_field + ' IN (' +
+                                                ','.join([str(excluded_id) for excluded_id in
+                                                          excluded_ids[start:start + exclusion_list_max_ids]]) + ')')
+
+
 def inputSelectAndBuffer(geodatabase, input_features, range_map_id, table_name_prefix, species_ids, start_time,
-                         range_date):
-    """Select relevant input features and (for points and lines) buffer them"""
+                         range_date, scratch=None, exclusions=None):
+    """Select relevant input features and (for points and lines) buffer them (into scratch if passed), reusing
+    cached buffers when the selected inputs are unchanged"""
+    input_layer = inputSelect(geodatabase, input_features, range_map_id, table_name_prefix, species_ids, range_date,
+                              scratch, exclusions)
+    shape_type = arcpy.Describe(input_features).shapeType
+    if shape_type not in ('Point', 'Polyline') or not buffer_cache_enabled:
+        return bufferInputs(input_layer, shape_type, start_time, scratch)
+
+    buffer_name = 'TempPointBuffer' if shape_type == 'Point' else 'TempLineBuffer'
+    if scratch:
+        buffered_polygons = scratch.name(buffer_name)
+    else:
+        buffered_polygons = tempName(buffer_name, start_time)
+    hasher = hashlib.md5()
+    hasher.update(repr((geodatabase, input_features, default_buffer_size)).encode('utf-8'))
+    _hashRows(hasher, input_layer, None, True)
+    cached = _cachedBuffer(input_features, species_ids, hasher.hexdigest())
+    if cached:
+        arcpy.CopyFeatures_management(cached, buffered_polygons)
+        return buffered_polygons
+    buffered_polygons = bufferInputs(input_layer, shape_type, start_time, scratch)
+    _storeBuffer(input_features, species_ids, hasher.hexdigest(), buffered_polygons)
+    return buffered_polygons
+
+
+def _bufferCacheName(input_features, species_ids, fingerprint):
+    """file geodatabase name of a cached buffer"""
+    return input_features + '_' + hashlib.md5(str(species_ids).encode('utf-8')).hexdigest()[:8] + '_' + \
+        fingerprint[:16] + '.gdb'
+
+
+def _cachedBuffer(input_features, species_ids, fingerprint):
+    """path of cached buffer for fingerprint, or None if not (yet) cached"""
+    cache_gdb = buffer_cache_folder + '/' + _bufferCacheName(input_features, species_ids, fingerprint)
+    ready_file = cache_gdb + '.ready'
+    if not os.path.exists(ready_file):
+        return None
+    try:
+        # mark as used, so the sweep keeps it
+        os.utime(ready_file)
+    except OSError:
+        return None
+    return cache_gdb + '/Buffer'
+
+
+def _storeBuffer(input_features, species_ids, fingerprint, buffered_polygons):
+    """copy buffer into the cache (best effort, skipped if another process is storing the same one), then sweep
+    cached buffers unused for buffer_cache_max_age_days"""
+    cache_name = _bufferCacheName(input_features, species_ids, fingerprint)
+    cache_gdb = buffer_cache_folder + '/' + cache_name
+    lock_file = cache_gdb + '.lock'
+    pathlib.Path(buffer_cache_folder).mkdir(parents=True, exist_ok=True)
+    try:
+        lock = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if not _staleLock(lock_file, buffer_cache_lock_seconds):
+            return
+        # store died, so take over
+        try:
+            os.remove(lock_file)
+            lock = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            return
+    try:
+        os.write(lock, (str(os.getpid()) + ' ' + str(datetime.datetime.now())).encode('utf-8'))
+        if arcpy.Exists(cache_gdb):
+            arcpy.Delete_management(cache_gdb)
+        arcpy.CreateFileGDB_management(buffer_cache_folder, cache_name)
+        arcpy.CopyFeatures_management(buffered_polygons, cache_gdb + '/Buffer')
+        with open(cache_gdb + '.ready', 'w') as ready:
+            ready.write(fingerprint)
+    except Exception:
+        pass
+    finally:
+        os.close(lock)
+        os.remove(lock_file)
+
+    for entry in os.scandir(buffer_cache_folder):
+        if entry.name.endswith('.ready') and \
+                time.time() - entry.stat().st_mtime > buffer_cache_max_age_days * 24 * 60 * 60:
+            try:
+                os.remove(entry.path)
+                arcpy.Delete_management(entry.path[:-len('.ready')])
+            except Exception:
+                pass
+
+
+def _staleLock(lock_file, max_seconds):
+    """True if lock_file (holding the owner's process id) is older than max_seconds, or its owner has died (checked
+    only with psutil)"""
+    try:
+        if time.time() - os.path.getmtime(lock_file) > max_seconds:
+            return True
+        with open(lock_file, 'r') as lock:
+            owner = lock.read().split(' ', 1)[0]
+    except OSError:
+        return False
+    if not psutil or not owner.isdigit():
+        # unknown (or not yet written) owner, so wait for the lock to age
+        return False
+    return not psutil.pid_exists(int(owner))
+
+
+def clearBufferCache():
+    """delete all cached buffers"""
+    if os.path.exists(buffer_cache_folder):
+        shutil.rmtree(buffer_cache_folder, ignore_errors=True)
+
+
+def inputSelect(geodatabase, input_features, range_map_id, table_name_prefix, species_ids, range_date, scratch=None,
+                exclusions=None):
+    """Select relevant input features in a layer (named input_features + '_layer') and return the layer name;
+    exclusions (from readInputExclusions) are read if not passed"""
     # determine input type and make layer
     desc = arcpy.Describe(input_features)
     if arcpy.Exists(input_features + '_layer'):
@@ -1389,74 +2126,378 @@ def inputSelectAndBuffer(geodatabase, input_features, range_map_id, table_name_p
     # return
 
     # remove excluded points from selection
-    arcpy.AddJoin_management(input_features + '_layer', input_features + 'ID', geodatabase + '/InputFeedback',
-                             input_features + 'ID')
     #arcpy.SelectLayerByAttribute_management(input_features + '_layer', 'REMOVE_FROM_SELECTION', table_name_prefix +
     #                                        'InputFeedback.ExcludeFromRangeMapID = ' + str(range_map_id) +
     #                                        ' OR ' + table_name_prefix + 'InputFeedback.ExcludeFromAllRangeMaps = 1')
     # line above does not always behave as expected against enterprise gdb, probably due to outer join!
-    # build list of excluded records
-    excluded_ids = ''
-    with arcpy.da.SearchCursor(input_features + '_layer',
-                               [table_name_prefix + input_features + '.' + input_features + 'ID',
-                                table_name_prefix + 'InputFeedback.ExcludeFromRangeMapID',
-                                table_name_prefix + 'InputFeedback.ExcludeFromAllRangeMaps']) as cursor:
-        row = None
-        for row in searchCursor(cursor):
-            exclude = False
-            if row[table_name_prefix + 'InputFeedback.ExcludeFromRangeMapID']:
-                if row[table_name_prefix + 'InputFeedback.ExcludeFromRangeMapID'] == range_map_id:
-                    exclude = True
-            if row[table_name_prefix + 'InputFeedback.ExcludeFromAllRangeMaps']:
-                if row[table_name_prefix + 'InputFeedback.ExcludeFromAllRangeMaps'] == 1:
-                    exclude = True
-            if exclude:
-                if len(excluded_ids) > 0:
-                    excluded_ids += ','
-                excluded_ids += str(row[table_name_prefix + input_features + '.' + input_features + 'ID'])
-    if row:
-        del row
-    del cursor
-    arcpy.RemoveJoin_management(input_features + '_layer', table_name_prefix + 'InputFeedback')
-    if len(excluded_ids) > 0:
-        arcpy.SelectLayerByAttribute_management(input_features + '_layer', 'REMOVE_FROM_SELECTION',
-                                                table_name_prefix + input_features + '.' + input_features + 'ID IN (' +
-                                                excluded_ids + ')')
-
-    # buffer
-    if desc.shapeType == 'Point':
-        temp_points = 'TempPoints' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+    if exclusions is None:
+        exclusions = readInputExclusions(geodatabase)
+    removeExcluded(input_features + '_layer', input_features,
+                   excludedInputIDs(exclusions, input_features, range_map_id), table_name_prefix)
+    return input_features + '_layer'
+
+
+def bufferDistance(accuracy):
+    """point buffer distance (metres) for accuracy, defaulting when not provided"""
+    if not accuracy or accuracy <= 0:
+        return default_buffer_size
+    return accuracy
+
+
+def bufferInputs(input_layer, shape_type, start_time, scratch=None):
+    """Buffer points (by accuracy) and lines (by default_buffer_size) in input_layer (into scratch if passed); return
+    buffered feature class, or the layer itself for polygons"""
+    if shape_type == 'Point':
+        if scratch:
+            temp_points = scratch.name('TempPoints')
+        else:
+            temp_points = tempName('TempPoints', start_time)
         # add and calculate field based on accuracy
-        #checkAddField(input_features + '_layer', 'buffer', 'LONG')
-        arcpy.CopyFeatures_management(input_features + '_layer', temp_points)
+        #checkAddField(input_layer, 'buffer', 'LONG')
+        arcpy.CopyFeatures_management(input_layer, temp_points)
         checkAddField(temp_points, 'buffer', 'LONG')
-        code_block = '''
-def GetBuffer(accuracy):
-    ret = accuracy
-    if not ret:
-        ret = ''' + str(default_buffer_size) + '''
-    elif ret <= 0:
-        ret = ''' + str(default_buffer_size) + '''
-    return ret'''
-        # arcpy.CalculateField_management(input_features + '_layer', 'buffer', 'GetBuffer(!Accuracy!)', 'PYTHON3', code_block)
-        arcpy.CalculateField_management(temp_points, 'buffer', 'GetBuffer(!Accuracy!)', 'PYTHON3', code_block)
-        buffered_polygons = 'TempPointBuffer' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-        # arcpy.Buffer_analysis(input_features + '_layer', buffered_polygons, 'buffer')
+        calculateFields(temp_points, {'buffer': lambda row: bufferDistance(row['Accuracy'])}, ['Accuracy'])
+        if scratch:
+            buffered_polygons = scratch.name('TempPointBuffer')
+        else:
+            buffered_polygons = tempName('TempPointBuffer', start_time)
+        # arcpy.Buffer_analysis(input_layer, buffered_polygons, 'buffer')
         arcpy.Buffer_analysis(temp_points, buffered_polygons, 'buffer')
         if arcpy.Exists(temp_points):
             arcpy.Delete_management(temp_points)
-    elif desc.shapeType == 'Polyline':
-        buffered_polygons = 'TempLineBuffer' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-        arcpy.Buffer_analysis(input_features + '_layer', buffered_polygons, default_buffer_size)
+    elif shape_type == 'Polyline':
+        if scratch:
+            buffered_polygons = scratch.name('TempLineBuffer')
+        else:
+            buffered_polygons = tempName('TempLineBuffer', start_time)
+        arcpy.Buffer_analysis(input_layer, buffered_polygons, default_buffer_size)
     else:
         # no buffering applied to polygons
-        buffered_polygons = input_features + '_layer'
+        buffered_polygons = input_layer
     return buffered_polygons
 
 
+def intersectInputsWithEcoshapes(inputs, ecoshape_layer, output, scratch, point_where_clause=None):
+    """pairwise intersect (buffered) inputs with ecoshapes into output and return count of inputs that skipped the
+    overlay; point buffers (inputs matching point_where_clause) that don't reach an ecoshape boundary lie wholly within
+    their ecoshape(s), so they are assigned by a within join instead of being overlaid, giving the same pieces and
+    input/ecoshape associations as intersecting everything"""
+    if not point_where_clause:
+        arcpy.PairwiseIntersect_analysis([inputs, ecoshape_layer], output)
+        return 0
+
+    # ecoshape boundaries as lines (via geometry, as the conversion tools need an Advanced license)
+    boundaries = scratch.name('TempEcoshapeBoundaries')
+    arcpy.CreateFeatureclass_management(scratch.workspace, scratch.tableName(boundaries), 'POLYLINE',
+                                        spatial_reference=arcpy.Describe(ecoshape_layer).spatialReference)
+    with arcpy.da.SearchCursor(ecoshape_layer, ['SHAPE@']) as search_cursor:
+        with arcpy.da.InsertCursor(boundaries, ['SHAPE@']) as insert_cursor:
+            for row in search_cursor:
+                insert_cursor.insertRow([row[0].boundary()])
+    del search_cursor, insert_cursor
+
+    # flag point buffers that don't cross any boundary
+    arcpy.MakeFeatureLayer_management(inputs, 'point_inputs_layer', point_where_clause)
+    scratch.track('point_inputs_layer')
+    arcpy.SelectLayerByLocation_management('point_inputs_layer', 'INTERSECT', boundaries, None, 'NEW_SELECTION',
+                                           'INVERT')
+    fid_set = arcpy.Describe('point_inputs_layer').FIDSet
+    interior_fids = set(int(fid) for fid in fid_set.split(';')) if fid_set else set()
+    interior_count = len(interior_fids)
+    arcpy.Delete_management('point_inputs_layer')
+    checkAddField(inputs, 'EcoshapeOverlay', 'SHORT')
+    calculateFields(inputs, {'EcoshapeOverlay': lambda row: 0 if row['OID@'] in interior_fids else 1}, ['OID@'])
+
+    # overlay the rest
+    arcpy.MakeFeatureLayer_management(inputs, 'overlay_inputs_layer', 'EcoshapeOverlay = 1')
+    scratch.track('overlay_inputs_layer')
+    arcpy.PairwiseIntersect_analysis(['overlay_inputs_layer', ecoshape_layer], output)
+    arcpy.Delete_management('overlay_inputs_layer')
+
+    # join interior point buffers to the ecoshape(s) they are within, with intersect FID fields, and append
+    if interior_count > 0:
+        arcpy.MakeFeatureLayer_management(inputs, 'interior_inputs_layer', 'EcoshapeOverlay = 0')
+        scratch.track('interior_inputs_layer')
+        interior_join = scratch.name('TempInteriorJoin')
+        arcpy.SpatialJoin_analysis('interior_inputs_layer', ecoshape_layer, interior_join, 'JOIN_ONE_TO_MANY',
+                                   'KEEP_COMMON', None, 'WITHIN')
+        arcpy.Delete_management('interior_inputs_layer')
+        input_fid_field = 'FID_' + scratch.tableName(inputs)
+        fid_calculations = {}
+        for field in arcpy.ListFields(output, 'FID_*'):
+            checkAddField(interior_join, field.name, 'LONG')
+            if field.name.lower() == input_fid_field.lower():
+                fid_calculations[field.name] = lambda row: row['TARGET_FID']
+            else:
+                fid_calculations[field.name] = lambda row: row['JOIN_FID']
+        calculateFields(interior_join, fid_calculations, ['TARGET_FID', 'JOIN_FID'])
+        arcpy.Append_management(interior_join, output, 'NO_TEST')
+    return interior_count
+
+
+# InputEcoshape table (InputPointID, InputLineID, InputPolygonID and EcoshapeID fields) records which ecoshapes each
+# (buffered) input overlaps, so that range maps can be generated from it without spatial processing; the import and
+# feedback tools keep it current, inputs that overlap no ecoshape get a row with null EcoshapeID, and inputs with no
+# rows (e.g. imported before the table existed, or no longer flagged bad or excluded) get associated on first use;
+# InputEcoshapeStamp table (Stamp text field, one row) records the Ecoshape and EcoshapeCoastalBuffer versions the
+# rows were built from, and rows built from other versions are cleared by the next update (and not used until then)
+input_ecoshape_types = ['InputPoint', 'InputLine', 'InputPolygon']
+# bump to invalidate all stored associations (e.g. when buffering logic changes)
+input_ecoshape_version = 1
+
+
+def checkInputEcoshapeTable(geodatabase):
+    """check whether the InputEcoshape table of input/ecoshape associations (and its stamp table) exists"""
+    return arcpy.Exists(geodatabase + '/InputEcoshape') and arcpy.Exists(geodatabase + '/InputEcoshapeStamp')
+
+
+def inputEcoshapeStamp(geodatabase):
+    """current ecoshape versions that associations depend on, or None if unknown (no editor tracking)"""
+    stamps = [_referenceTableStamp(geodatabase + '/' + feature_class)
+              for feature_class in ['Ecoshape', 'EcoshapeCoastalBuffer']]
+    if None in stamps:
+        return None
+    return repr((input_ecoshape_version, stamps))
+
+
+def readInputEcoshapeStamp(geodatabase):
+    """ecoshape versions that the stored associations were built from"""
+    stamp = None
+    with arcpy.da.SearchCursor(geodatabase + '/InputEcoshapeStamp', ['Stamp']) as cursor:
+        for row in cursor:
+            stamp = row[0]
+    del cursor
+    return stamp
+
+
+def checkInputEcoshapeStamp(geodatabase):
+    """check whether the stored associations were built from the current ecoshapes"""
+    stamp = inputEcoshapeStamp(geodatabase)
+    return stamp is not None and readInputEcoshapeStamp(geodatabase) == stamp
+
+
+def validateInputEcoshapes(geodatabase, messages=None):
+    """clear stored associations built from other ecoshapes and record the current stamp; return True if
+    associations can be stored"""
+    stamp = inputEcoshapeStamp(geodatabase)
+    if stamp is None:
+        return False
+    if readInputEcoshapeStamp(geodatabase) == stamp:
+        return True
+    displayMessage(messages, 'Clearing InputEcoshape associations built from other Ecoshapes')
+    with BulkWriter(geodatabase + '/InputEcoshape', quiet=True) as writer:
+        writer.deleteRows('1 = 1')
+    with BulkWriter(geodatabase + '/InputEcoshapeStamp', ['Stamp'], quiet=True) as writer:
+        writer.deleteRows('1 = 1')
+        writer.insertRow([stamp])
+    return True
+
+
+def _idChunks(input_ids):
+    """input IDs in chunks of max_keys_per_query, each as a comma-separated string"""
+    input_ids = list(input_ids)
+    for start in range(0, len(input_ids), max_keys_per_query):
+        yield ','.join(map(str, input_ids[start:start + max_keys_per_query]))
+
+
+def readInputEcoshapes(geodatabase, input_features, input_ids):
+    """dict of input ID to list of associated EcoshapeIDs (empty if none overlap) for those of input_ids of
+    input_features (InputPoint, InputLine or InputPolygon) that have been associated"""
+    id_field = input_features + 'ID'
+    associations = {}
+    for key, rows in fetchByKeys(geodatabase + '/InputEcoshape', id_field, input_ids, ['EcoshapeID']).items():
+        associations[key] = [row['EcoshapeID'] for row in rows if row['EcoshapeID'] is not None]
+    return associations
+
+
+def updateInputEcoshapes(geodatabase, input_features, where_clause=None, input_ids=None, messages=None):
+    """associate inputs of input_features (InputPoint, InputLine or InputPolygon) matching where_clause or input_ids
+    with the ecoshapes their buffers overlap (as for range maps), replacing any existing InputEcoshape rows; return
+    count of inputs associated"""
+    if not checkInputEcoshapeTable(geodatabase) or not validateInputEcoshapes(geodatabase, messages):
+        return 0
+    id_field = input_features + 'ID'
+    if input_ids is not None:
+        input_ids = list(input_ids)
+        if len(input_ids) == 0:
+            return 0
+    with ScratchWorkspace(messages=messages) as scratch:
+        input_layer = input_features + '_ecoshape_layer'
+        arcpy.MakeFeatureLayer_management(geodatabase + '/' + input_features, input_layer, where_clause)
+        scratch.track(input_layer)
+        if input_ids is not None:
+            arcpy.SelectLayerByAttribute_management(input_layer, 'CLEAR_SELECTION')
+            for chunk in _idChunks(input_ids):
+                arcpy.SelectLayerByAttribute_management(input_layer, 'ADD_TO_SELECTION',
+                                                        id_field + ' IN (' + chunk + ')')
+        with arcpy.da.SearchCursor(input_layer, [id_field]) as cursor:
+            associations = {row[0]: set() for row in cursor}
+        del cursor
+        if len(associations) == 0:
+            return 0
+
+        # buffer and intersect as for range maps
+        buffered = bufferInputs(input_layer, arcpy.Describe(input_layer).shapeType, scratch.start_time, scratch)
+        point_where_clause = None
+        if input_features == 'InputPoint':
+            point_where_clause = '1 = 1'
+        temp_intersect = scratch.name('TempInputEcoshapeIntersect')
+        intersectInputsWithEcoshapes(buffered, localEcoshapes(geodatabase, 'EcoshapeCoastalBuffer', messages),
+                                     temp_intersect, scratch, point_where_clause)
+        with arcpy.da.SearchCursor(temp_intersect, [id_field, 'EcoshapeID']) as cursor:
+            for row in cursor:
+                associations[row[0]].add(row[1])
+        del cursor
+
+        # replace existing rows
+        with BulkWriter(geodatabase + '/InputEcoshape', [id_field, 'EcoshapeID'], messages=messages,
+                        quiet=True) as writer:
+            for chunk in _idChunks(associations):
+                writer.deleteRows(id_field + ' IN (' + chunk + ')')
+            for input_id, ecoshape_ids in associations.items():
+                for ecoshape_id in sorted(ecoshape_ids) or [None]:
+                    writer.insertRow([input_id, ecoshape_id])
+    return len(associations)
+
+
+def deleteInputEcoshapes(geodatabase, input_features, input_ids):
+    """delete InputEcoshape rows of input_ids of input_features (e.g. inputs deleted, flagged bad or excluded from
+    all range maps); return count of rows deleted"""
+    if not checkInputEcoshapeTable(geodatabase):
+        return 0
+    with BulkWriter(geodatabase + '/InputEcoshape', quiet=True) as writer:
+        for chunk in _idChunks(input_ids):
+            writer.deleteRows(input_features + 'ID IN (' + chunk + ')')
+    return writer.rows_deleted
+
+
+# bump to invalidate all stored range map input fingerprints (e.g. when generation logic changes)
+input_fingerprint_version = 1
+
+
+def _hashRows(hasher, table, where_clause=None, include_shape=False, collect_field=None):
+    """feed matching rows into hasher, in a stable order: with editor tracking just ObjectID and last edit date (which
+    change with any edit, including to shape), otherwise all non-geometry fields (and optionally shape); return set of
+    collect_field values of the rows"""
+    desc = arcpy.Describe(table)
+    if getattr(desc, 'editorTrackingEnabled', False) and desc.editedAtFieldName:
+        fields = ['OID@', desc.editedAtFieldName]
+        include_shape = False
+    else:
+        fields = [field.name for field in arcpy.ListFields(table)
+                  if field.type not in ('Geometry', 'Raster', 'Blob', 'GlobalID')]
+    if collect_field:
+        fields.append(collect_field)
+    if include_shape:
+        fields.append('SHAPE@WKB')
+    collected = set()
+    row_hashes = []
+    with arcpy.da.SearchCursor(table, fields, where_clause) as cursor:
+        for row in cursor:
+            if include_shape:
+                row = row[:-1] + (hashlib.md5(bytes(row[-1] or b'')).hexdigest(),)
+            if collect_field:
+                collected.add(row[len(fields) - 2 if include_shape else len(fields) - 1])
+            row_hashes.append(hashlib.md5(repr(row).encode('utf-8')).hexdigest())
+    del cursor
+    row_hashes.sort()
+    hasher.update((table + '|' + ','.join(fields) + '|' + str(len(row_hashes)) + '\n').encode('utf-8'))
+    for row_hash in row_hashes:
+        hasher.update(row_hash.encode('utf-8'))
+    return collected
+
+
+def _hashRowsByKeys(hasher, table, key_field, keys, collect_field=None):
+    """_hashRows for the rows with key_field in keys (queried in chunks); return set of collect_field values"""
+    collected = set()
+    keys = sorted(key for key in keys if key is not None)
+    for start in range(0, len(keys), max_keys_per_query):
+        chunk = keys[start:start + max_keys_per_query]
+        if isinstance(chunk[0], str):
+            key_list = ','.join("'" + key.replace("'", "''") + "'" for key in chunk)
+        else:
+            key_list = ','.join(str(key) for key in chunk)
+        collected |= _hashRows(hasher, table, key_field + ' IN (' + key_list + ')', collect_field=collect_field)
+    return collected
+
+
+def checkInputFingerprintField(geodatabase):
+    """check whether RangeMap has the InputFingerprint field needed to skip regeneration of unchanged range maps"""
+    return len(arcpy.ListFields(geodatabase + '/RangeMap', 'InputFingerprint')) > 0
+
+
+def checkRangeMapInputPendingField(geodatabase):
+    """check whether RangeMap has the RangeMapInputPending field needed to defer RangeMapInput generation"""
+    return len(arcpy.ListFields(geodatabase + '/RangeMap', 'RangeMapInputPending')) > 0
+
+
+def computeInputFingerprint(geodatabase, range_map_id, species_ids, review_range_map_ids, settings,
+                            custom_polygons=None):
+    """content fingerprint of everything that feeds range map generation: settings (list of parameter values), selected
+    inputs and their feedback, their datasets and sources, species, synonyms and ESTH, reviews of related range maps
+    and their experts, any custom polygons and the current year (which ages inputs into historical)"""
+    hasher = hashlib.md5()
+    hasher.update(repr([input_fingerprint_version, datetime.datetime.now().year] + list(settings)).encode('utf-8'))
+    input_dataset_ids = set()
+    for input_features in ['InputPoint', 'InputLine', 'InputPolygon']:
+        id_field = input_features + 'ID'
+        input_where = 'SpeciesID IN (' + species_ids + ')'
+        if range_map_id:
+            input_where += ' OR ' + id_field + ' IN (SELECT ' + id_field + \
+                ' FROM SecondaryInput WHERE RangeMapID = ' + str(range_map_id) + ')'
+        input_dataset_ids |= _hashRows(hasher, geodatabase + '/' + input_features, input_where, True, 'InputDatasetID')
+        _hashRows(hasher, geodatabase + '/InputFeedback',
+                  id_field + ' IN (SELECT ' + id_field + ' FROM ' + input_features + ' WHERE ' + input_where + ')')
+    if range_map_id:
+        _hashRows(hasher, geodatabase + '/SecondaryInput', 'RangeMapID = ' + str(range_map_id))
+    # only the datasets and sources of the selected inputs
+    dataset_source_ids = _hashRowsByKeys(hasher, geodatabase + '/InputDataset', 'InputDatasetID', input_dataset_ids,
+                                         'DatasetSourceID')
+    _hashRowsByKeys(hasher, geodatabase + '/DatasetSource', 'DatasetSourceID', dataset_source_ids)
+    _hashRows(hasher, geodatabase + '/BIOTICS_ELEMENT_NATIONAL', 'SpeciesID IN (' + species_ids + ')')
+    _hashRows(hasher, geodatabase + '/Synonym', 'SpeciesID IN (' + species_ids + ')')
+    # (sets RangeMapInputPermitted)
+    _hashRows(hasher, geodatabase + '/ESTH', 'SpeciesID IN (' + species_ids + ')')
+    if review_range_map_ids:
+        review_where = 'RangeMapID IN (' + review_range_map_ids + ')'
+        usernames = _hashRows(hasher, geodatabase + '/Review', review_where, collect_field='Username')
+        usernames |= _hashRows(hasher, geodatabase + '/EcoshapeReview',
+                               'ReviewID IN (SELECT ReviewID FROM Review WHERE ' + review_where + ')',
+                               collect_field='Username')
+        # only the experts of those reviews
+        _hashRowsByKeys(hasher, geodatabase + '/Expert', 'Username', usernames)
+    if custom_polygons:
+        _hashRows(hasher, custom_polygons, None, True)
+    # ecoshapes are too big to hash, so rely on edit tracking and count
+    for ecoshape_table in ['Ecoshape', 'EcoshapeCoastalBuffer']:
+        hasher.update(repr((ecoshape_table, _referenceTableStamp(geodatabase + '/' + ecoshape_table),
+                            int(arcpy.GetCount_management(geodatabase + '/' + ecoshape_table)[0]))).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def readInputFingerprint(geodatabase, range_map_id):
+    """read stored InputFingerprint for range map"""
+    input_fingerprint = None
+    with arcpy.da.SearchCursor(geodatabase + '/RangeMap', ['InputFingerprint'],
+                               'RangeMapID = ' + str(range_map_id)) as cursor:
+        for row in cursor:
+            input_fingerprint = row[0]
+    return input_fingerprint
+
+
+def readRangeMapInputAdjustments(geodatabase, range_map_id):
+    """set of inputs added (SecondaryInput) or excluded (InputFeedback) for just this range map, which make its
+    input selection differ from that of other range maps for the same species"""
+    adjustments = set()
+    for table_name, id_field in [('SecondaryInput', 'RangeMapID'), ('InputFeedback', 'ExcludeFromRangeMapID')]:
+        with arcpy.da.SearchCursor(geodatabase + '/' + table_name, ['InputPointID', 'InputLineID', 'InputPolygonID'],
+                                   id_field + ' = ' + str(range_map_id)) as cursor:
+            for row in cursor:
+                adjustments.add((table_name,) + tuple(row))
+        del cursor
+    return adjustments
+
+
 def deleteRows(table_name, view_name, where_clause):
     """delete rows matching where clause"""
     arcpy.MakeTableView_management(table_name, view_name)
@@ -1568,8 +2609,438 @@ def updateSubnationalSpeciesFields(geodatabase, subnation_code, subnational_spec
     return count
 
 
-def appendUsingCursor(append_from, append_to, field_dict=None, skip_fields_lower=None):
-    """imitate arcpy.Append using insert cursor for better performance"""
+class ScratchWorkspace:
+    """Create, track and clean up intermediate tables, feature classes and layers
+
+    Intermediates go to a local file geodatabase created for this run under scratch_folder (location='local'), to
+    the memory workspace (location='memory') or to a given geodatabase. Everything named through name() or passed to
+    track() is deleted, newest first, by cleanup(), which runs on leaving the with block whether or not an error
+    occurred. Local scratch geodatabases left behind by runs that died (or were locked at clean up) are swept on
+    startup once older than scratch_stale_hours."""
+    def __init__(self, location='local', messages=None):
+        self.messages = messages
+        self.start_time = datetime.datetime.now()
+        self.created = []
+        self._scratch_gdb = None
+        if location == 'local':
+            self.sweepStale()
+            pathlib.Path(scratch_folder).mkdir(parents=True, exist_ok=True)
+            gdb_name = tempName('Scratch', self.start_time) + '_' + str(os.getpid()) + '.gdb'
+            arcpy.CreateFileGDB_management(scratch_folder, gdb_name)
+            self._scratch_gdb = scratch_folder + '/' + gdb_name
+            self.workspace = self._scratch_gdb
+        else:
+            self.workspace = location
+        # prefix for fields of scratch tables in joined layers (none outside enterprise geodatabases)
+        self.table_name_prefix = ''
+        if location not in ('local', 'memory'):
+            self.table_name_prefix = getTableNamePrefix(location)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+
+    def name(self, name):
+        """full path for a new tracked intermediate"""
+        path = self.workspace + '/' + tempName(name, self.start_time)
+        self.track(path)
+        return path
+
+    def track(self, name):
+        """track an intermediate (e.g. a layer on scratch data) for clean up"""
+        if name not in self.created:
+            self.created.append(name)
+
+    @staticmethod
+    def tableName(path):
+        """table name part of a path"""
+        return path.rsplit('/', 1)[-1]
+
+    def fieldName(self, table, field_name):
+        """qualified name of field from scratch table in a joined layer"""
+        return self.table_name_prefix + self.tableName(table) + '.' + field_name
+
+    def cleanup(self):
+        """delete everything tracked, newest first, then the local scratch geodatabase"""
+        for name in reversed(self.created):
+            forgetFieldNames(name)
+            try:
+                if arcpy.Exists(name):
+                    arcpy.Delete_management(name)
+            except Exception as e:
+                displayMessage(self.messages, 'WARNING: could not delete ' + name + ' - ' + str(e))
+        self.created = []
+        if self._scratch_gdb:
+            try:
+                arcpy.Delete_management(self._scratch_gdb)
+            except Exception:
+                # still locked, so leave for a later sweep
+                pass
+            self._scratch_gdb = None
+
+    @staticmethod
+    def sweepStale():
+        """delete local scratch geodatabases older than scratch_stale_hours"""
+        if not os.path.isdir(scratch_folder):
+            return
+        cutoff = time.time() - scratch_stale_hours * 3600
+        for entry in os.scandir(scratch_folder):
+            if entry.is_dir() and entry.name.endswith('.gdb') and entry.stat().st_mtime < cutoff:
+                try:
+                    arcpy.Delete_management(entry.path)
+                except Exception:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class RunProfile:
+    """Record wall time, row counts and peak memory per stage of a tool run, written as JSON to profile_folder on
+    leaving the with block (stage() starts the next stage, block() a nested one)"""
+    def __init__(self, tool_name, messages=None, details=None, print_stages=None, trace_memory=False):
+        self.tool_name = tool_name
+        self.messages = messages
+        self.details = details or {}
+        self.print_stages = profile_print_stages if print_stages is None else print_stages
+        self.trace_memory = trace_memory
+        self.start_time = datetime.datetime.now()
+        self._start = time.perf_counter()
+        self.stages = []
+        self._open = []
+        self.report_file = None
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # lookups of reference tables without editor tracking are read afresh for each run
+        global _reference_run
+        self._previous_reference_run = _reference_run
+        _reference_run = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            self.details['Error'] = str(exc_value)
+        self.finish()
+        return False
+
+    @staticmethod
+    def _memoryMB():
+        """process peak working set (Windows) or current RSS in MB, or None without psutil"""
+        if not psutil:
+            return None
+        memory_info = psutil.Process().memory_info()
+        return round(getattr(memory_info, 'peak_wset', memory_info.rss) / 1048576, 1)
+
+    def stage(self, name, rows=None):
+        """end the current stage (unless it is a block) and start a new one"""
+        if self._open and not self._open[-1].block:
+            self._open[-1].end()
+        return _ProfileStage(self, name, rows, False)
+
+    def block(self, name, rows=None):
+        """stage for use in a with block, nested within the current stage"""
+        return _ProfileStage(self, name, rows, True)
+
+    def profiled(self, name=None):
+        """decorator profiling each call of a function as a stage"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.block(name or function.__name__):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def addRows(self, rows):
+        """add to the row count of the innermost open stage"""
+        if self._open:
+            self._open[-1].rows = (self._open[-1].rows or 0) + rows
+
+    def countRows(self, table):
+        """add the row count of a table/layer to the innermost open stage"""
+        self.addRows(int(arcpy.GetCount_management(table)[0]))
+
+    def report(self):
+        """profile as a JSON-ready dict"""
+        return {'Tool': self.tool_name,
+                'Details': self.details,
+                'StartTime': str(self.start_time),
+                'Seconds': round(time.perf_counter() - self._start, 3),
+                'PeakMemoryMB': self._memoryMB(),
+                'Stages': self.stages}
+
+    def finish(self):
+        """end open stages, write the JSON report and optionally display a stage breakdown; return the report"""
+        global _reference_run
+        if _reference_run is self:
+            _reference_run = self._previous_reference_run
+        while self._open:
+            self._open[-1].end()
+        report = self.report()
+        try:
+            pathlib.Path(profile_folder).mkdir(parents=True, exist_ok=True)
+            self.report_file = profile_folder + '/' + tempName(self.tool_name, self.start_time) + '_' + \
+                str(os.getpid()) + '.json'
+            with open(self.report_file, 'w', encoding='utf-8') as outfile:
+                json.dump(report, outfile, indent=2, default=str)
+        except OSError as e:
+            displayMessage(self.messages, 'WARNING: could not write profile - ' + str(e))
+        if self.print_stages:
+            displayMessage(self.messages, 'Stage breakdown (seconds, rows, peak MB):')
+            for stage in self.stages:
+                displayMessage(self.messages, '  ' * stage['Depth'] + stage['Stage'] + ': ' +
+                               str(stage['Seconds']) + ', ' + str(stage['Rows']) + ', ' +
+                               str(stage['PeakMemoryMB']))
+            displayMessage(self.messages, 'Total seconds: ' + str(report['Seconds']))
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return report
+
+
+class _ProfileStage:
+    """One stage of a RunProfile; blocks end themselves on leaving the with block"""
+    def __init__(self, profile, name, rows, block):
+        self.profile = profile
+        self.name = name
+        self.rows = rows
+        self.block = block
+        self.depth = len(profile._open)
+        self._start = time.perf_counter()
+        self._ended = False
+        # reserve the stage's place in the report, so stages are listed in start order
+        self.record = {'Stage': name, 'Depth': self.depth}
+        profile.stages.append(self.record)
+        if profile.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        profile._open.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end()
+        return False
+
+    def end(self):
+        """record the stage, ending any stages started within it"""
+        if self._ended:
+            return
+        while self.profile._open and self.profile._open[-1] is not self:
+            self.profile._open[-1].end()
+        self.profile._open.remove(self)
+        self._ended = True
+        self.record['Seconds'] = round(time.perf_counter() - self._start, 3)
+        self.record['Rows'] = self.rows
+        self.record['PeakMemoryMB'] = self.profile._memoryMB()
+        if self.profile.trace_memory and tracemalloc.is_tracing():
+            self.record['PythonPeakMB'] = round(tracemalloc.get_traced_memory()[1] / 1048576, 1)
+
+
+class BulkWriter:
+    """Write rows through a single insert cursor held open for the life of the writer
+
+    Rows are buffered and written in chunks of chunk_size. For enterprise geodatabases each chunk is written in its
+    own edit operation inside one edit session; if a chunk fails it is retried one row at a time so that only the bad
+    rows are lost (they are kept in failed_rows). With raise_on_failure, any failed row instead makes close() discard
+    the edit session (enterprise) or delete the rows inserted so far (other workspaces) and raise. Deletes can be
+    routed through the same writer using deleteRows. Use as a context manager, or call close() when done."""
+    def __init__(self, table, fields=None, chunk_size=1000, workspace=None, messages=None, quiet=False,
+                 raise_on_failure=False):
+        self.table = table
+        self.raise_on_failure = raise_on_failure
+        self.fields = fields
+        self.chunk_size = chunk_size
+        self.messages = messages
+        self.quiet = quiet
+        self.rows_written = 0
+        self.rows_deleted = 0
+        self.failed_rows = []
+        if not workspace and '/' in table:
+            workspace = table.rsplit('/', 1)[0]
+        self.workspace = workspace
+        self._chunk = []
+        self._cursor = None
+        self._editor = None
+        self._start_time = time.time()
+        if self.workspace and arcpy.Exists(self.workspace):
+            if arcpy.Describe(self.workspace).workspaceType == 'RemoteDatabase':
+                self._editor = arcpy.da.Editor(self.workspace)
+                self._editor.startEditing(False, False)
+        # without an edit session to discard, inserted rows are tracked so they can be removed on failure
+        self._inserted_oids = None
+        if self.raise_on_failure and not self._editor:
+            self._inserted_oids = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_type is None)
+        return False
+
+    def _startOperation(self):
+        if self._editor:
+            self._editor.startOperation()
+
+    def _stopOperation(self):
+        if self._editor:
+            self._editor.stopOperation()
+
+    def _abortOperation(self):
+        if self._editor:
+            self._editor.abortOperation()
+
+    def insertRow(self, values):
+        """queue a row for insertion (values in the same order as fields)"""
+        self._chunk.append(values)
+        if len(self._chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """write any queued rows"""
+        if len(self._chunk) == 0:
+            return
+        chunk = self._chunk
+        self._chunk = []
+        if not self._cursor:
+            self._cursor = arcpy.da.InsertCursor(self.table, self.fields)
+        written = 0
+        try:
+            self._startOperation()
+            for values in chunk:
+                self._trackInsert(self._cursor.insertRow(values))
+                written += 1
+            self._stopOperation()
+            self.rows_written += written
+            return
+        except Exception:
+            if self._editor:
+                # whole operation rolled back, so retry every row in the chunk
+                self._abortOperation()
+                retry = chunk
+            else:
+                # rows before the failure are already saved
+                self.rows_written += written
+                retry = chunk[written:]
+        # retry at row granularity
+        for values in retry:
+            try:
+                self._startOperation()
+                self._trackInsert(self._cursor.insertRow(values))
+                self._stopOperation()
+                self.rows_written += 1
+            except Exception as e:
+                self._abortOperation()
+                self.failed_rows.append((values, str(e)))
+
+    def _trackInsert(self, oid):
+        if self._inserted_oids is not None:
+            self._inserted_oids.append(oid)
+
+    def _removeInserted(self):
+        """delete the rows inserted so far"""
+        oid_field = arcpy.Describe(self.table).OIDFieldName
+        for oid_chunk in _idChunks(self._inserted_oids):
+            with arcpy.da.UpdateCursor(self.table, ['OID@'], oid_field + ' IN (' + oid_chunk + ')') as cursor:
+                for row in cursor:
+                    cursor.deleteRow()
+            del cursor
+        self.rows_written -= len(self._inserted_oids)
+        self._inserted_oids = []
+
+    def deleteRows(self, where_clause):
+        """delete rows matching where clause using one update cursor; return count deleted"""
+        count = 0
+        self._startOperation()
+        with arcpy.da.UpdateCursor(self.table, ['OID@'], where_clause) as cursor:
+            for row in cursor:
+                cursor.deleteRow()
+                count += 1
+        del cursor
+        self._stopOperation()
+        self.rows_deleted += count
+        return count
+
+    def syncRows(self, key_fields, value_fields, new_rows, where_clause, fixed_values=None):
+        """make rows matching where clause equal new_rows (dict of key tuple -> value_fields values) using only the
+        updates, deletes and inserts needed; inserts are queued with fixed_values (dict of field -> value) and need
+        writer fields of None or fixed_values fields + key_fields + value_fields; return (inserted, updated,
+        deleted) counts"""
+        fixed_values = fixed_values or {}
+        insert_fields = list(fixed_values) + key_fields + value_fields
+        if not self.fields:
+            self.fields = insert_fields
+        elif list(self.fields) != insert_fields:
+            raise ValueError('BulkWriter fields do not match fixed, key and value fields')
+        key_count = len(key_fields)
+        seen = set()
+        updated = 0
+        deleted = 0
+        self._startOperation()
+        with arcpy.da.UpdateCursor(self.table, key_fields + value_fields, where_clause) as cursor:
+            for row in cursor:
+                key = tuple(row[:key_count])
+                if key in seen or key not in new_rows:
+                    # no longer needed (or duplicate)
+                    cursor.deleteRow()
+                    deleted += 1
+                    continue
+                seen.add(key)
+                values = list(new_rows[key])
+                if list(row[key_count:]) != values:
+                    cursor.updateRow(list(key) + values)
+                    updated += 1
+        del cursor
+        self._stopOperation()
+        self.rows_deleted += deleted
+        inserted = 0
+        for key in new_rows:
+            if key not in seen:
+                self.insertRow(list(fixed_values.values()) + list(key) + list(new_rows[key]))
+                inserted += 1
+        return inserted, updated, deleted
+
+    def rowsPerSecond(self):
+        """overall throughput since the writer was created"""
+        elapsed = time.time() - self._start_time
+        if elapsed <= 0:
+            return float(self.rows_written + self.rows_deleted)
+        return (self.rows_written + self.rows_deleted) / elapsed
+
+    def close(self, save=True):
+        """write remaining rows, release the cursor and end any edit session"""
+        if save:
+            self.flush()
+        else:
+            self._chunk = []
+        failed = save and self.raise_on_failure and len(self.failed_rows) > 0
+        if self._cursor:
+            del self._cursor
+            self._cursor = None
+        if self._editor:
+            self._editor.stopEditing(save and not failed)
+            self._editor = None
+        elif self._inserted_oids and (failed or not save):
+            self._removeInserted()
+        if not self.quiet and (self.rows_written > 0 or self.rows_deleted > 0):
+            msg = self.table.rsplit('/', 1)[-1] + ' - ' + str(self.rows_written) + ' row(s) written'
+            if self.rows_deleted > 0:
+                msg += ', ' + str(self.rows_deleted) + ' row(s) deleted'
+            msg += ' (' + str(int(self.rowsPerSecond())) + ' rows/sec)'
+            displayMessage(self.messages, msg)
+        for values, error in self.failed_rows:
+            displayMessage(self.messages, 'WARNING: could not write row to ' + self.table + ' - ' + error)
+        if failed:
+            raise RuntimeError(str(len(self.failed_rows)) + ' row(s) could not be written to ' + self.table + ' - ' +
+                               self.failed_rows[0][1])
+
+
+def appendUsingCursor(append_from, append_to, field_dict=None, skip_fields_lower=None, messages=None, quiet=True,
+                      raise_on_failure=True):
+    """imitate arcpy.Append using insert cursor for better performance; by default raise if any row fails, so that
+    callers never delete source rows that were not copied"""
     if not skip_fields_lower:
         skip_fields_lower = []
     # always exclude fields automatically set by ArcGIS
@@ -1601,19 +3072,13 @@ def appendUsingCursor(append_from, append_to, field_dict=None, skip_fields_lower
                     from_fields.append(field.name)
         to_fields = from_fields
     # insert
-    row = None
-    with arcpy.da.SearchCursor(append_from, from_fields) as cursor:
-        for row in searchCursor(cursor):
-            # build list of values
-            values = []
-            for field in from_fields:
-                values.append(row[field])
-            with arcpy.da.InsertCursor(append_to, to_fields) as insert_cursor:
-                insert_cursor.insertRow(values)
-            del insert_cursor
-    if row:
-        del row
-    del cursor
+    with BulkWriter(append_to, to_fields, messages=messages, quiet=quiet,
+                    raise_on_failure=raise_on_failure) as writer:
+        with arcpy.da.SearchCursor(append_from, from_fields) as cursor:
+            for row in cursor:
+                writer.insertRow(row)
+        del cursor
+    return writer.rows_written
 
 
 def checkInputRelatedRecords(table, where_clause):
@@ -1626,17 +3091,27 @@ def checkInputRelatedRecords(table, where_clause):
     return False
 
 
+def checkSFEOs(geodatabase, input_table, id_field, id_values):
+    """return set of the passed record IDs that are SFs or EOs"""
+    # input record -> dataset -> source, each as one query per chunk of keys
+    input_rows = fetchByKeys(geodatabase + '/' + input_table, id_field, [int(id_value) for id_value in id_values],
+                             ['InputDatasetID'])
+    dataset_ids = [rows[0]['InputDatasetID'] for rows in input_rows.values()]
+    dataset_rows = fetchByKeys(geodatabase + '/InputDataset', 'InputDatasetID', dataset_ids, ['DatasetSourceID'])
+    source_ids = [rows[0]['DatasetSourceID'] for rows in dataset_rows.values()]
+    sfeo_source_ids = fetchByKeys(geodatabase + '/DatasetSource', 'DatasetSourceID', source_ids, ['DatasetType'],
+                                  "DatasetType IN ('Element Occurrences', 'Source Features')")
+    sfeo_ids = set()
+    for id_value in input_rows:
+        dataset_id = input_rows[id_value][0]['InputDatasetID']
+        if dataset_id in dataset_rows and dataset_rows[dataset_id][0]['DatasetSourceID'] in sfeo_source_ids:
+            sfeo_ids.add(id_value)
+    return sfeo_ids
+
+
 def checkSFEO(geodatabase, input_table, id_field, id_value):
     """check if the record is an SF or EO"""
-    where_clause = 'DatasetSourceID = (SELECT DatasetSourceID FROM InputDataset WHERE InputDatasetID = ' + \
-        '(SELECT InputDatasetID FROM ' + input_table + ' WHERE ' + id_field + ' = ' + id_value + '))'
-    ret = False
-    with arcpy.da.SearchCursor(geodatabase + '/DatasetSource', ['DatasetType'], where_clause) as cursor:
-        for row in searchCursor(cursor):
-            if row['DatasetType'] in ('Element Occurrences', 'Source Features'):
-                ret = True
-    del row, cursor
-    return ret
+    return len(checkSFEOs(geodatabase, input_table, id_field, [id_value])) > 0
 
 
 # def emailNoticeWithAttachment(subject, folder, filename):
@@ -1696,5 +3171,7 @@ def translateENtoFRUsingDeepL(input_text):
         dk_file = open(deepl_key_file)
         deepl_key = dk_file.read()
         dk_file.close()
+    # imported here so that EBARUtils loads on machines without it (e.g. with ArcpyFake)
+    import deepl
     deepl_client = deepl.DeepLClient(deepl_key)
     return deepl_client.translate_text(input_text, source_lang="EN", target_lang="FR")
@@ -0,0 +1,63 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: EcoshapeIntersectBenchmark.py
+# Benchmark of EBARUtils.intersectInputsWithEcoshapes, comparing the point fast path with intersecting all buffered
+# inputs, and checking that both give the same input/ecoshape associations
+
+# Notes:
+# - Requires ArcGIS Pro (arcpy)
+# - Pass a buffered inputs feature class with OriginalGeometryType (e.g. a TempAllInputs kept from a
+#   GenerateRangeMapTool run) and an ecoshape feature class with EcoshapeID
+
+
+import sys
+import time
+import arcpy
+import EBARUtils
+
+
+def associations(intersect, inputs_name):
+    """set of (input FID, EcoshapeID) in an intersect output"""
+    with arcpy.da.SearchCursor(intersect, ['FID_' + inputs_name, 'EcoshapeID']) as cursor:
+        pairs = set(cursor)
+    del cursor
+    return pairs
+
+
+def runPath(inputs, ecoshapes, point_where_clause):
+    """time one intersect path; return (seconds, associations, interior count)"""
+    with EBARUtils.ScratchWorkspace() as scratch:
+        # work on a copy, as the fast path adds a field to inputs
+        inputs_copy = scratch.name('TempBenchmarkInputs')
+        arcpy.CopyFeatures_management(inputs, inputs_copy)
+        arcpy.MakeFeatureLayer_management(ecoshapes, 'benchmark_ecoshape_layer')
+        scratch.track('benchmark_ecoshape_layer')
+        output = scratch.name('TempBenchmarkIntersect')
+        start = time.perf_counter()
+        interior_count = EBARUtils.intersectInputsWithEcoshapes(inputs_copy, 'benchmark_ecoshape_layer', output,
+                                                                scratch, point_where_clause)
+        seconds = time.perf_counter() - start
+        pairs = associations(output, scratch.tableName(inputs_copy))
+    return seconds, pairs, interior_count
+
+
+def main(inputs, ecoshapes):
+    all_seconds, all_pairs, _ = runPath(inputs, ecoshapes, None)
+    fast_seconds, fast_pairs, interior_count = runPath(inputs, ecoshapes, "OriginalGeometryType = 'P'")
+    print('Intersect all inputs:  ' + str(round(all_seconds, 2)) + 's, ' + str(len(all_pairs)) + ' associations')
+    print('Point fast path:       ' + str(round(fast_seconds, 2)) + 's, ' + str(len(fast_pairs)) +
+          ' associations (' + str(interior_count) + ' interior point buffers)')
+    if all_pairs == fast_pairs:
+        print('Associations match')
+    else:
+        print('MISMATCH: ' + str(len(all_pairs - fast_pairs)) + ' only when intersecting all, ' +
+              str(len(fast_pairs - all_pairs)) + ' only in fast path')
+
+
+# controlling process
+if __name__ == '__main__':
+    main(sys.argv[1], sys.argv[2])
@@ -111,10 +111,12 @@ class FlagBadDataUsingIDTool:
             with arcpy.da.InsertCursor(param_geodatabase + '/InputFeedback',
                                        ['Bad' + id_field, 'Justification']) as insert_cursor:
                 insert_cursor.insertRow([id_value, param_justification])
-            EBARUtils.appendUsingCursor('input_layer', bad_table)
+            # (raises if any row could not be appended, so the original is never deleted without its copy)
+            EBARUtils.appendUsingCursor('input_layer', bad_table, messages=messages, quiet=quiet)
             if not quiet:
                 EBARUtils.displayMessage(messages, 'Deleting original Input record')
             arcpy.DeleteRows_management('input_layer')
+            EBARUtils.deleteInputEcoshapes(param_geodatabase, id_field[:-2], [id_value])
         else:
             # check for record
             arcpy.MakeFeatureLayer_management(bad_table, 'bad_input_layer', id_field + ' = ' + id_value)
@@ -135,7 +137,10 @@ class FlagBadDataUsingIDTool:
                 skip_fields_lower = ['inputlineid']
             if param_input_polygon_id:
                 skip_fields_lower = ['inputpolygonid']
-            EBARUtils.appendUsingCursor('bad_input_layer', input_table, skip_fields_lower=skip_fields_lower)
+            # (re-added record gets associated with ecoshapes when next used for a range map; raises if any row
+            # could not be appended, so the bad record is never deleted without its copy)
+            EBARUtils.appendUsingCursor('bad_input_layer', input_table, skip_fields_lower=skip_fields_lower,
+                                         messages=messages, quiet=quiet)
             if not quiet:
                 EBARUtils.displayMessage(messages, 'Deleting Bad record')
             arcpy.DeleteRows_management('bad_input_layer')
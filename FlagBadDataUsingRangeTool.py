@@ -107,32 +107,42 @@ class FlagBadDataUsingRangeTool:
         #     return
 
         # select range ecoshapes using RangeMapID
-        arcpy.MakeFeatureLayer_management(param_geodatabase + '/Ecoshape', 'range_ecoshape_layer',
-                                          'EcoshapeID IN (SELECT EcoshapeID FROM RangeMapEcoshape WHERE ' +
-                                          'RangeMapID = ' + param_range_map_id + ' AND Presence IS NOT NULL)')
-        result = arcpy.management.GetCount('range_ecoshape_layer')
-        if int(result[0]) == 0:
+        # (from local indexed copy, which can't sub-select from RangeMapEcoshape, so read IDs first)
+        ecoshapes = EBARUtils.localEcoshapes(param_geodatabase, 'Ecoshape', messages)
+        range_ecoshape_ids = []
+        with arcpy.da.SearchCursor(param_geodatabase + '/RangeMapEcoshape', ['EcoshapeID'],
+                                   'RangeMapID = ' + param_range_map_id + ' AND Presence IS NOT NULL') as cursor:
+            for row in cursor:
+                range_ecoshape_ids.append(str(row[0]))
+        del cursor
+        if len(range_ecoshape_ids) == 0:
             # display message and stop
             EBARUtils.displayMessage(messages, 'ERROR: Range Map has no Ecoshapes')
             return
+        arcpy.MakeFeatureLayer_management(ecoshapes, 'range_ecoshape_layer',
+                                          'EcoshapeID IN (' + ','.join(range_ecoshape_ids) + ')')
 
         # select subsets of all ecoshapes for National (Canadian) scope
         if scope == 'N':
             EBARUtils.displayMessage(messages, 'Selecting subset of Ecoshapes for National (Canadian) scope')
-            arcpy.MakeFeatureLayer_management(param_geodatabase + '/Ecoshape', 'nat_ecoshape_layer',
+            arcpy.MakeFeatureLayer_management(ecoshapes, 'nat_ecoshape_layer',
                                               'JurisdictionID IN ' + EBARUtils.national_jur_ids)
             # also need non-Canadian (international) ecoshapes
-            arcpy.MakeFeatureLayer_management(param_geodatabase + '/Ecoshape', 'intl_ecoshape_layer',
+            arcpy.MakeFeatureLayer_management(ecoshapes, 'intl_ecoshape_layer',
                                               'JurisdictionID NOT IN ' + EBARUtils.national_jur_ids)
 
         # use related tool for doing actual flagging
         fbdui = FlagBadDataUsingIDTool.FlagBadDataUsingIDTool()
 
+        # exclusions shared by all input types
+        exclusions = EBARUtils.readInputExclusions(param_geodatabase)
+
         # process points
         # select all points acquired before range map was generated
         EBARUtils.displayMessage(messages, 'Buffering Input Points for primary species')
         temp_point_buffer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputPoint', range_map_id,
-                                                           table_name_prefix, str(species_id), start_time, range_date)
+                                                           table_name_prefix, str(species_id), start_time, range_date,
+                                                           exclusions=exclusions)
         EBARUtils.displayMessage(messages, 'Flagging any InputPoint that does not intersect range')
         arcpy.MakeFeatureLayer_management(temp_point_buffer, 'point_layer')
         # select any that don't intersect range ecoshapes
@@ -191,6 +201,8 @@ class FlagBadDataUsingRangeTool:
                                                  str(range_map_id), 1])
                     del insert_cursor
             del row, cursor
+            # excluded from all range maps, so no longer associated with ecoshapes
+            EBARUtils.deleteInputEcoshapes(param_geodatabase, 'InputPoint', input_point_ids.split(','))
             # # append to Bad, delete original
             # EBARUtils.displayMessage(messages, 'Appending BadInputPoint(s)')
             # EBARUtils.appendUsingCursor('original_points', param_geodatabase + '/BadInputPoint')
@@ -201,7 +213,8 @@ class FlagBadDataUsingRangeTool:
         # select all lines acquired before range map was generated
         EBARUtils.displayMessage(messages, 'Buffering Input Lines for primary species')
         temp_line_buffer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputLine', range_map_id,
-                                                          table_name_prefix, str(species_id), start_time, range_date)
+                                                          table_name_prefix, str(species_id), start_time, range_date,
+                                                          exclusions=exclusions)
         EBARUtils.displayMessage(messages, 'Flagging any InputLine that does not intersect range')
         arcpy.MakeFeatureLayer_management(temp_line_buffer, 'line_layer')
         # select any that don't intersect range
@@ -260,6 +273,8 @@ class FlagBadDataUsingRangeTool:
                                                  str(range_map_id), 1])
                     del insert_cursor
             del row, cursor
+            # excluded from all range maps, so no longer associated with ecoshapes
+            EBARUtils.deleteInputEcoshapes(param_geodatabase, 'InputLine', input_line_ids.split(','))
             # # append to Bad, delete original
             # EBARUtils.displayMessage(messages, 'Appending BadInputLine(s)')
             # EBARUtils.appendUsingCursor('original_lines', param_geodatabase + '/BadInputLine')
@@ -273,7 +288,7 @@ class FlagBadDataUsingRangeTool:
         EBARUtils.displayMessage(messages, 'Selecting Input Polygons for primary species')
         input_polygon_layer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputPolygon', range_map_id,
                                                              table_name_prefix, str(species_id), start_time,
-                                                             range_date)
+                                                             range_date, exclusions=exclusions)
         polygons_found = int(arcpy.GetCount_management(input_polygon_layer)[0])
         if polygons_found > 0:
             EBARUtils.displayMessage(messages, 'Flagging any InputPolygon that does not intersect range')
@@ -292,8 +307,10 @@ class FlagBadDataUsingRangeTool:
                     polygons_found = int(arcpy.GetCount_management(input_polygon_layer)[0])
             if polygons_found > 0:
                 # create InputFeedback records
+                input_polygon_ids = []
                 with arcpy.da.SearchCursor(input_polygon_layer, ['InputPolygonID']) as cursor:
                     for row in EBARUtils.searchCursor(cursor):
+                        input_polygon_ids.append(row['InputPolygonID'])
                         # # create InputFeedback, append to Bad, delete original
                         # EBARUtils.displayMessage(messages, 'Flagging InputPolygonID ' + str(row['InputPolygonID']))
                         # param_gdb = arcpy.Parameter()
@@ -326,6 +343,8 @@ class FlagBadDataUsingRangeTool:
                                                     str(range_map_id), 1])
                         del insert_cursor
                 del row, cursor
+                # excluded from all range maps, so no longer associated with ecoshapes
+                EBARUtils.deleteInputEcoshapes(param_geodatabase, 'InputPolygon', input_polygon_ids)
                 # # append to Bad, delete original
                 # EBARUtils.displayMessage(messages, 'Appending BadInputPolygon(s)')
                 # EBARUtils.appendUsingCursor(input_polygon_layer, param_geodatabase + '/BadInputPolygon')
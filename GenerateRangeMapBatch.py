@@ -0,0 +1,229 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: GenerateRangeMapBatch.py
+# Generate range maps for a list of jobs (species, secondary, version, stage, scope) in parallel worker processes
+
+# Notes:
+# - Run directly (see controlling process at the end of this file), not from EBAR Tools.pyt
+# - Each job attempt runs in its own process, with its own scratch geodatabases
+# - Jobs CSV (UTF-8 unless another encoding is passed to readJobs) has job_fields columns; Secondary and JurisdictionsCovered use the tool's quoted, semicolon-separated
+#   format (e.g. 'Ardea herodias fannini';'Ardea herodias herodias'); Scope can list several scopes the same way
+#   (e.g. Global;Canadian;North American) to generate them in one pass
+# - Jobs that fail or exceed the timeout are retried; a CSV summary of outcome and duration per job is written at the
+#   end
+
+
+# import Python packages
+import GenerateRangeMapTool
+import EBARUtils
+import arcpy
+import collections
+import csv
+import datetime
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+
+
+# job fields, in GenerateRangeMapTool parameter order (after geodatabase)
+job_fields = ['Species', 'Secondary', 'Version', 'Stage', 'Scope', 'JurisdictionsCovered', 'CustomPolygonsCovered',
+              'DifferentiateUsageType', 'SaveRangeMapInputs', 'ForceRegeneration', 'DeferRangeMapInputs',
+              'UseInputEcoshapes']
+job_defaults = {'DifferentiateUsageType': 'true',
+                'SaveRangeMapInputs': 'false',
+                'ForceRegeneration': 'false',
+                'DeferRangeMapInputs': 'false',
+                'UseInputEcoshapes': 'false'}
+required_job_fields = ['Species', 'Version', 'Stage']
+
+# where worker scratch geodatabases are created
+batch_scratch_folder = EBARUtils.temp_folder + '/GenerateRangeMapBatch'
+
+summary_fields = ['Job', 'Species', 'Secondary', 'Version', 'Stage', 'Scope', 'Attempts', 'Outcome', 'StartTime',
+                  'EndTime', 'DurationSeconds', 'Detail']
+
+
+class BatchMessages:
+    """Collect messages from a tool run, in place of the arcpy messages object"""
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.warnings = []
+        self.errors = []
+
+    def addMessage(self, msg):
+        print(self.prefix + msg)
+
+    def addWarningMessage(self, msg):
+        self.warnings.append(msg)
+        print(self.prefix + msg)
+
+    def addErrorMessage(self, msg):
+        self.errors.append(msg)
+        print(self.prefix + msg)
+
+
+def readJobs(jobs_file, encoding='utf-8-sig', messages=None):
+    """read jobs from CSV with job_fields columns, skipping lines without the required Species, Version and Stage"""
+    jobs = []
+    with open(jobs_file, 'r', encoding=encoding) as infile:
+        reader = csv.DictReader(infile)
+        for file_line in reader:
+            job = {}
+            for field in job_fields:
+                value = file_line.get(field)
+                if value is not None:
+                    value = value.strip()
+                job[field] = value if value else None
+            missing = [field for field in required_job_fields if not job[field]]
+            if len(missing) > 0:
+                EBARUtils.displayMessage(messages, 'WARNING: jobs file line ' + str(reader.line_num) +
+                                         ' skipped because it has no ' + ', '.join(missing))
+                continue
+            jobs.append(job)
+    return jobs
+
+
+def makeParameters(geodatabase, job):
+    """GenerateRangeMapTool parameters for a job"""
+    values = [geodatabase] + [job.get(field) or job_defaults.get(field) for field in job_fields]
+    parameters = []
+    for value in values:
+        parameter = arcpy.Parameter()
+        parameter.value = value
+        parameters.append(parameter)
+    return parameters
+
+
+def _runJob(geodatabase, job, job_label, scratch_folder, connection):
+    """worker process: run one job attempt and send (outcome, detail) back through connection"""
+    outcome = 'Failed'
+    detail = None
+    try:
+        # isolate scratch from other workers
+        os.makedirs(scratch_folder, exist_ok=True)
+        arcpy.CreateFileGDB_management(scratch_folder, 'Scratch.gdb')
+        arcpy.env.scratchWorkspace = scratch_folder + '/Scratch.gdb'
+        messages = BatchMessages(job_label + ' ')
+        grm = GenerateRangeMapTool.GenerateRangeMapTool()
+        grm.runGenerateRangeMapTool(makeParameters(geodatabase, job), messages)
+        if len(messages.errors) > 0:
+            detail = messages.errors[-1]
+        else:
+            outcome = 'Succeeded'
+            if len(messages.warnings) > 0:
+                detail = messages.warnings[-1]
+    except Exception:
+        detail = traceback.format_exc().strip().splitlines()[-1]
+        print(job_label + ' ' + traceback.format_exc())
+    connection.send((outcome, detail))
+    connection.close()
+
+
+def writeSummary(summary_file, results):
+    """write one line per job with outcome and duration"""
+    with open(summary_file, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, summary_fields)
+        writer.writeheader()
+        for job_number in sorted(results):
+            writer.writerow(results[job_number])
+
+
+def runBatch(geodatabase, jobs, summary_file, processes=4, timeout=3600, retries=1, messages=None):
+    """run jobs across processes worker processes, retrying each failed/timed out job up to retries times;
+    return dict of summary rows by job number"""
+    EBARUtils.displayMessage(messages, 'Running ' + str(len(jobs)) + ' job(s) in ' + str(processes) + ' process(es)')
+    batch_start_time = datetime.datetime.now()
+    # (job number, attempt)
+    pending = collections.deque([(job_number, 1) for job_number in range(1, len(jobs) + 1)])
+    # job number -> (process, connection, attempt start time, attempt, scratch folder)
+    running = {}
+    first_start_times = {}
+    results = {}
+    while len(pending) > 0 or len(running) > 0:
+        # fill free workers
+        while len(pending) > 0 and len(running) < processes:
+            job_number, attempt = pending.popleft()
+            job = jobs[job_number - 1]
+            job_label = '[' + str(job_number) + '/' + str(attempt) + ']'
+            scratch_folder = batch_scratch_folder + '/' + batch_start_time.strftime('%Y%m%d%H%M%S') + '_' + \
+                str(job_number) + '_' + str(attempt)
+            parent_connection, child_connection = multiprocessing.Pipe(False)
+            process = multiprocessing.Process(target=_runJob, args=(geodatabase, job, job_label, scratch_folder,
+                                                                    child_connection))
+            process.start()
+            child_connection.close()
+            attempt_start_time = datetime.datetime.now()
+            first_start_times.setdefault(job_number, attempt_start_time)
+            running[job_number] = (process, parent_connection, attempt_start_time, attempt, scratch_folder)
+            EBARUtils.displayMessage(messages, job_label + ' Started ' + job['Species'] + ' ' + job['Version'] + ' ' +
+                                     job['Stage'])
+
+        # check running workers
+        for job_number in list(running):
+            process, connection, attempt_start_time, attempt, scratch_folder = running[job_number]
+            outcome = None
+            if connection.poll():
+                try:
+                    outcome, detail = connection.recv()
+                except EOFError:
+                    outcome = 'Failed'
+                    detail = 'Worker exited without result (exit code ' + str(process.exitcode) + ')'
+                process.join()
+            elif not process.is_alive():
+                outcome = 'Failed'
+                detail = 'Worker exited without result (exit code ' + str(process.exitcode) + ')'
+            elif (datetime.datetime.now() - attempt_start_time).total_seconds() > timeout:
+                process.terminate()
+                process.join()
+                outcome = 'Timed Out'
+                detail = 'Exceeded ' + str(timeout) + ' seconds'
+            if not outcome:
+                continue
+
+            # finished attempt
+            connection.close()
+            del running[job_number]
+            shutil.rmtree(scratch_folder, ignore_errors=True)
+            job = jobs[job_number - 1]
+            job_label = '[' + str(job_number) + '/' + str(attempt) + ']'
+            EBARUtils.displayMessage(messages, job_label + ' ' + outcome + (': ' + detail if detail else ''))
+            if outcome != 'Succeeded' and attempt <= retries:
+                pending.append((job_number, attempt + 1))
+                continue
+            end_time = datetime.datetime.now()
+            results[job_number] = {'Job': job_number,
+                                   'Species': job['Species'],
+                                   'Secondary': job.get('Secondary'),
+                                   'Version': job['Version'],
+                                   'Stage': job['Stage'],
+                                   'Scope': job.get('Scope'),
+                                   'Attempts': attempt,
+                                   'Outcome': outcome,
+                                   'StartTime': first_start_times[job_number],
+                                   'EndTime': end_time,
+                                   'DurationSeconds': round((end_time - first_start_times[job_number]).total_seconds()),
+                                   'Detail': detail}
+        if len(running) > 0:
+            time.sleep(1)
+
+    writeSummary(summary_file, results)
+    succeeded = len([result for result in results.values() if result['Outcome'] == 'Succeeded'])
+    EBARUtils.displayMessage(messages, str(succeeded) + ' of ' + str(len(jobs)) + ' job(s) succeeded, summary in ' +
+                             summary_file)
+    EBARUtils.displayMessage(messages, 'Elapsed time: ' + str(datetime.datetime.now() - batch_start_time))
+    return results
+
+
+# controlling process
+if __name__ == '__main__':
+    # hard code parameters for batch runs
+    geodatabase = 'C:/GIS/EBAR/nsc-gis-ebarkba.sde'
+    jobs_file = 'C:/GIS/EBAR/temp/RangeMapJobs.csv'
+    summary_file = 'C:/GIS/EBAR/temp/RangeMapJobsSummary.csv'
+    runBatch(geodatabase, readJobs(jobs_file), summary_file, processes=4, timeout=3600, retries=1)
@@ -0,0 +1,72 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: GenerateRangeMapInputs.py
+# Generate the RangeMapInput records of all range maps left pending by GenerateRangeMapTool runs with Defer
+# RangeMapInputs
+
+# Notes:
+# - Run directly (see controlling process at the end of this file), e.g. as an overnight scheduled task
+# - Pending range maps have RangeMapInputPending = 1, which is cleared once their records are created
+# - Records are built from the inputs for the range map's species (and secondary species) in its current
+#   RangeMapEcoshape ecoshapes, so a range map regenerated since it was deferred gets records matching the latest run
+# - A range map that fails is reported and left pending for the next run
+
+
+# import Python packages
+import GenerateRangeMapTool
+import EBARUtils
+import arcpy
+import datetime
+import traceback
+
+
+def readPendingRangeMaps(geodatabase):
+    """list of RangeMapIDs with RangeMapInput records pending"""
+    range_map_ids = []
+    with arcpy.da.SearchCursor(geodatabase + '/RangeMap', ['RangeMapID'], 'RangeMapInputPending = 1',
+                               sql_clause=(None, 'ORDER BY RangeMapID')) as cursor:
+        for row in cursor:
+            range_map_ids.append(row[0])
+    del cursor
+    return range_map_ids
+
+
+def generatePendingInputs(geodatabase, messages=None):
+    """create RangeMapInput records for all pending range maps; return dict of outcome by RangeMapID"""
+    start_time = datetime.datetime.now()
+    arcpy.env.overwriteOutput = True
+    arcpy.env.workspace = geodatabase
+    if not EBARUtils.checkRangeMapInputPendingField(geodatabase):
+        EBARUtils.displayMessage(messages, 'ERROR: RangeMap has no RangeMapInputPending field')
+        return {}
+    range_map_ids = readPendingRangeMaps(geodatabase)
+    EBARUtils.displayMessage(messages, str(len(range_map_ids)) + ' range map(s) with Range Map Inputs pending')
+    grm = GenerateRangeMapTool.GenerateRangeMapTool()
+    outcomes = {}
+    with EBARUtils.RunProfile('GenerateRangeMapInputs', messages) as profile:
+        for range_map_id in range_map_ids:
+            EBARUtils.displayMessage(messages, 'RangeMapID ' + str(range_map_id))
+            try:
+                with profile.block('RangeMapID ' + str(range_map_id)), \
+                        EBARUtils.ScratchWorkspace(messages=messages) as scratch:
+                    grm.generateRangeMapInputs(geodatabase, range_map_id, scratch, profile, messages)
+                outcomes[range_map_id] = 'Succeeded'
+            except Exception:
+                outcomes[range_map_id] = 'Failed'
+                EBARUtils.displayMessage(messages, 'WARNING: RangeMapID ' + str(range_map_id) +
+                                         ' left pending - ' + traceback.format_exc().strip().splitlines()[-1])
+    succeeded = len([outcome for outcome in outcomes.values() if outcome == 'Succeeded'])
+    EBARUtils.displayMessage(messages, str(succeeded) + ' of ' + str(len(range_map_ids)) + ' range map(s) succeeded')
+    EBARUtils.displayMessage(messages, 'Elapsed time: ' + str(datetime.datetime.now() - start_time))
+    return outcomes
+
+
+# controlling process
+if __name__ == '__main__':
+    # hard code parameters for scheduled runs
+    geodatabase = 'C:/GIS/EBAR/nsc-gis-ebarkba.sde'
+    generatePendingInputs(geodatabase)
@@ -18,16 +18,46 @@
 from attr import fields_dict
 from numpy import diff
 import EBARUtils
+import PresenceRules
+import SimplifyInputs
 import arcpy
 import datetime
 
 
+# RangeMapEcoshape and RangeMapEcoshapeInputDataset fields built in memory and then written as changes
+range_map_ecoshape_fields = ['Presence', 'UsageType', 'RangeMapEcoshapeNotes', 'MigrantStatus', 'MinDate', 'MaxDate']
+range_map_ecoshape_input_dataset_fields = ['InputDataCount', 'MinDate', 'MaxDate']
+
+# input fields (and types) carried into input/ecoshape associations read from InputEcoshape (see associateInputs),
+# which stand in for the intersect of buffered inputs with ecoshapes
+association_input_fields = [('InputDatasetID', 'LONG'), ('SpeciesID', 'LONG'), ('SynonymID', 'LONG'),
+                            ('MinDate', 'DATE'), ('MaxDate', 'DATE'), ('EORank', 'TEXT'),
+                            ('BreedingAndBehaviourCode', 'TEXT'), ('LocUseClass', 'TEXT'), ('Accuracy', 'LONG')]
+
+
 class GenerateRangeMapTool:
     """Generate Range Map for a species from available spatial data in the EBAR geodatabase"""
     def __init__(self):
         pass
 
     def runGenerateRangeMapTool(self, parameters, messages):
+        # intermediates go to a local scratch geodatabase that gets cleaned up however the run ends
+        # with per stage timings written to a JSON run profile
+        scopes = []
+        if parameters[5].valueAsText:
+            scopes = parameters[5].valueAsText.replace("'", '').split(';')
+        with EBARUtils.RunProfile('GenerateRangeMap', messages) as profile, \
+                EBARUtils.ScratchWorkspace(messages=messages) as scratch:
+            if len(scopes) <= 1:
+                return self.generateRangeMap(parameters, messages, scratch, profile)
+            # multi-scope mode: a range map per scope, sharing the buffered inputs and ecoshape intersect
+            shared = {}
+            for scope_name in scopes:
+                with profile.block('Scope ' + scope_name):
+                    self.generateRangeMap(parameters, messages, scratch, profile, scope_name, shared)
+            return
+
+    def generateRangeMap(self, parameters, messages, scratch, profile, scope_name=None, shared=None):
         # debugging/testing
         #print(locale.getpreferredencoding())
         #return
@@ -43,6 +73,7 @@ class GenerateRangeMapTool:
         arcpy.env.overwriteOutput = True
 
         # make variables for parms
+        profile.stage('Parameters')
         EBARUtils.displayMessage(messages, 'Processing parameters')
         param_geodatabase = parameters[0].valueAsText
         param_species = parameters[1].valueAsText
@@ -57,6 +88,10 @@ class GenerateRangeMapTool:
         param_stage = parameters[4].valueAsText
         EBARUtils.displayMessage(messages, 'Range Stage: ' + param_stage)
         param_scope = parameters[5].valueAsText
+        if scope_name:
+            param_scope = scope_name
+        profile.details.update({'Species': param_species, 'Version': param_version, 'Stage': param_stage,
+                                'Scope': param_scope})
         national_jur_ids = None
         scope = None
         if param_scope:
@@ -81,6 +116,16 @@ class GenerateRangeMapTool:
         if param_differentiate_usage_type == 'true':
             differentiate_usage_type = 1
         param_save_range_map_inputs = parameters[9].valueAsText #'true'
+        # optional trailing parameters (older toolboxes, e.g. the Stub, may not pass them)
+        param_force_regeneration = 'false'
+        if len(parameters) > 10:
+            param_force_regeneration = parameters[10].valueAsText
+        param_defer_range_map_inputs = None
+        if len(parameters) > 11:
+            param_defer_range_map_inputs = parameters[11].valueAsText
+        param_use_input_ecoshapes = None
+        if len(parameters) > 12:
+            param_use_input_ecoshapes = parameters[12].valueAsText
 
         # use passed geodatabase as workspace (still seems to go to default geodatabase)
         arcpy.env.workspace = param_geodatabase
@@ -88,6 +133,20 @@ class GenerateRangeMapTool:
         # get table name prefix (needed for joined tables and feature classes in enterprise geodatabases)
         table_name_prefix = EBARUtils.getTableNamePrefix(param_geodatabase)
 
+        # RangeMapInput records can be left pending for GenerateRangeMapInputs.py (e.g. overnight), if RangeMap has the
+        # field to flag them
+        pending_field = EBARUtils.checkRangeMapInputPendingField(param_geodatabase)
+        defer_range_map_inputs = False
+        if param_save_range_map_inputs == 'true' and param_defer_range_map_inputs == 'true':
+            if pending_field:
+                defer_range_map_inputs = True
+                EBARUtils.displayMessage(messages, 'Range Map Input records will be left pending for '
+                                                   'GenerateRangeMapInputs.py')
+            else:
+                EBARUtils.displayMessage(messages, 'WARNING: RangeMap has no RangeMapInputPending field, so Range '
+                                                   'Map Input records will be created now')
+        save_range_map_inputs_now = param_save_range_map_inputs == 'true' and not defer_range_map_inputs
+
         # check for species
         #species_id, short_citation = EBARUtils.checkSpecies(param_species.lower(), param_geodatabase)
         species_id, author_name = EBARUtils.checkSpecies(param_species.lower(), param_geodatabase)
@@ -125,6 +184,7 @@ class GenerateRangeMapTool:
                 #synonyms_used += secondary
 
         # check for range map record and add if necessary
+        profile.stage('Existing Range Map')
         EBARUtils.displayMessage(messages, 'Checking for existing Range Map')
         range_map_id = None
         arcpy.MakeTableView_management(param_geodatabase + '/RangeMap', 'range_map_view')
@@ -164,16 +224,19 @@ class GenerateRangeMapTool:
                 prev_range_map.append(candidate)
                 prev_range_map_ids = ','.join(map(str, prev_range_map))
         if len(prev_range_map_ids) > 0:
-            # check prev for matching version and stage
+            # check prev for matching version and stage (and scope in multi-scope mode)
             row = None
-            with arcpy.da.SearchCursor('range_map_view', ['RangeMapID', 'RangeVersion', 'RangeStage'],
+            with arcpy.da.SearchCursor('range_map_view', ['RangeMapID', 'RangeVersion', 'RangeStage',
+                                                          'RangeMapScope'],
                                        'RangeMapID IN (' + prev_range_map_ids + ')') as cursor:
                 for row in EBARUtils.searchCursor(cursor):
                     if (row['RangeVersion'] == param_version and row['RangeStage'] == param_stage):
-                        # range map to be generated already exists
-                        range_map_id = row['RangeMapID']
+                        if shared is None or row['RangeMapScope'] == scope:
+                            # range map to be generated already exists
+                            range_map_id = row['RangeMapID']
                         # remove from list of range maps to be used later for applying reviews
-                        prev_range_map.remove(range_map_id)
+                        # (including other scopes being generated in multi-scope mode)
+                        prev_range_map.remove(row['RangeMapID'])
                     if row['RangeVersion'] != param_version:
                         # also remove from list of range maps to be used later for applying reviews
                         prev_range_map.remove(row['RangeMapID'])
@@ -182,6 +245,20 @@ class GenerateRangeMapTool:
                 del row
             del cursor
 
+        # fingerprint everything that feeds the range map, so that regeneration can be skipped if nothing changed
+        # (a new range map is fingerprinted once its RangeMapID exists, so that reruns hash the same inputs)
+        input_fingerprint = None
+        fingerprint_field = EBARUtils.checkInputFingerprintField(param_geodatabase)
+        fingerprint_settings = [param_species, param_secondary, param_version, param_stage, param_scope,
+                                param_jurisdictions_covered, param_custom_polygons_covered,
+                                param_differentiate_usage_type, param_save_range_map_inputs,
+                                param_defer_range_map_inputs, param_use_input_ecoshapes]
+        if fingerprint_field and range_map_id:
+            EBARUtils.displayMessage(messages, 'Fingerprinting Range Map inputs')
+            input_fingerprint = EBARUtils.computeInputFingerprint(param_geodatabase, range_map_id, species_ids,
+                                                                  prev_range_map_ids, fingerprint_settings,
+                                                                  param_custom_polygons_covered)
+
         if range_map_id:
             arcpy.SelectLayerByAttribute_management('range_map_view', 'NEW_SELECTION',
                                                     'RangeMapID = ' + str(range_map_id))
@@ -203,51 +280,29 @@ class GenerateRangeMapTool:
                 EBARUtils.displayMessage(messages, 'ERROR: Range Map has been published')
                 return
 
-            # no reviews completed or in progress, so delete any existing related records
+            # check for unchanged inputs
+            if input_fingerprint:
+                if param_force_regeneration != 'true' and \
+                    EBARUtils.readInputFingerprint(param_geodatabase, range_map_id) == input_fingerprint:
+                    EBARUtils.displayMessage(messages, 'Range Map inputs unchanged since last generation, so nothing '
+                                                       'to regenerate (use Force Regeneration to override)')
+                    return
+                # clear until regeneration completes, so that a failed run doesn't look current
+                with arcpy.da.UpdateCursor('range_map_view', ['InputFingerprint']) as cursor:
+                    for row in cursor:
+                        cursor.updateRow([None])
+                del cursor
+
+            # no reviews completed or in progress, so replace any existing related records (Range Map Ecoshape
+            # and Input Dataset records get only the changes needed, once the new records are known)
             EBARUtils.displayMessage(messages, 'Range Map already exists but with no Review(s) completed or in '
-                                               'progress, so existing related records will be deleted')
-            # consider replacing the following code blocks with select then Delete Rows tools
-            rme_row = None
-            with arcpy.da.SearchCursor(param_geodatabase + '/RangeMapEcoshape', ['RangeMapEcoshapeID'],
-                                       'RangeMapID = ' + str(range_map_id)) as rme_cursor:
-                for rme_row in EBARUtils.searchCursor(rme_cursor):
-                    rmeid_row = None
-                    with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshapeInputDataset',
-                                               ['RangeMapEcoshpInputDatasetID'],
-                                                'RangeMapEcoshapeID = ' + \
-                                                str(rme_row['RangeMapEcoshapeID'])) as rmeid_cursor:
-                        for rmeid_row in EBARUtils.updateCursor(rmeid_cursor):
-                            rmeid_cursor.deleteRow()
-                    if rmeid_row:
-                        del rmeid_row
-                    del rmeid_cursor
-            rme_row = None
-            with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape', ['RangeMapEcoshapeID'],
-                                       'RangeMapID = ' + str(range_map_id)) as rme_cursor:
-                for rme_row in EBARUtils.updateCursor(rme_cursor):
-                    rme_cursor.deleteRow()
-            if rme_row:
-                del rme_row
-                EBARUtils.displayMessage(messages, 'Existing Range Map Ecoshape records deleted')
-            del rme_cursor
-            es_row = None
-            with arcpy.da.UpdateCursor(param_geodatabase + '/SecondarySpecies', ['SecondarySpeciesID'],
-                                       'RangeMapID = ' + str(range_map_id)) as es_cursor:
-                for es_row in EBARUtils.updateCursor(es_cursor):
-                    es_cursor.deleteRow()
-            if es_row:
-                del es_row
-                EBARUtils.displayMessage(messages, 'Existing Secondary Species records deleted')
-            del es_cursor
-            rmi_row = None
-            with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapInput', ['OBJECTID'],
-                                       'RangeMapID = ' + str(range_map_id)) as rmi_cursor:
-                for rmi_row in EBARUtils.updateCursor(rmi_cursor):
-                    rmi_cursor.deleteRow()
-            if rmi_row:
-                del rmi_row
-                EBARUtils.displayMessage(messages, 'Existing Range Map Input records deleted')
-            del rmi_cursor
+                                               'progress, so existing related records will be replaced')
+            with EBARUtils.BulkWriter(param_geodatabase + '/SecondarySpecies', quiet=True) as writer:
+                if writer.deleteRows('RangeMapID = ' + str(range_map_id)) > 0:
+                    EBARUtils.displayMessage(messages, 'Existing Secondary Species records deleted')
+            with EBARUtils.BulkWriter(param_geodatabase + '/RangeMapInput', quiet=True) as writer:
+                if writer.deleteRows('RangeMapID = ' + str(range_map_id)) > 0:
+                    EBARUtils.displayMessage(messages, 'Existing Range Map Input records deleted')
 
         else:
             arcpy.SelectLayerByAttribute_management('range_map_view', 'CLEAR_SELECTION')
@@ -275,69 +330,18 @@ class GenerateRangeMapTool:
                     cursor.insertRow([range_map_id, secondary_id])
             del cursor
             EBARUtils.displayMessage(messages, 'Secondary Species records created')
+        if fingerprint_field and not input_fingerprint:
+            EBARUtils.displayMessage(messages, 'Fingerprinting Range Map inputs')
+            input_fingerprint = EBARUtils.computeInputFingerprint(param_geodatabase, range_map_id, species_ids,
+                                                                  prev_range_map_ids, fingerprint_settings,
+                                                                  param_custom_polygons_covered)
 
-        # select all points for species and buffer
-        EBARUtils.displayMessage(messages, 'Buffering Input Points')
-        temp_point_buffer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputPoint', range_map_id,
-                                                           table_name_prefix, species_ids, start_time, None)
-
-        # select all lines for species and buffer
-        EBARUtils.displayMessage(messages, 'Buffering Input Lines')
-        temp_line_buffer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputLine', range_map_id,
-                                                          table_name_prefix, species_ids, start_time, None)
-
-        # select all polygons for species
-        EBARUtils.displayMessage(messages, 'Selecting Input Polygons')
-        input_polygon_layer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputPolygon', range_map_id,
-                                                             table_name_prefix, species_ids, start_time, None)
-
-        # merge buffer polygons and input polygons
-        EBARUtils.displayMessage(messages, 'Merging Buffered Points and Lines and Input Polygons')
-        temp_all_inputs = 'TempAllInputs' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-        #arcpy.Merge_management([temp_point_buffer, temp_line_buffer, 'input_polygon_layer'], temp_all_inputs, None,
-        #                       'ADD_SOURCE_INFO')
-        arcpy.Merge_management([temp_point_buffer, temp_line_buffer, input_polygon_layer], temp_all_inputs, None,
-                               'ADD_SOURCE_INFO')
-        EBARUtils.checkAddField(temp_all_inputs, 'RangeMapID', 'LONG')
-        arcpy.CalculateField_management(temp_all_inputs, 'RangeMapID', range_map_id)
-        EBARUtils.checkAddField(temp_all_inputs, 'OriginalGeometryType', 'TEXT')
-        code_block = '''
-def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
-    ret = 'P'
-    if input_line_id:
-        ret = 'L'
-    elif input_polygon_id:
-        ret = 'Y'
-    return ret'''
-        arcpy.CalculateField_management(temp_all_inputs, 'OriginalGeometryType',
-                                        'GetGeometryType(!InputPointID!, !InputLineID!, !InputPolygonID!)', 'PYTHON3',
-                                        code_block)
-        EBARUtils.checkAddField(temp_all_inputs, 'TempDate', 'DATE')
-        arcpy.CalculateField_management(temp_all_inputs, 'TempDate', '!MaxDate!', 'PYTHON3')
-        arcpy.MakeFeatureLayer_management(temp_all_inputs, 'all_inputs_layer')
-
-        # eo ranks, when available, override dates in determining historical (fake the date to accomplish this)
-        EBARUtils.displayMessage(messages, 'Applying EO Ranks, where available, to determine historical records')
-        result = arcpy.SelectLayerByAttribute_management('all_inputs_layer', 'NEW_SELECTION',
-                                                         "EORank IN ('H', 'H?', 'X', 'X?')")
-        if int(result[1]) > 0:
-            # 1000 years in the past
-            fake_date_expr = 'datetime.datetime(datetime.datetime.now().year - 1000, 1, 1)'
-            arcpy.CalculateField_management('all_inputs_layer', 'TempDate', fake_date_expr)
-        result = arcpy.SelectLayerByAttribute_management('all_inputs_layer', 'NEW_SELECTION',
-                                                         'EORank IS NOT NULL ' + \
-                                                         "AND EORank NOT IN ('', ' ', 'H', 'H?', 'X', 'X?')")
-                                                         #"AND EORank NOT IN (' ', 'F', 'F?', 'H', 'H?', 'NR', " + \
-                                                         #"'U', 'X', 'X?,')")
-        if int(result[1]) > 0:
-            # 1000 years in the future
-            fake_date_expr = 'datetime.datetime(datetime.datetime.now().year + 1000, 1, 1)'
-            arcpy.CalculateField_management('all_inputs_layer', 'TempDate', fake_date_expr)
-        arcpy.SelectLayerByAttribute_management('all_inputs_layer', 'CLEAR_SELECTION')
-
-        # pairwise intersect buffers and ecoshape polygons
-        EBARUtils.displayMessage(messages, 'Pairwise Intersecting All Inputs with Ecoshapes')
+        # ecoshapes covered by the scope and any jurisdictions/custom polygons covered
+        # (local indexed copy avoids pulling complex coastal polygons from the enterprise gdb for every run)
+        ecoshapes = EBARUtils.localEcoshapes(param_geodatabase, 'EcoshapeCoastalBuffer', messages)
+        coverage_where_clause = None
+        if param_jurisdictions_covered:
+            coverage_where_clause = 'JurisdictionID IN ' + jur_ids_comma
         if national_jur_ids or param_jurisdictions_covered:
             where_clause = ''
             if national_jur_ids:
@@ -345,26 +349,83 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
             if param_jurisdictions_covered:
                 if len(where_clause) > 0:
                     where_clause += ' AND '
-                where_clause += 'JurisdictionID IN ' + jur_ids_comma
+                where_clause += coverage_where_clause
             #arcpy.MakeFeatureLayer_management(param_geodatabase + '/Ecoshape', 'ecoshape_layer',
             #                                  'JurisdictionID IN ' + national_jur_ids)
-            arcpy.MakeFeatureLayer_management(param_geodatabase + '/EcoshapeCoastalBuffer', 'ecoshape_layer',
-                                              where_clause)
+            arcpy.MakeFeatureLayer_management(ecoshapes, 'ecoshape_layer', where_clause)
         else:
             #arcpy.MakeFeatureLayer_management(param_geodatabase + '/Ecoshape', 'ecoshape_layer')
-            arcpy.MakeFeatureLayer_management(param_geodatabase + '/EcoshapeCoastalBuffer', 'ecoshape_layer')
+            arcpy.MakeFeatureLayer_management(ecoshapes, 'ecoshape_layer')
+        scratch.track('ecoshape_layer')
         if param_custom_polygons_covered:
             arcpy.SelectLayerByLocation_management('ecoshape_layer', 'INTERSECT', param_custom_polygons_covered)
-        temp_pairwise_intersect = 'TempPairwiseIntersect' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-        arcpy.PairwiseIntersect_analysis(['all_inputs_layer', 'ecoshape_layer'], temp_pairwise_intersect)
+
+        # when requested, associate inputs with ecoshapes from the InputEcoshape table, without spatial processing,
+        # unless input geometry is needed for Range Map Input records or the associations are not current
+        use_associations = False
+        if param_use_input_ecoshapes == 'true':
+            if save_range_map_inputs_now:
+                EBARUtils.displayMessage(messages, 'Range Map Input records need input geometry, so not using '
+                                                   'InputEcoshape associations')
+            elif not EBARUtils.checkInputEcoshapeTable(param_geodatabase):
+                EBARUtils.displayMessage(messages, 'WARNING: no InputEcoshape and InputEcoshapeStamp tables, so not '
+                                                   'using InputEcoshape associations')
+            elif not EBARUtils.checkInputEcoshapeStamp(param_geodatabase):
+                EBARUtils.displayMessage(messages, 'WARNING: InputEcoshape associations were not built from the '
+                                                   'current Ecoshapes, so not using them')
+            else:
+                use_associations = True
+        if use_associations:
+            EBARUtils.displayMessage(messages, 'Using InputEcoshape associations instead of Ecoshape intersect')
+            temp_pairwise_intersect = self.associateInputs(param_geodatabase, range_map_id, table_name_prefix,
+                                                           species_ids, scratch, profile, messages)
+        else:
+            # select, buffer and merge inputs and intersect them with ecoshapes
+            # (in multi-scope mode, the intersect covers all scopes, and is reused from a previous scope unless inputs
+            # have been added or excluded for just one of the range maps)
+            input_adjustments = None
+            if shared is not None:
+                input_adjustments = EBARUtils.readRangeMapInputAdjustments(param_geodatabase, range_map_id)
+            if shared and shared['input_adjustments'] == input_adjustments:
+                profile.stage('Reuse Intersect from previous Scope')
+                EBARUtils.displayMessage(messages, 'Reusing Buffered Inputs and Ecoshape Intersect from previous Scope')
+                temp_all_inputs = shared['all_inputs']
+                temp_pairwise_intersect = shared['intersect']
+            elif shared is not None:
+                temp_all_inputs, temp_pairwise_intersect = self.intersectInputs(
+                    param_geodatabase, range_map_id, table_name_prefix, species_ids, start_time, ecoshapes,
+                    coverage_where_clause, param_custom_polygons_covered, scratch, profile, messages)
+                shared.update({'input_adjustments': input_adjustments,
+                               'all_inputs': temp_all_inputs,
+                               'intersect': temp_pairwise_intersect})
+            else:
+                temp_all_inputs, temp_pairwise_intersect = self.intersectInputs(
+                    param_geodatabase, range_map_id, table_name_prefix, species_ids, start_time, 'ecoshape_layer', None,
+                    None, scratch, profile, messages)
+            if shared is not None:
+                # this scope's part of the intersect, for this range map
+                temp_scope_intersect = scratch.name('TempScopeIntersect')
+                scope_where_clause = None
+                if national_jur_ids:
+                    scope_where_clause = 'JurisdictionID IN ' + national_jur_ids
+                arcpy.Select_analysis(temp_pairwise_intersect, temp_scope_intersect, scope_where_clause)
+                EBARUtils.calculateFields(temp_scope_intersect, {'RangeMapID': range_map_id})
+                temp_pairwise_intersect = temp_scope_intersect
+        if save_range_map_inputs_now:
+            self.addRangeMapInputAttributes(param_geodatabase, temp_pairwise_intersect, profile)
+        # prefix of intersect fields in joined layers
+        pairwise_prefix = scratch.fieldName(temp_pairwise_intersect, '')
         arcpy.AddIndex_management(temp_pairwise_intersect, 'InputDatasetID', 'idid_idx')
-        arcpy.MakeFeatureLayer_management(temp_pairwise_intersect, 'pairwise_intersect_layer')
+        if use_associations:
+            arcpy.MakeTableView_management(temp_pairwise_intersect, 'pairwise_intersect_layer')
+        else:
+            arcpy.MakeFeatureLayer_management(temp_pairwise_intersect, 'pairwise_intersect_layer')
+        scratch.track('pairwise_intersect_layer')
 
         # get max date by type per ecoshape
+        profile.stage('Max Date per Ecoshape')
         EBARUtils.displayMessage(messages, 'Determining Maximum Date per Ecoshape and DatasetType')
-        temp_ecoshape_max_polygon = 'TempEcoshapeMaxPolygon' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        temp_ecoshape_max_polygon = scratch.name('TempEcoshapeMaxPolygon')
         arcpy.AddJoin_management('pairwise_intersect_layer', 'InputDatasetID',
                                  param_geodatabase + '/InputDataset', 'InputDatasetID', 'KEEP_COMMON')
                                  #'INDEX_JOIN_FIELDS')
@@ -372,71 +433,45 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
                                  param_geodatabase + '/DatasetSource', 'DatasetSourceID', 'KEEP_COMMON')
                                  #'INDEX_JOIN_FIELDS')
         arcpy.Statistics_analysis('pairwise_intersect_layer', temp_ecoshape_max_polygon,
-                                  [['TempDate', 'MAX']], [table_name_prefix + temp_pairwise_intersect + '.EcoshapeID',
+                                  [['TempDate', 'MAX']], [pairwise_prefix + 'EcoshapeID',
                                                           table_name_prefix + 'DatasetSource.DatasetType'])
         arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'DatasetSource')
         arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'InputDataset')
 
         # create RangeMapEcoshape records based on dataset type and max date #and proportion overlap 
+        profile.stage('Range Map Ecoshape Presence')
         EBARUtils.displayMessage(messages, 'Creating Range Map Ecoshape records based on DatasetType and Maximum Date')
-        with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapEcoshape',
-                                   ['RangeMapID', 'EcoshapeID', 'Presence']) as insert_cursor:
-            input_found = False
-            # kludge because arc ends up with different field names under Enterprise gdb after joining
-            field_names = [f.name for f in arcpy.ListFields(temp_ecoshape_max_polygon) if f.aliasName in
-                           ['EcoshapeID', 'DatasetType',
-                            'MAX_' + table_name_prefix + temp_pairwise_intersect + '.tempdate',
-                            'MAX_' + table_name_prefix + temp_pairwise_intersect + '.TempDate']]
-            id_field_name = [f.name for f in arcpy.ListFields(temp_ecoshape_max_polygon) if f.aliasName ==
-                             'EcoshapeID'][0]
-            with arcpy.da.SearchCursor(temp_ecoshape_max_polygon, field_names,
-                                       sql_clause=(None, 'ORDER BY ' + id_field_name)) as search_cursor:
-                ecoshape_id = None
-                # start at "lowest" level
-                presence = 'H'
-                for row in EBARUtils.searchCursor(search_cursor):
-                    input_found = True
-                    if ecoshape_id:
-                        if row[field_names[0]] != ecoshape_id:
-                            # save previous ecoshape
-                            insert_cursor.insertRow([range_map_id, ecoshape_id, presence])
-                            # start new ecoshape
-                            ecoshape_id = None
-                            presence = 'H'
-                    ecoshape_id = row[field_names[0]]
-                    # only check for "upgrades"
-                    if row[field_names[1]] in ['Habitat Suitability', 'Range Estimate']:
-                        if presence == 'H':
-                            presence = 'X'
-                    if row[field_names[2]]:
-                        if ((row[field_names[1]] == 'Critical Habitat') or
-                            (row[field_names[1]] in ['Element Occurrences', 'Source Features',
-                                                     'Species Observations', 'Range'] and
-                             (datetime.datetime.now().year - row[field_names[2]].year)
-                             <= EBARUtils.age_for_historical)):
-                            if presence in ['H', 'X']:
-                                presence = 'P'
-                if input_found:
-                    # save final ecoshape
-                    insert_cursor.insertRow([range_map_id, ecoshape_id, presence])
-                    del row
-            del search_cursor
-        del insert_cursor
+        # arc ends up with different field names under Enterprise gdb after joining
+        field_names = EBARUtils.resolveFieldNames(temp_ecoshape_max_polygon,
+                                                  ['EcoshapeID', 'DatasetType', 'MAX_TempDate'])
+        with arcpy.da.SearchCursor(temp_ecoshape_max_polygon, list(field_names.values())) as search_cursor:
+            max_rows = [row for row in search_cursor]
+        del search_cursor
+        # (kept in memory by EcoshapeID and written as changes against any existing records at the end)
+        ecoshape_rows = {}
+        input_found = len(max_rows) > 0
+        if input_found:
+            ecoshape_ids, presences = PresenceRules.classifyPresence([row[0] for row in max_rows],
+                                                                     [row[1] for row in max_rows],
+                                                                     [row[2] for row in max_rows])
+            for ecoshape_id, presence in zip(ecoshape_ids.tolist(), presences.tolist()):
+                ecoshape_rows[ecoshape_id] = dict.fromkeys(range_map_ecoshape_fields)
+                ecoshape_rows[ecoshape_id]['Presence'] = presence
         if not input_found:
             EBARUtils.displayMessage(messages, 'WARNING: No inputs/buffers overlap ecoshapes')
 
         # get ecoshape input counts by dataset
+        profile.stage('Count by Dataset')
         EBARUtils.displayMessage(messages, 'Counting Ecoshape Inputs by Dataset')
-        temp_ecoshape_countby_dataset = 'TempEcoshapeCountByDataset' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        temp_ecoshape_countby_dataset = scratch.name('TempEcoshapeCountByDataset')
         arcpy.Statistics_analysis('pairwise_intersect_layer', temp_ecoshape_countby_dataset,
                                   [['InputPointID', 'COUNT'], ['MinDate', 'MIN'], ['MaxDate', 'MAX'],
                                    ['MaxDate', 'MIN']], ['EcoshapeID', 'InputDatasetID'])
 
         # get ecoshape input counts by source
+        profile.stage('Count by Dataset Source')
         EBARUtils.displayMessage(messages, 'Counting Ecoshape Inputs by Dataset Source')
-        temp_ecoshape_countby_source = 'TempEcoshapeCountBySource' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        temp_ecoshape_countby_source = scratch.name('TempEcoshapeCountBySource')
         arcpy.AddJoin_management('pairwise_intersect_layer', 'InputDatasetID',
                                  param_geodatabase + '/InputDataset', 'InputDatasetID', 'KEEP_COMMON')
         arcpy.AddJoin_management('pairwise_intersect_layer', 'DatasetSourceID',
@@ -450,6 +485,7 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
         arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'InputDataset')
 
         # apply Reviews and summaries to RangeMapEcoshape records
+        profile.stage('Apply Reviews')
         EBARUtils.displayMessage(messages,
                                  'Applying Reviews and summaries to Range Map Ecoshape records')
         if len(prev_range_map_ids) > 0:
@@ -458,254 +494,144 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
                                      'EcoshapeID', 'KEEP_COMMON')
             arcpy.AddJoin_management('ecoshape_review_view', 'ReviewID', param_geodatabase + '/Review', 'ReviewID',
                                      'KEEP_COMMON')
-        # loop existing range map ecoshapes
-        update_row = None
-        with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape',
-                                   ['EcoshapeID', 'RangeMapEcoshapeID', 'RangeMapID', 'Presence',
-                                    'UsageType', 'RangeMapEcoshapeNotes', 'MigrantStatus'],
-                                   'RangeMapID = ' + str(range_map_id)) as update_cursor:
-            for update_row in EBARUtils.updateCursor(update_cursor):
-                # check for ecoshape "remove" reviews
-                remove = False
-                if len(prev_range_map_ids) > 0:
-                    with arcpy.da.SearchCursor('ecoshape_review_view', [table_name_prefix + 'EcoshapeReview.OBJECTID'],
-                                               table_name_prefix + 'Review.RangeMapID IN (' + \
-                                               prev_range_map_ids + ') AND ' + table_name_prefix + \
-                                               'Review.UseForMapGen = 1 AND ' + table_name_prefix + \
-                                               'EcoshapeReview.UseForMapGen = 1 AND ' + table_name_prefix + \
-                                               "EcoshapeReview.Markup = 'R' AND "  + table_name_prefix + \
-                                               'EcoshapeReview.EcoshapeID = ' + \
-                                               str(update_row['EcoshapeID'])) as search_cursor:
-                        for search_row in EBARUtils.searchCursor(search_cursor):
-                            remove = True
-                    del search_cursor
-                if remove:
-                    del search_row
-                    # keep removed ecoshapes, but without Presence or UsageType
-                    #update_cursor.deleteRow()
-                #else:
-                # update
-                # kludge because arc ends up with different field names under Enterprise gdb after joining
-                #MIN_ebarkba.sde.TempPairwiseIntersect202582513637.mindate
-                field_names = [f.name for f in arcpy.ListFields(temp_ecoshape_countby_source) if f.aliasName in
-                               ['DatasetSourceName', 'DatasetType', 'FREQUENCY', 'frequency',
-                                'MIN_MinDate', 'min_mindate',
-                                'MIN_' + table_name_prefix + temp_pairwise_intersect + '.mindate',
-                                'MAX_MaxDate', 'max_maxdate',
-                                'MAX_' + table_name_prefix + temp_pairwise_intersect + '.maxdate',
-                                'MIN_MaxDate', 'min_maxdate',
-                                'MIN_' + table_name_prefix + temp_pairwise_intersect + '.maxdate']]
-                id_field_name = [f.name for f in arcpy.ListFields(temp_ecoshape_countby_source) if f.aliasName ==
-                                 'EcoshapeID'][0]
-                summary = ''
-                with arcpy.da.SearchCursor(temp_ecoshape_countby_source, field_names,
-                                           id_field_name + ' = ' + str(update_row['EcoshapeID'])) as search_cursor:
-                    presence = update_row['Presence']
-                    usage_type = update_row['UsageType']
-                    # keep removed ecoshapes, but without Presence or UsageType
-                    if remove:
-                        presence = None
-                        usage_type = None
-                    migrant_status = update_row['MigrantStatus']
-                    for search_row in EBARUtils.searchCursor(search_cursor):
-                        if len(summary) > 0:
-                            summary += ', '
-                        summary += str(search_row[field_names[2]]) + ' ' + search_row[field_names[0]]
-                        if search_row[field_names[4]]:
-                            min_year = search_row[field_names[4]].year
-                            max_year = search_row[field_names[4]].year
-                            if search_row[field_names[5]].year < min_year:
-                                min_year = search_row[field_names[5]].year
-                            if search_row[field_names[3]]:
-                                if search_row[field_names[3]].year < min_year:
-                                    min_year = search_row[field_names[3]].year
-                            summary += ' ('
-                            if min_year < max_year:
-                                summary += str(min_year) + '-'
-                            summary += str(max_year) + ')'
-                if len(summary) > 0:
-                    del search_row
-                del search_cursor
-                summary = 'Input records - ' + summary
-                # check for ecoshape "update" reviews
-                if len(prev_range_map_ids) > 0:
-                    search_row = None
-                    with arcpy.da.SearchCursor('ecoshape_review_view',
-                                                [table_name_prefix + 'EcoshapeReview.Markup',
-                                                 table_name_prefix + 'EcoshapeReview.UsageTypeMarkup',
-                                                 table_name_prefix + 'EcoshapeReview.EcoshapeReviewNotes',
-                                                 table_name_prefix + 'EcoshapeReview.Username',
-                                                 table_name_prefix + 'EcoshapeReview.MigrantStatus'],
-                                                table_name_prefix + 'Review.RangeMapID IN (' + \
-                                                prev_range_map_ids + ') AND ' + table_name_prefix + \
-                                                'Review.UseForMapGen = 1 AND ' + table_name_prefix + \
-                                                'EcoshapeReview.UseForMapGen = 1 AND ' + table_name_prefix + \
-                                                # keep removed ecoshapes, but without Presence or UsageType
-                                                #"EcoshapeReview.Markup IN ('P', 'X', 'H') AND "  + table_name_prefix + \
-                                                'EcoshapeReview.EcoshapeID = ' + \
-                                                str(update_row['EcoshapeID'])) as search_cursor:
-                        for search_row in EBARUtils.searchCursor(search_cursor):
-                            presence = search_row[table_name_prefix + 'EcoshapeReview.Markup']
-                            usage_type_markup = search_row[table_name_prefix + 'EcoshapeReview.UsageTypeMarkup']
-                            # keep existing presence if only usage_type_markup
-                            if usage_type_markup and not presence:
-                                presence = update_row['Presence']
-                            # keep removed ecoshapes, but without Presence or UsageType
-                            if presence == 'R':
-                                presence = None
-                                usage_type = None
-                            migrant_status = search_row[table_name_prefix + 'EcoshapeReview.MigrantStatus']
-                            # get expert name and publish settings to populate reviewer comments
-                            with arcpy.da.SearchCursor(param_geodatabase + '/Expert',
-                                                        ['ExpertName', 'PublishName', 'PublishComments'],
-                                                        "Username = '" + search_row[table_name_prefix +
-                                                        'EcoshapeReview.Username'] + "'") as expert_cursor:
-                                expert_comment = None
-                                summary += '; Expert Ecoshape Review'
-                                for expert_row in EBARUtils.searchCursor(expert_cursor):
-                                    if expert_row['PublishName']:
-                                        expert_comment = expert_row['ExpertName']
-                                    else:
-                                        expert_comment = 'Anonymous'
-                                    expert_comment += ' Reviewer Comment - '
-                                    if expert_row['PublishComments']:
-                                        expert_comment += search_row[table_name_prefix + \
-                                            'EcoshapeReview.EcoshapeReviewNotes']
-                                    else:
-                                        expert_comment += 'Unpublished'
-                                    summary += '<br>' + expert_comment
-                                if expert_comment:
-                                    del expert_row
-                    if search_row:
-                        del search_row
-                    del search_cursor
-                update_cursor.updateRow([update_row['EcoshapeID'], update_row['RangeMapEcoshapeID'],
-                                         update_row['RangeMapID'], presence, usage_type, summary, migrant_status])
-        if update_row:
-            del update_row
-        del update_cursor
-
-        # loop review records and check for need to add
+        # load reviews and experts once, rather than querying them for every ecoshape and review
+        ecoshape_reviews = {}
+        experts_dict = {}
         if len(prev_range_map_ids) > 0:
-            condition = table_name_prefix + 'Review.RangeMapID IN (' + \
-                prev_range_map_ids + ') AND ' + table_name_prefix + \
-                'Review.UseForMapGen = 1 AND ' + table_name_prefix + \
-                'EcoshapeReview.UseForMapGen = 1 AND ' + table_name_prefix + \
-                "EcoshapeReview.Markup IN ('P', 'X', 'H')"
+            ecoshape_reviews = EBARUtils.readEcoshapeReviews('ecoshape_review_view', table_name_prefix,
+                                                             prev_range_map_ids)
+            experts_dict = EBARUtils.readExperts(param_geodatabase)
+        # arc ends up with different field names under Enterprise gdb after joining
+        field_names = EBARUtils.resolveFieldNames(temp_ecoshape_countby_source,
+                                                  ['EcoshapeID', 'DatasetSourceName', 'FREQUENCY', 'MIN_MinDate',
+                                                   'MAX_MaxDate', 'MIN_MaxDate'])
+        # build input summaries for all ecoshapes in one ordered pass, rather than a query per ecoshape
+        ecoshape_summaries = {}
+        search_row = None
+        with arcpy.da.SearchCursor(temp_ecoshape_countby_source, list(field_names.values()),
+                                   sql_clause=(None, 'ORDER BY OBJECTID')) as search_cursor:
+            for search_row in EBARUtils.searchCursor(search_cursor):
+                ecoshape_summaries.setdefault(search_row[field_names['EcoshapeID']], []).append(
+                    EBARUtils.formatSourceSummary(search_row[field_names['FREQUENCY']],
+                                                  search_row[field_names['DatasetSourceName']],
+                                                  search_row[field_names['MIN_MinDate']],
+                                                  search_row[field_names['MAX_MaxDate']],
+                                                  search_row[field_names['MIN_MaxDate']]))
+        if search_row:
+            del search_row
+        del search_cursor
+        # loop range map ecoshapes
+        for ecoshape_id, ecoshape_row in ecoshape_rows.items():
+            reviews = ecoshape_reviews.get(ecoshape_id, [])
+            # check for ecoshape "remove" reviews
+            remove = False
+            for review in reviews:
+                if review['Markup'] == 'R':
+                    remove = True
+            # keep removed ecoshapes, but without Presence or UsageType
+            #if remove:
+            #    update_cursor.deleteRow()
+            #else:
+            # update
+            presence = ecoshape_row['Presence']
+            usage_type = ecoshape_row['UsageType']
+            # keep removed ecoshapes, but without Presence or UsageType
+            if remove:
+                presence = None
+                usage_type = None
+            migrant_status = ecoshape_row['MigrantStatus']
+            summary = 'Input records - ' + ', '.join(ecoshape_summaries.get(ecoshape_id, []))
+            # apply ecoshape "update" reviews
+            for review in reviews:
+                presence = review['Markup']
+                # keep existing presence if only usage_type_markup
+                if review['UsageTypeMarkup'] and not presence:
+                    presence = ecoshape_row['Presence']
+                # keep removed ecoshapes, but without Presence or UsageType
+                if presence == 'R':
+                    presence = None
+                    usage_type = None
+                migrant_status = review['MigrantStatus']
+                # expert name and publish settings to populate reviewer comments
+                summary += '; Expert Ecoshape Review'
+                for expert_row in experts_dict.get(review['Username'], []):
+                    summary += '<br>' + EBARUtils.formatExpertComment(expert_row, review['EcoshapeReviewNotes'])
+            ecoshape_row.update({'Presence': presence, 'UsageType': usage_type, 'RangeMapEcoshapeNotes': summary,
+                                 'MigrantStatus': migrant_status})
+
+        # check reviews for need to add
+        if len(ecoshape_reviews) > 0:
+            ecoshape_filter = None
             if scope == 'N' or param_jurisdictions_covered or param_custom_polygons_covered:
-                ecoshape_ids_comma = '('
+                ecoshape_filter = set()
                 search_row = None
                 with arcpy.da.SearchCursor('ecoshape_layer', ['EcoshapeID']) as search_cursor:
                     for search_row in EBARUtils.searchCursor(search_cursor):
-                        if len(ecoshape_ids_comma) > 1:
-                            ecoshape_ids_comma += ', '
-                        ecoshape_ids_comma += str(search_row['EcoshapeID'])
+                        ecoshape_filter.add(search_row['EcoshapeID'])
                 if search_row:
                     del search_row
                 del search_cursor
-                ecoshape_ids_comma += ')'
-                condition += ' AND ' + table_name_prefix + 'EcoshapeReview.EcoshapeID IN ' + ecoshape_ids_comma
-            search_row = None
-            with arcpy.da.SearchCursor('ecoshape_review_view',
-                                       [table_name_prefix + 'EcoshapeReview.EcoshapeID',
-                                        table_name_prefix + 'EcoshapeReview.Markup',
-                                        table_name_prefix + 'EcoshapeReview.EcoshapeReviewNotes',
-                                        table_name_prefix + 'EcoshapeReview.Username',
-                                        table_name_prefix + 'EcoshapeReview.MigrantStatus'],
-                                       condition) as search_cursor:
-                for search_row in EBARUtils.searchCursor(search_cursor):
-                    # check for ecoshape
-                    add = True
-                    with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape', ['EcoshapeID'],
-                                               'RangeMapID = ' + str(range_map_id) + ' AND EcoshapeID = ' +
-                                               str(search_row[table_name_prefix +
-                                               'EcoshapeReview.EcoshapeID'])) as update_cursor:
-                        # EBARUtils.displayMessage(messages, 'DEBUG - ' + str(search_row[table_name_prefix +
-                        #                                    'EcoshapeReview.EcoshapeID']))
-                        for update_row in EBARUtils.updateCursor(update_cursor):
-                            add = False
-                    if not add:
-                        del update_row
-                    else:
-                        # get expert name and publish settings to populate reviewer comments
-                        with arcpy.da.SearchCursor(param_geodatabase + '/Expert',
-                                                    ['ExpertName', 'PublishName', 'PublishComments'],
-                                                    "Username = '" + search_row[table_name_prefix +
-                                                    'EcoshapeReview.Username'] + "'") as expert_cursor:
-                            expert_comment = None
-                            notes = 'Expert Ecoshape Review'
-                            for expert_row in EBARUtils.searchCursor(expert_cursor):
-                                if expert_row['PublishName']:
-                                    expert_comment = expert_row['ExpertName']
-                                else:
-                                    expert_comment = 'Anonymous'
-                                expert_comment += ' Reviewer Comment - '
-                                if expert_row['PublishComments']:
-                                    expert_comment += search_row[table_name_prefix + \
-                                        'EcoshapeReview.EcoshapeReviewNotes']
-                                else:
-                                    expert_comment += 'Unpublished'
-                                notes += '<br>' + expert_comment
-                            if expert_comment:
-                                del expert_row
-                        with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapEcoshape',
-                                                   ['RangeMapID', 'EcoshapeID', 'Presence',
-                                                    'RangeMapEcoshapeNotes', 'MigrantStatus']) as insert_cursor:
-                            insert_cursor.insertRow([range_map_id,
-                                                     search_row[table_name_prefix + 'EcoshapeReview.EcoshapeID'],
-                                                     search_row[table_name_prefix + 'EcoshapeReview.Markup'],
-                                                     notes,
-                                                     search_row[table_name_prefix + 'EcoshapeReview.MigrantStatus']])
-                    del update_cursor
-            if search_row:
-                del search_row
-            del search_cursor
+            for ecoshape_id in ecoshape_reviews:
+                if ecoshape_id in ecoshape_rows:
+                    continue
+                if ecoshape_filter is not None and ecoshape_id not in ecoshape_filter:
+                    continue
+                for review in ecoshape_reviews[ecoshape_id]:
+                    if review['Markup'] in ('P', 'X', 'H'):
+                        # expert name and publish settings to populate reviewer comments
+                        notes = 'Expert Ecoshape Review'
+                        for expert_row in experts_dict.get(review['Username'], []):
+                            notes += '<br>' + EBARUtils.formatExpertComment(expert_row,
+                                                                            review['EcoshapeReviewNotes'])
+                        # only the first qualifying review adds the ecoshape
+                        ecoshape_rows[ecoshape_id] = dict.fromkeys(range_map_ecoshape_fields)
+                        ecoshape_rows[ecoshape_id].update({'Presence': review['Markup'],
+                                                           'RangeMapEcoshapeNotes': notes,
+                                                           'MigrantStatus': review['MigrantStatus']})
+                        break
 
         # remove from pairwise intersect any inputs not in final ecoshapes
+        profile.stage('Remove Inputs not in Final Ecoshapes')
         EBARUtils.displayMessage(messages, 'Removing any Inputs not in final Ecoshapes')
-        where_clause = 'EcoshapeID IN (SELECT EcoshapeID FROM RangeMapEcoshape WHERE RangeMapID = ' + \
-            str(range_map_id) + ')'
+        # (local ecoshapes can't sub-select from RangeMapEcoshape, so use IDs already in hand)
+        where_clause = 'EcoshapeID IN (' + ','.join(map(str, sorted(ecoshape_rows))) + ')'
+        if len(ecoshape_rows) == 0:
+            where_clause = '1 = 0'
         arcpy.SelectLayerByAttribute_management('ecoshape_layer', 'NEW_SELECTION', where_clause)
-        arcpy.SelectLayerByLocation_management('pairwise_intersect_layer', 'INTERSECT', 'ecoshape_layer')
+        if use_associations:
+            arcpy.SelectLayerByAttribute_management('pairwise_intersect_layer', 'NEW_SELECTION', where_clause)
+        else:
+            arcpy.SelectLayerByLocation_management('pairwise_intersect_layer', 'INTERSECT', 'ecoshape_layer')
 
         # create RangeMapEcoshapeInputDataset records based on summary
+        profile.stage('Range Map Ecoshape Input Datasets')
         EBARUtils.displayMessage(messages, 'Creating Range Map Ecoshape Input Dataset records')
-        rme_row = None
         # field_names = [f.name for f in arcpy.ListFields(temp_ecoshape_countby_dataset) if f.name in
         #                ['EcoshapeID', 'ecoshapeid', 'InputDatasetID', 'inputdatasetid', 'FREQUENCY', 'frequency',
         #                 'MIN_MinDate', 'min_mindate', 'MAX_MaxDate', 'max_maxdate']]
         # EBARUtils.displayMessage(messages, field_names)
-        with arcpy.da.SearchCursor(param_geodatabase + '/RangeMapEcoshape', ['RangeMapEcoshapeID', 'EcoshapeID'],
-                                   'RangeMapID = ' + str(range_map_id)) as rme_cursor:
-            for rme_row in EBARUtils.searchCursor(rme_cursor):
-                with arcpy.da.SearchCursor(temp_ecoshape_countby_dataset,
-                                           ['EcoshapeID', 'InputDatasetID', 'FREQUENCY', 'MIN_MinDate', 'MAX_MaxDate',
-                                            'MIN_MaxDate'],
-                                           'EcoshapeID = ' + str(rme_row['EcoshapeID'])) as search_cursor:
-                    row = None
-                    for row in search_cursor:
-                        #summary = str(row['FREQUENCY']) + ' input record(s)'
-                        with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapEcoshapeInputDataset',
-                                                   ['RangeMapEcoshapeID', 'InputDatasetID',
-                                                    'InputDataCount', 'MinDate', 'MaxDate']) as insert_cursor:
-                                                    # 'InputDataSummary']) as insert_cursor:
-                            min_date = row[3]
-                            if not min_date:
-                                min_date = row[5]
-                            insert_cursor.insertRow([rme_row['RangeMapEcoshapeID'], row[1], row[2], min_date, row[4]])
-                                                     #row['FREQUENCY']])
-                if row:
-                    del row
-                del search_cursor
-        if rme_row:
-            del rme_row
-        del rme_cursor
+        # (kept in memory by EcoshapeID and InputDatasetID and written with the Range Map Ecoshape records)
+        input_dataset_rows = {}
+        row = None
+        with arcpy.da.SearchCursor(temp_ecoshape_countby_dataset,
+                                   ['EcoshapeID', 'InputDatasetID', 'FREQUENCY', 'MIN_MinDate',
+                                    'MAX_MaxDate', 'MIN_MaxDate']) as search_cursor:
+            for row in EBARUtils.searchCursor(search_cursor):
+                if row['EcoshapeID'] in ecoshape_rows:
+                    min_date = row['MIN_MinDate']
+                    if not min_date:
+                        min_date = row['MIN_MaxDate']
+                    input_dataset_rows[(row['EcoshapeID'], row['InputDatasetID'])] = [row['FREQUENCY'], min_date,
+                                                                                      row['MAX_MaxDate']]
+        if row:
+            del row
+        del search_cursor
 
         # migratory
-        usage_type_stats = param_geodatabase + '/TempUTStats' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        usage_type_stats = scratch.name('TempUTStats')
         if param_differentiate_usage_type == 'true':
             # set UsageType from input data
+            profile.stage('Usage Type')
             EBARUtils.displayMessage(messages, 'Applying Breeding and Behaviour Codes and Location Use Class ' + \
                                      'to set UsageType')
 
@@ -714,386 +640,86 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
             for domain in domains:
                 if domain.name == 'BreedingAndBehaviourCode':
                     bbc_domain_values = domain.codedValues
-                    bbc_domain_values_lower = {}
-                    for bbc_domain_value in bbc_domain_values:
-                        bbc_domain_values_lower[bbc_domain_value.lower()] = bbc_domain_values[bbc_domain_value]
 
             # summarize all input records by ecoshape
             # arcpy.Statistics_analysis('pairwise_intersect_layer', usage_type_stats, [['EcoshapeID', 'COUNT']],
             #                           ['EcoshapeID', 'BreedingAndBehaviourCode'])
             arcpy.Statistics_analysis('pairwise_intersect_layer', usage_type_stats, [['EcoshapeID', 'COUNT']],
                                       ['EcoshapeID', 'BreedingAndBehaviourCode', 'LocUseClass'])
-            row = None
-            # with arcpy.da.SearchCursor(usage_type_stats, ['EcoshapeID', 'BreedingAndBehaviourCode'],
-            #                            sql_clause=(None, 'ORDER BY EcoshapeID')) as cursor:
-            with arcpy.da.SearchCursor(usage_type_stats, ['EcoshapeID', 'BreedingAndBehaviourCode', 'LocUseClass'],
-                                       sql_clause=(None, 'ORDER BY EcoshapeID')) as cursor:
-                prev_ecoshape_id = None
-                usage_type = None
-                for row in EBARUtils.searchCursor(cursor):
-                    if row['EcoshapeID'] != prev_ecoshape_id:
-                        if prev_ecoshape_id and usage_type:
-                            # save previous
-                            update_row = None
-                            with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape', ['Presence',
-                                                                                                 'UsageType'],
-                                                       'RangeMapID = ' + str(range_map_id) + ' AND EcoshapeID = ' +
-                                                       str(prev_ecoshape_id)) as update_cursor:
-                                for update_row in EBARUtils.updateCursor(update_cursor):
-                                    # keep removed ecoshapes, but without Presence or UsageType
-                                    if not update_row['Presence']:
-                                        usage_type = None
-                                    update_cursor.updateRow([update_row['Presence'], usage_type])
-                            if update_row:
-                                del update_row
-                            del update_cursor
-                        # reset for new ecoshape
-                        prev_ecoshape_id = row['EcoshapeID']
-                        usage_type = None
-                    # any BBC confirmation in ecoshape prevails
-                    if row['BreedingAndBehaviourCode']:
-                        bbc_lower = row['BreedingAndBehaviourCode'].lower()
-                        if 'Confirmed' in bbc_domain_values_lower[bbc_lower]:
-                            usage_type = 'B'
-                        elif ('Probable' in bbc_domain_values_lower[bbc_lower] or
-                              'Possible' in bbc_domain_values_lower[bbc_lower]) and usage_type != 'B':
-                            usage_type = 'P'
-                    # relevant LUCs in ecoshape prevail
-                    if row['LocUseClass']:
-                        luc_lower = row['LocUseClass'].lower()
-                        if luc_lower in EBARUtils.breeding_land_use_classes and usage_type != 'B':
-                            usage_type = 'B'
-            if row:
-                if prev_ecoshape_id and usage_type:
-                    # save final
-                    update_row = None
-                    with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape', ['Presence', 'UsageType'],
-                                               'RangeMapID = ' + str(range_map_id) + ' AND EcoshapeID = ' +
-                                               str(prev_ecoshape_id)) as update_cursor:
-                        for update_row in EBARUtils.updateCursor(update_cursor):
-                            # keep removed ecoshapes, but without Presence or UsageType
-                            if not update_row['Presence']:
-                                usage_type = None
-                            update_cursor.updateRow([update_row['Presence'], usage_type])
-                    if update_row:
-                        del update_row
-                    del update_cursor
-                del row
+            with arcpy.da.SearchCursor(usage_type_stats,
+                                       ['EcoshapeID', 'BreedingAndBehaviourCode', 'LocUseClass']) as cursor:
+                stats_rows = [row for row in cursor]
             del cursor
+            ecoshape_ids, usage_types = PresenceRules.classifyUsageType([row[0] for row in stats_rows],
+                                                                        [row[1] for row in stats_rows],
+                                                                        [row[2] for row in stats_rows],
+                                                                        bbc_domain_values)
+            ecoshape_usage_types = {}
+            for ecoshape_id, usage_type in zip(ecoshape_ids.tolist(), usage_types.tolist()):
+                if usage_type:
+                    ecoshape_usage_types[ecoshape_id] = usage_type
+            for ecoshape_id, usage_type in ecoshape_usage_types.items():
+                if ecoshape_id in ecoshape_rows:
+                    # keep removed ecoshapes, but without Presence or UsageType
+                    if not ecoshape_rows[ecoshape_id]['Presence']:
+                        usage_type = None
+                    ecoshape_rows[ecoshape_id]['UsageType'] = usage_type
 
             # apply UsageType from reviews
-            if len(prev_range_map_ids) > 0:
+            if len(ecoshape_reviews) > 0:
                 EBARUtils.displayMessage(messages, 'Applying UsageType from Reviews')
-                # loop all reviews
-                search_row = None
-                with arcpy.da.SearchCursor('ecoshape_review_view',
-                                            [table_name_prefix + 'EcoshapeReview.UsageTypeMarkup',
-                                             table_name_prefix + 'EcoshapeReview.EcoshapeID',
-                                             table_name_prefix + 'Review.RangeMapID'],
-                                            table_name_prefix + 'Review.RangeMapID IN (' +
-                                            prev_range_map_ids + ') AND ' + table_name_prefix +
-                                            'Review.UseForMapGen = 1 AND ' + table_name_prefix +
-                                            'EcoshapeReview.UseForMapGen = 1 AND ' + table_name_prefix +
-                                            'EcoshapeReview.UsageTypeMarkup IS NOT NULL') as search_cursor:
-                    for search_row in EBARUtils.searchCursor(search_cursor):
-                        # compare to range map
-                        update_row = None
-                        with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape', ['Presence', 'UsageType'],
-                                                   'RangeMapID = ' + str(range_map_id) + ' AND EcoshapeID = ' +
-                                                   str(search_row[table_name_prefix + 'EcoshapeReview.EcoshapeID'])
-                                                   ) as update_cursor:
-                            for update_row in EBARUtils.updateCursor(update_cursor):
-                                if (search_row[table_name_prefix + 'EcoshapeReview.UsageTypeMarkup'] !=
-                                    update_row['UsageType']):
-                                    new_usagetype = search_row[table_name_prefix + 'EcoshapeReview.UsageTypeMarkup']
-                                    if new_usagetype == 'N':
-                                        # non-breeding markup results in no UsageType
-                                        new_usagetype = None
-                                    # keep removed ecoshapes, but without Presence or UsageType
-                                    if not update_row['Presence']:
-                                        new_usagetype = None
-                                    update_cursor.updateRow([update_row['Presence'], new_usagetype])
-                        if update_row:
-                            del update_row
-                        del update_cursor
-                if search_row:
-                    del search_row
-                del search_cursor
+                for ecoshape_id, ecoshape_row in ecoshape_rows.items():
+                    # apply reviews in order, each comparing to the result of the previous
+                    usage_type = ecoshape_row['UsageType']
+                    for review in ecoshape_reviews.get(ecoshape_id, []):
+                        if review['UsageTypeMarkup'] is not None and review['UsageTypeMarkup'] != usage_type:
+                            usage_type = review['UsageTypeMarkup']
+                            if usage_type == 'N':
+                                # non-breeding markup results in no UsageType
+                                usage_type = None
+                            # keep removed ecoshapes, but without Presence or UsageType
+                            if not ecoshape_row['Presence']:
+                                usage_type = None
+                    ecoshape_row['UsageType'] = usage_type
         
         # get min/max date by ecoshape
+        profile.stage('Min/Max Date by Ecoshape')
         EBARUtils.displayMessage(messages, 'Getting Min/Max Date by Ecoshape')
-        temp_minmax_dateby_ecoshape = 'TempMinMaxDateByEcoshape' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        temp_minmax_dateby_ecoshape = scratch.name('TempMinMaxDateByEcoshape')
         arcpy.Statistics_analysis('pairwise_intersect_layer', temp_minmax_dateby_ecoshape,
                                   [['MinDate','MIN'], ['MaxDate', 'MAX'], ['MaxDate', 'MIN']], ['EcoshapeID'])
 
         # count overall input records by source
+        profile.stage('Overall Count by Dataset Source')
         EBARUtils.displayMessage(messages, 'Counting Overall Inputs by Dataset Source')
         arcpy.AddJoin_management('pairwise_intersect_layer', 'InputDatasetID',
                                  param_geodatabase + '/InputDataset', 'InputDatasetID', 'KEEP_COMMON')
         arcpy.AddJoin_management('pairwise_intersect_layer', 'DatasetSourceID',
                                  param_geodatabase + '/DatasetSource', 'DatasetSourceID', 'KEEP_COMMON')
-        temp_overall_countby_source = 'TempOverallCountBySource' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        temp_overall_countby_source = scratch.name('TempOverallCountBySource')
         arcpy.Statistics_analysis('pairwise_intersect_layer', temp_overall_countby_source,
                                   [['InputDatasetID','COUNT'], ['MinDate', 'MIN'], ['MaxDate', 'MAX'],
                                    ['MaxDate', 'MIN']],
                                   [table_name_prefix + 'DatasetSource.DatasetSourceName'])
 
         # create RangeMapInput records for overlay display in EBAR Reviewer
-        if param_save_range_map_inputs == 'true':
-            EBARUtils.displayMessage(messages, 'Creating Range Map Input records for overlay display in EBAR Reviewer')
-            # temp_restrictions = 'TempRestrictions' + str(start_time.year) + str(start_time.month) + \
-            #     str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-            # arcpy.TableToTable_conversion(param_geodatabase + '/RestrictedJurisdictionSpecies', param_geodatabase,
-            #                             temp_restrictions, 'SpeciesID IN (' + species_ids + ')')
-            # arcpy.AddJoin_management('pairwise_intersect_layer', table_name_prefix + 'DatasetSource.CDCJurisdictionID',
-            #                         param_geodatabase + '/' + temp_restrictions, 'CDCJurisdictionID', 'KEEP_ALL')
-            # arcpy.SelectLayerByAttribute_management('pairwise_intersect_layer', 'SUBSET_SELECTION',
-            #                                         '(' + table_name_prefix + "InputDataset.Restrictions = 'N') OR" +
-            #                                         '(' + table_name_prefix + "InputDataset.Restrictions = 'R' AND " +
-            #                                         table_name_prefix + "DatasetSource.RestrictionBySpecies = 1 AND " +
-            #                                         table_name_prefix + "DatasetSource.CDCJurisdictionID IS NOT NULL AND " +
-            #                                         table_name_prefix + temp_restrictions + '.SpeciesID IS NULL)')
-            arcpy.AddJoin_management('pairwise_intersect_layer', 'SpeciesID', param_geodatabase + '/ESTH',
-                                     'SpeciesID', 'KEEP_ALL')
-            arcpy.SelectLayerByAttribute_management('pairwise_intersect_layer', 'SUBSET_SELECTION',
-                                                    '(' + table_name_prefix + 'ESTH.SpeciesID IS NULL OR ' +
-                                                    table_name_prefix + 'DatasetSource.CDCJurisdictionID IS NULL) AND (' +
-                                                    table_name_prefix + "DatasetSource.PermitEBARReviewerApp = 'Y' OR " +
-                                                    table_name_prefix + "DatasetSource.PermitAll = 'Y')")
-            arcpy.AddJoin_management('pairwise_intersect_layer', 'SpeciesID',
-                                     param_geodatabase + '/BIOTICS_ELEMENT_NATIONAL', 'SpeciesID', 'KEEP_COMMON')
-                                     #'INDEX_JOIN_FIELDS')
-            arcpy.AddJoin_management('pairwise_intersect_layer', 'SynonymID',
-                                     param_geodatabase + '/Synonym', 'SynonymID', 'KEEP_ALL') #, 'INDEX_JOIN_FIELDS')
-            # first dissolve on FID_TempAllIinputs to rebuild polygons split during Ecoshape intersect
-            temp_dissolve = 'TempDissolve' + str(start_time.year) + str(start_time.month) + \
-                str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-            arcpy.Dissolve_management('pairwise_intersect_layer', temp_dissolve,
-                                      [table_name_prefix + temp_pairwise_intersect + '.FID_' + temp_all_inputs],
-                                      [[table_name_prefix + temp_pairwise_intersect + '.RangeMapID', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.OriginalGeometryType', 'FIRST'],
-                                       [table_name_prefix + 'BIOTICS_ELEMENT_NATIONAL.NATIONAL_SCIENTIFIC_NAME', 'FIRST'],
-                                       [table_name_prefix + 'Synonym.SynonymName', 'FIRST'],
-                                       [table_name_prefix + 'DatasetSource.DatasetSourceName', 'FIRST'],
-                                       [table_name_prefix + 'DatasetSource.DatasetType', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.Accuracy', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.MaxDate', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.CoordinatesObscured', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.EORank', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.DatasetSourceUniqueID', 'FIRST'],
-                                       [table_name_prefix + temp_pairwise_intersect + '.BreedingAndBehaviourCode', 'FIRST']])
-            # simplify point-derived polygons in batches to avoid issues with performance and memory usage
-            result = arcpy.GetCount_management(temp_dissolve)
-            polygon_count = int(result[0])
-            arcpy.MakeFeatureLayer_management(temp_dissolve, 'dissolve_layer')
-            batch_size = 10000
-            tolerance_specs = {'100': (100000, 500),
-                               '10': (500, 50),
-                               '1': (50, 5),
-                               '0.1': (5, 1)}
-            batch_count = 1
-            temp_batch = 'TempBatch' + str(start_time.year) + str(start_time.month) + \
-                str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
-            while (batch_size * (batch_count - 1)) <= polygon_count:
-                for tolerance in tolerance_specs.keys():
-                    # selection for current batch
-                    # kludge because arc ends up with different field names under Enterprise gdb after joining
-                    field_names = [f.name for f in arcpy.ListFields(temp_dissolve) if f.aliasName in
-                                   ['FIRST_' + table_name_prefix + temp_pairwise_intersect + '.Accuracy',
-                                    'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.accuracy',
-                                    'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.OriginalGeometryType',                                    
-                                    'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.originalgeometrytype']]
-                    arcpy.SelectLayerByAttribute_management('dissolve_layer', 'NEW_SELECTION',
-                                                            'objectid > ' + str(batch_size * (batch_count - 1)) +
-                                                            ' AND objectid <= ' + str(batch_size * batch_count) +
-                                                            ' AND ' + field_names[1] + ' < ' +
-                                                            str(tolerance_specs[tolerance][0]) +
-                                                            ' AND ' + field_names[1] + ' >= ' +
-                                                            str(tolerance_specs[tolerance][1]) +
-                                                            ' AND ' + field_names[0] + " = 'P'")
-                    # default to 10 meter accuracy (1 meter toloerance) if not provided
-                    if tolerance == '1':
-                        arcpy.SelectLayerByAttribute_management('dissolve_layer', 'ADD_TO_SELECTION',
-                                                                'objectid > ' + str(batch_size * (batch_count - 1)) +
-                                                                ' AND objectid <= ' + str(batch_size * batch_count) +
-                                                                ' AND ' + field_names[1] + ' IS NULL ' +
-                                                                ' AND ' + field_names[0] + " = 'P'")
-                        arcpy.SelectLayerByAttribute_management('dissolve_layer', 'ADD_TO_SELECTION',
-                                                                'objectid > ' + str(batch_size * (batch_count - 1)) +
-                                                                ' AND objectid <= ' + str(batch_size * batch_count) +
-                                                                ' AND ' + field_names[1] + ' <= 0 ' +
-                                                                ' AND ' + field_names[0] + " = 'P'")
-                    result = arcpy.GetCount_management('dissolve_layer')
-                    if int(result[0]) > 0:
-                        arcpy.SimplifyPolygon_cartography('dissolve_layer', temp_batch, 'POINT_REMOVE',
-                                                          tolerance, collapsed_point_option='NO_KEEP',
-                                                          error_option='RESOLVE_ERRORS')
-                        # append simplified point-derived polygons
-                        with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapInput',
-                                                   ['SHAPE@',
-                                                    'RangeMapID',
-                                                    'OriginalGeometryType',
-                                                    'NationalScientificName',
-                                                    'SynonymName',
-                                                    'DatasetSourceName',
-                                                    'DatasetType',
-                                                    'Accuracy',
-                                                    'MaxDate',
-                                                    'CoordinatesObscured',
-                                                    'EORank',
-                                                    'DatasetSourceUniqueID',
-                                                    'BreedingAndBehaviourCode']) as insert_cursor:
-                            # kludge because arc ends up with different field names under Enterprise gdb after joining
-                            field_names = [f.name for f in arcpy.ListFields(temp_batch) if f.aliasName in
-                                           ['FIRST_' + table_name_prefix + temp_pairwise_intersect + '.RangeMapID',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.rangemapid',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.OriginalGeometryType',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.originalgeometrytype',
-                                            'FIRST_' + table_name_prefix +
-                                            'BIOTICS_ELEMENT_NATIONAL.NATIONAL_SCIENTIFIC_NAME',
-                                            'FIRST_' + table_name_prefix +
-                                            'BIOTICS_ELEMENT_NATIONAL.national_scientific_name',
-                                            'FIRST_' + table_name_prefix + 'Synonym.SynonymName',
-                                            'FIRST_' + table_name_prefix + 'Synonym.synonymname',
-                                            'FIRST_' + table_name_prefix + 'DatasetSource.DatasetSourceName',
-                                            'FIRST_' + table_name_prefix + 'DatasetSource.datasetsourcename',
-                                            'FIRST_' + table_name_prefix + 'DatasetSource.DatasetType',
-                                            'FIRST_' + table_name_prefix + 'DatasetSource.datasettype',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.Accuracy',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.accuracy',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.MaxDate',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.maxdate',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.CoordinatesObscured',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.coordinatesobscured',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.EORank',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect + '.eorank',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.DatasetSourceUniqueID',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.datasetsourceuniqueid',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.BreedingAndBehaviourCode',
-                                            'FIRST_' + table_name_prefix + temp_pairwise_intersect +
-                                            '.breedingandbehaviourcode']]
-                            # for field_name in field_names:
-                            #     EBARUtils.displayMessage(messages, field_name)
-                            with arcpy.da.SearchCursor(temp_batch,
-                                                       ['SHAPE@',
-                                                        field_names[0],
-                                                        field_names[1],
-                                                        field_names[2],
-                                                        field_names[3],
-                                                        field_names[4],
-                                                        field_names[5],
-                                                        field_names[6],
-                                                        field_names[7],
-                                                        field_names[8],
-                                                        field_names[9],
-                                                        field_names[10],
-                                                        field_names[11]]) as search_cursor:
-                                search_row = None
-                                for search_row in EBARUtils.searchCursor(search_cursor):
-                                    insert_cursor.insertRow([search_row['SHAPE@'],
-                                                             search_row[field_names[0]],
-                                                             search_row[field_names[1]],
-                                                             search_row[field_names[2]],
-                                                             search_row[field_names[3]],
-                                                             search_row[field_names[4]],
-                                                             search_row[field_names[5]],
-                                                             search_row[field_names[6]],
-                                                             search_row[field_names[7]],
-                                                             search_row[field_names[8]],
-                                                             search_row[field_names[9]],
-                                                             search_row[field_names[10]],
-                                                             search_row[field_names[11]]])
-                                if search_row:
-                                    del search_row
-                                del search_cursor
-                        del insert_cursor
-                batch_count += 1
-            # append line- and polygon-derived polygons
-            with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapInput',
-                                       ['SHAPE@',
-                                        'RangeMapID',
-                                        'OriginalGeometryType',
-                                        'NationalScientificName',
-                                        'SynonymName',
-                                        'DatasetSourceName',
-                                        'DatasetType',
-                                        'Accuracy',
-                                        'MaxDate',
-                                        'CoordinatesObscured',
-                                        'EORank',
-                                        'DatasetSourceUniqueID',
-                                        'BreedingAndBehaviourCode']) as insert_cursor:
-                with arcpy.da.SearchCursor('pairwise_intersect_layer',
-                                           ['SHAPE@',
-                                            table_name_prefix + temp_pairwise_intersect + '.RangeMapID',
-                                            table_name_prefix + temp_pairwise_intersect + '.OriginalGeometryType',
-                                            table_name_prefix + 'BIOTICS_ELEMENT_NATIONAL.NATIONAL_SCIENTIFIC_NAME',
-                                            table_name_prefix + 'Synonym.SynonymName',
-                                            table_name_prefix + 'DatasetSource.DatasetSourceName',
-                                            table_name_prefix + 'DatasetSource.DatasetType',
-                                            table_name_prefix + temp_pairwise_intersect + '.Accuracy',
-                                            table_name_prefix + temp_pairwise_intersect + '.MaxDate',
-                                            table_name_prefix + temp_pairwise_intersect + '.CoordinatesObscured',
-                                            table_name_prefix + temp_pairwise_intersect + '.EORank',
-                                            table_name_prefix + temp_pairwise_intersect + '.DatasetSourceUniqueID',
-                                            table_name_prefix + temp_pairwise_intersect + '.BreedingAndBehaviourCode'],
-                                           table_name_prefix + temp_pairwise_intersect + ".OriginalGeometryType <> 'P'") as search_cursor:
-                    search_row = None
-                    for search_row in EBARUtils.searchCursor(search_cursor):
-                        insert_cursor.insertRow([search_row['SHAPE@'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.RangeMapID'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.OriginalGeometryType'],
-                                                search_row[table_name_prefix +
-                                                           'BIOTICS_ELEMENT_NATIONAL.NATIONAL_SCIENTIFIC_NAME'],
-                                                search_row[table_name_prefix +
-                                                           'Synonym.SynonymName'],
-                                                search_row[table_name_prefix +
-                                                           'DatasetSource.DatasetSourceName'],
-                                                search_row[table_name_prefix +
-                                                           'DatasetSource.DatasetType'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.Accuracy'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.MaxDate'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.CoordinatesObscured'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.EORank'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.DatasetSourceUniqueID'],
-                                                search_row[table_name_prefix +
-                                                           temp_pairwise_intersect + '.BreedingAndBehaviourCode']])
-                    if search_row:
-                        del search_row
-                    del search_cursor
-            del insert_cursor
-            arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'Synonym')
-            arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'BIOTICS_ELEMENT_NATIONAL')
-            arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'ESTH')
+        if save_range_map_inputs_now:
+            profile.stage('Range Map Inputs')
+            self.saveRangeMapInputs(param_geodatabase, 'pairwise_intersect_layer', pairwise_prefix, temp_all_inputs,
+                                    scratch, profile, messages)
 
         # get synonyms used
+        profile.stage('Synonyms')
         EBARUtils.displayMessage(messages, 'Documenting Synonyms used')
-        temp_unique_synonyms = 'TempUniqueSynonyms' + str(start_time.year) + str(start_time.month) + \
-            str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        temp_unique_synonyms = scratch.name('TempUniqueSynonyms')
         arcpy.Statistics_analysis('pairwise_intersect_layer', temp_unique_synonyms, [['InputDatasetID', 'COUNT']],
-                                  [table_name_prefix + temp_pairwise_intersect + '.SynonymID'])
+                                  [pairwise_prefix + 'SynonymID'])
         arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'DatasetSource')
         arcpy.RemoveJoin_management('pairwise_intersect_layer', table_name_prefix + 'InputDataset')
         # build list of unique IDs
         synonym_ids = []
-        # kludge because arc ends up with different field names under Enterprise gdb after joining
-        id_field_name = [f.name for f in arcpy.ListFields(temp_unique_synonyms) if f.aliasName in ['SynonymID']][0]
+        # arc ends up with different field names under Enterprise gdb after joining
+        id_field_name = EBARUtils.resolveFieldNames(temp_unique_synonyms, ['SynonymID'])['SynonymID']
         search_row = None
         with arcpy.da.SearchCursor(temp_unique_synonyms, [id_field_name]) as search_cursor:
             for search_row in EBARUtils.searchCursor(search_cursor):
@@ -1126,6 +752,7 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
             del search_cursor
 
         # count expert reviews and and compile reviewer details (if publishable)
+        profile.stage('Expert Reviews')
         EBARUtils.displayMessage(messages, 'Summarizing Expert Reviews')
         completed_expert_reviews = 0
         #null_rating_reviews = 0
@@ -1145,92 +772,68 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
                     # else:
                     #     null_rating_reviews += 1
                     # get expert name and publish settings to populate reviewer comments
-                    expert_comment = None
-                    with arcpy.da.SearchCursor(param_geodatabase + '/Expert',
-                                               ['ExpertName', 'PublishName', 'PublishComments'],
-                                               "Username = '" + row['Username'] + "'") as expert_cursor:
-                        for expert_row in EBARUtils.searchCursor(expert_cursor):
-                            if expert_row['PublishName']:
-                                expert_name =  expert_row['ExpertName']
-                            else:
-                                expert_name = 'Anonymous'
-                                anonymous_count += 1
-                            experts.append(expert_name)
-                            expert_comment = expert_name
-                            expert_comment += ' Reviewer Comment - '
-                            if expert_row['PublishComments']:
-                                if row['ReviewNotes']:
-                                    expert_comment += row['ReviewNotes']
-                            else:
-                                expert_comment += 'Unpublished'
-                            experts_comments.append(expert_comment)
-                    if expert_comment:
-                        del expert_row
-                    del expert_cursor
+                    for expert_row in experts_dict.get(row['Username'], []):
+                        if expert_row['PublishName']:
+                            expert_name =  expert_row['ExpertName']
+                        else:
+                            expert_name = 'Anonymous'
+                            anonymous_count += 1
+                        experts.append(expert_name)
+                        experts_comments.append(EBARUtils.formatExpertComment(expert_row, row['ReviewNotes']))
             if row:
                 del row
             del cursor
 
         # update Range Map Ecoshape records with Min/Max Date
+        profile.stage('Range Map Ecoshape Dates')
         EBARUtils.displayMessage(messages, 'Updating Range Map Ecoshape records with Min/Max Date')
         row = None
         with arcpy.da.SearchCursor(temp_minmax_dateby_ecoshape, ['EcoshapeID', 'MIN_MinDate',
                                                                  'MAX_MaxDate', 'MIN_MaxDate']) as cursor:
             for row in EBARUtils.searchCursor(cursor):
-                update_row = None
-                with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMapEcoshape',
-                                           ['MinDate', 'MaxDate'],
-                                           'RangeMapID = ' + str(range_map_id) +
-                                           ' AND EcoshapeID = ' + str(row['EcoshapeID'])) as update_cursor:
-                    for update_row in update_cursor:
-                        min_date = row['MIN_MinDate']
-                        if not min_date:
-                            min_date = row['MIN_MaxDate']
-                        update_cursor.updateRow([min_date, row['MAX_MaxDate']])
-                if update_row:
-                    del update_row
-                del update_cursor
+                if row['EcoshapeID'] in ecoshape_rows:
+                    min_date = row['MIN_MinDate']
+                    if not min_date:
+                        min_date = row['MIN_MaxDate']
+                    ecoshape_rows[row['EcoshapeID']].update({'MinDate': min_date, 'MaxDate': row['MAX_MaxDate']})
         if row:
             del row
         del cursor
 
+        # write Range Map Ecoshape and Input Dataset records as changes against any existing records
+        profile.stage('Write Range Map Ecoshapes')
+        EBARUtils.displayMessage(messages, 'Writing Range Map Ecoshape and Input Dataset changes')
+        self.writeRangeMapEcoshapes(param_geodatabase, range_map_id, ecoshape_rows, input_dataset_rows, messages)
+
         # update RangeMap metadata
+        profile.stage('Range Map Summary')
         EBARUtils.displayMessage(messages, 'Updating Range Map record with Overall Summary')
         update_row = None
-        with arcpy.da.UpdateCursor('range_map_view',
-                                   ['RangeMetadata', 'RangeDate', 'RangeMapNotes', 'RangeMapScope', 'SynonymsUsed',
-                                    'ReviewerComments', 'DifferentiateUsageType'],
+        range_map_fields = ['RangeMetadata', 'RangeDate', 'RangeMapNotes', 'RangeMapScope', 'SynonymsUsed',
+                            'ReviewerComments', 'DifferentiateUsageType']
+        if input_fingerprint:
+            range_map_fields.append('InputFingerprint')
+        if pending_field:
+            range_map_fields.append('RangeMapInputPending')
+        with arcpy.da.UpdateCursor('range_map_view', range_map_fields,
                                    'RangeMapID = ' + str(range_map_id)) as update_cursor:
             for update_row in update_cursor:
                 # Metadata
                 # input records
-                # kludge because arc ends up with different field names under Enterprise gdb after joining
-                field_names = [f.name for f in arcpy.ListFields(temp_overall_countby_source) if f.aliasName in
-                               ['DatasetSourceName', 'FREQUENCY', 'frequency',
-                                'MIN_MinDate', 'min_mindate',
-                                'MIN_' + table_name_prefix + temp_pairwise_intersect + '.mindate',
-                                'MAX_MaxDate', 'max_maxdate',
-                                'MAX_' + table_name_prefix + temp_pairwise_intersect + '.maxdate',
-                                'MIN_MaxDate', 'min_maxdate',
-                                'MIN_' + table_name_prefix + temp_pairwise_intersect + '.maxdate']]
+                # arc ends up with different field names under Enterprise gdb after joining
+                field_names = EBARUtils.resolveFieldNames(temp_overall_countby_source,
+                                                          ['DatasetSourceName', 'FREQUENCY', 'MIN_MinDate',
+                                                           'MAX_MaxDate', 'MIN_MaxDate'])
                 summary = ''
-                with arcpy.da.SearchCursor(temp_overall_countby_source, field_names) as search_cursor:
+                with arcpy.da.SearchCursor(temp_overall_countby_source, list(field_names.values())) as search_cursor:
                     for search_row in EBARUtils.searchCursor(search_cursor):
                         if len(summary) > 0:
                             summary += ', '
-                        summary += str(search_row[field_names[1]]) + ' ' + search_row[field_names[0]]
-                        if search_row[field_names[3]]:
-                            min_year = search_row[field_names[3]].year
-                            max_year = search_row[field_names[3]].year
-                            if search_row[field_names[4]].year < min_year:
-                                min_year = search_row[field_names[4]].year
-                            if search_row[field_names[2]]:
-                                if search_row[field_names[2]].year < min_year:
-                                    min_year = search_row[field_names[2]].year
-                            summary += ' ('
-                            if min_year < max_year:
-                                summary += str(min_year) + '-'
-                            summary += str(max_year) + ')'
+                        summary += EBARUtils.formatSourceSummary(search_row[field_names['FREQUENCY']],
+                                                                 search_row[field_names['DatasetSourceName']],
+                                                                 search_row[field_names['MIN_MinDate']],
+                                                                 search_row[field_names['MAX_MaxDate']],
+                                                                 search_row[field_names['MIN_MaxDate']])
                 if len(summary) > 0:
                     del search_row
                 del search_cursor
@@ -1259,50 +862,407 @@ def GetGeometryType(input_point_id, input_line_id, input_polygon_id):
                     notes += '; Secondary Species - ' + secondary_names
                 if len(synonym_authors) > 0:
                     notes += '; Synonyms - ' + synonym_authors
-                update_cursor.updateRow([summary, datetime.datetime.now(), notes, scope, synonyms_used,
-                                         reviewer_comments, differentiate_usage_type])
+                range_map_values = [summary, datetime.datetime.now(), notes, scope, synonyms_used, reviewer_comments,
+                                    differentiate_usage_type]
+                if input_fingerprint:
+                    range_map_values.append(input_fingerprint)
+                if pending_field:
+                    range_map_values.append(1 if defer_range_map_inputs else None)
+                update_cursor.updateRow(range_map_values)
         if update_row:
             del update_row
         del update_cursor
 
-        # temp clean-up
-        if arcpy.Exists(temp_unique_synonyms):
-            arcpy.Delete_management(temp_unique_synonyms)
-        if arcpy.Exists(temp_overall_countby_source):
-            arcpy.Delete_management(temp_overall_countby_source)
-        if arcpy.Exists(temp_ecoshape_countby_source):
-            arcpy.Delete_management(temp_ecoshape_countby_source)
-        if arcpy.Exists(temp_minmax_dateby_ecoshape):
-            arcpy.Delete_management(temp_minmax_dateby_ecoshape)
-        if arcpy.Exists(temp_ecoshape_countby_dataset):
-            arcpy.Delete_management(temp_ecoshape_countby_dataset)
-        if arcpy.Exists(temp_ecoshape_max_polygon):
-            arcpy.Delete_management(temp_ecoshape_max_polygon)
-        if arcpy.Exists(temp_pairwise_intersect):
-            arcpy.Delete_management(temp_pairwise_intersect)
-        if arcpy.Exists(temp_line_buffer):
-            arcpy.Delete_management(temp_line_buffer)
-        if arcpy.Exists(temp_point_buffer):
-            arcpy.Delete_management(temp_point_buffer)
-        if param_save_range_map_inputs == 'true':
-            # if arcpy.Exists(temp_restrictions):
-            #     arcpy.Delete_management(temp_restrictions)
-            if arcpy.Exists(temp_dissolve):
-                arcpy.Delete_management(temp_dissolve)
-            if arcpy.Exists(temp_batch):
-                arcpy.Delete_management(temp_batch)
-        if arcpy.Exists(usage_type_stats):
-            arcpy.Delete_management(usage_type_stats)
-        arcpy.Delete_management('all_inputs_layer')
-        if arcpy.Exists(temp_all_inputs):
-            arcpy.Delete_management(temp_all_inputs)
-
         # end time
         end_time = datetime.datetime.now()
         EBARUtils.displayMessage(messages, 'End time: ' + str(end_time))
         elapsed_time = end_time - start_time
         EBARUtils.displayMessage(messages, 'Elapsed time: ' + str(elapsed_time))
         return
+
+    def intersectInputs(self, param_geodatabase, range_map_id, table_name_prefix, species_ids, start_time,
+                        ecoshapes, ecoshape_where_clause, param_custom_polygons_covered, scratch, profile, messages):
+        """select and buffer the inputs for a range map, merge them and pairwise intersect them with the ecoshapes
+        (optionally limited by where clause and custom polygons); return (merged inputs, intersect)"""
+        # exclusions shared by all input types
+        exclusions = EBARUtils.readInputExclusions(param_geodatabase)
+
+        # select all points for species and buffer
+        profile.stage('Buffer Input Points')
+        EBARUtils.displayMessage(messages, 'Buffering Input Points')
+        temp_point_buffer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputPoint', range_map_id,
+                                                           table_name_prefix, species_ids, start_time, None, scratch,
+                                                           exclusions)
+
+        # select all lines for species and buffer
+        profile.stage('Buffer Input Lines')
+        EBARUtils.displayMessage(messages, 'Buffering Input Lines')
+        temp_line_buffer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputLine', range_map_id,
+                                                          table_name_prefix, species_ids, start_time, None, scratch,
+                                                          exclusions)
+
+        # select all polygons for species
+        profile.stage('Select Input Polygons')
+        EBARUtils.displayMessage(messages, 'Selecting Input Polygons')
+        input_polygon_layer = EBARUtils.inputSelectAndBuffer(param_geodatabase, 'InputPolygon', range_map_id,
+                                                             table_name_prefix, species_ids, start_time, None, scratch,
+                                                             exclusions)
+
+        # merge buffer polygons and input polygons
+        profile.stage('Merge Inputs')
+        EBARUtils.displayMessage(messages, 'Merging Buffered Points and Lines and Input Polygons')
+        temp_all_inputs = scratch.name('TempAllInputs')
+        #arcpy.Merge_management([temp_point_buffer, temp_line_buffer, 'input_polygon_layer'], temp_all_inputs, None,
+        #                       'ADD_SOURCE_INFO')
+        arcpy.Merge_management([temp_point_buffer, temp_line_buffer, input_polygon_layer], temp_all_inputs, None,
+                               'ADD_SOURCE_INFO')
+        profile.countRows(temp_all_inputs)
+        EBARUtils.checkAddField(temp_all_inputs, 'RangeMapID', 'LONG')
+        EBARUtils.checkAddField(temp_all_inputs, 'OriginalGeometryType', 'TEXT')
+        EBARUtils.checkAddField(temp_all_inputs, 'TempDate', 'DATE')
+
+        # eo ranks, when available, override dates in determining historical (fake the date to accomplish this)
+        profile.stage('EO Ranks')
+        EBARUtils.displayMessage(messages, 'Applying EO Ranks, where available, to determine historical records')
+        EBARUtils.calculateFields(
+            temp_all_inputs,
+            {'RangeMapID': range_map_id,
+             'OriginalGeometryType': lambda row: 'L' if row['InputLineID'] else
+                ('Y' if row['InputPolygonID'] else 'P'),
+             'TempDate': EBARUtils.ColumnCalculation(
+                 lambda columns: PresenceRules.fakeEORankDates(columns['MaxDate'], columns['EORank']).tolist())},
+            ['InputLineID', 'InputPolygonID', 'MaxDate', 'EORank'])
+        arcpy.MakeFeatureLayer_management(temp_all_inputs, 'all_inputs_layer')
+        scratch.track('all_inputs_layer')
+
+        # pairwise intersect buffers and ecoshape polygons
+        profile.stage('Intersect Inputs with Ecoshapes')
+        EBARUtils.displayMessage(messages, 'Pairwise Intersecting All Inputs with Ecoshapes')
+        # only intersect candidate ecoshapes within the extent of the inputs
+        arcpy.MakeFeatureLayer_management(ecoshapes, 'candidate_ecoshape_layer', ecoshape_where_clause)
+        scratch.track('candidate_ecoshape_layer')
+        selection_type = 'NEW_SELECTION'
+        if param_custom_polygons_covered:
+            arcpy.SelectLayerByLocation_management('candidate_ecoshape_layer', 'INTERSECT',
+                                                   param_custom_polygons_covered)
+            selection_type = 'SUBSET_SELECTION'
+        arcpy.SelectLayerByLocation_management('candidate_ecoshape_layer', 'INTERSECT',
+                                               arcpy.Describe(temp_all_inputs).extent.polygon, None, selection_type)
+        temp_pairwise_intersect = scratch.name('TempPairwiseIntersect')
+        # point buffers wholly inside an ecoshape skip the overlay
+        interior_count = EBARUtils.intersectInputsWithEcoshapes(temp_all_inputs, 'candidate_ecoshape_layer',
+                                                                temp_pairwise_intersect, scratch,
+                                                                "OriginalGeometryType = 'P'")
+        if interior_count > 0:
+            EBARUtils.displayMessage(messages, str(interior_count) +
+                                     ' buffered point(s) assigned to their ecoshape without intersecting')
+        profile.countRows(temp_pairwise_intersect)
+        return temp_all_inputs, temp_pairwise_intersect
+
+    def associateInputs(self, param_geodatabase, range_map_id, table_name_prefix, species_ids, scratch, profile,
+                        messages):
+        """select the inputs for a range map and look up the ecoshapes (of those in ecoshape_layer) they overlap in
+        InputEcoshape, associating any inputs not yet there; return table of input/ecoshape pairs with the intersect
+        fields that statistics are built from"""
+        ecoshape_ids = set()
+        with arcpy.da.SearchCursor('ecoshape_layer', ['EcoshapeID']) as cursor:
+            for row in cursor:
+                ecoshape_ids.add(row[0])
+        del cursor
+
+        temp_input_ecoshapes = scratch.name('TempInputEcoshapes')
+        arcpy.CreateTable_management(scratch.workspace, scratch.tableName(temp_input_ecoshapes))
+        pair_fields = [('RangeMapID', 'LONG'), ('OriginalGeometryType', 'TEXT'), ('InputPointID', 'LONG'),
+                       ('InputLineID', 'LONG'), ('InputPolygonID', 'LONG'), ('EcoshapeID', 'LONG')]
+        for field_name, field_type in pair_fields + association_input_fields + [('TempDate', 'DATE')]:
+            arcpy.AddField_management(temp_input_ecoshapes, field_name, field_type)
+        input_field_names = [field[0] for field in association_input_fields]
+        # exclusions shared by all input types
+        exclusions = EBARUtils.readInputExclusions(param_geodatabase)
+        pairs = []
+        for input_features, geometry_type in [('InputPoint', 'P'), ('InputLine', 'L'), ('InputPolygon', 'Y')]:
+            profile.stage('Associate ' + input_features + 's')
+            EBARUtils.displayMessage(messages, 'Associating ' + input_features + 's with Ecoshapes')
+            id_field = input_features + 'ID'
+            input_layer = EBARUtils.inputSelect(param_geodatabase, input_features, range_map_id, table_name_prefix,
+                                                species_ids, None, scratch, exclusions)
+            fields = [field for field in input_field_names
+                      if EBARUtils.checkField(param_geodatabase + '/' + input_features, field)]
+            with arcpy.da.SearchCursor(input_layer, [id_field] + fields) as cursor:
+                inputs = {row[0]: dict(zip(fields, row[1:])) for row in cursor}
+            del cursor
+            arcpy.Delete_management(input_layer)
+            profile.addRows(len(inputs))
+            associations = EBARUtils.readInputEcoshapes(param_geodatabase, input_features, inputs)
+            missing = [input_id for input_id in inputs if input_id not in associations]
+            if len(missing) > 0:
+                EBARUtils.displayMessage(messages, 'Associating ' + str(len(missing)) + ' ' + input_features +
+                                         '(s) not yet in InputEcoshape')
+                EBARUtils.updateInputEcoshapes(param_geodatabase, input_features, input_ids=missing,
+                                               messages=messages)
+                associations.update(EBARUtils.readInputEcoshapes(param_geodatabase, input_features, missing))
+            for input_id, values in inputs.items():
+                for ecoshape_id in associations.get(input_id, []):
+                    if ecoshape_id in ecoshape_ids:
+                        ids = [input_id if field == id_field else None
+                               for field in ['InputPointID', 'InputLineID', 'InputPolygonID']]
+                        pairs.append([range_map_id, geometry_type] + ids + [ecoshape_id] +
+                                     [values.get(field) for field in input_field_names])
+
+        # eo ranks, when available, override dates in determining historical (fake the date to accomplish this)
+        max_date_index = len(pair_fields) + input_field_names.index('MaxDate')
+        eo_rank_index = len(pair_fields) + input_field_names.index('EORank')
+        temp_dates = PresenceRules.fakeEORankDates([pair[max_date_index] for pair in pairs],
+                                                   [pair[eo_rank_index] for pair in pairs]).tolist()
+        with arcpy.da.InsertCursor(temp_input_ecoshapes, [field[0] for field in pair_fields] + input_field_names +
+                                   ['TempDate']) as cursor:
+            for pair, temp_date in zip(pairs, temp_dates):
+                cursor.insertRow(pair + [temp_date])
+        del cursor
+        profile.countRows(temp_input_ecoshapes)
+        return temp_input_ecoshapes
+
+    def generateRangeMapInputs(self, param_geodatabase, range_map_id, scratch, profile, messages):
+        """create the RangeMapInput records left pending by a deferred run, from the inputs for the range map's species
+        intersected with its ecoshapes, and clear the pending flag"""
+        table_name_prefix = EBARUtils.getTableNamePrefix(param_geodatabase)
+        species_ids = []
+        with arcpy.da.SearchCursor(param_geodatabase + '/RangeMap', ['SpeciesID'],
+                                   'RangeMapID = ' + str(range_map_id)) as cursor:
+            for row in cursor:
+                species_ids.append(row[0])
+        del cursor
+        with arcpy.da.SearchCursor(param_geodatabase + '/SecondarySpecies', ['SpeciesID'],
+                                   'RangeMapID = ' + str(range_map_id)) as cursor:
+            for row in cursor:
+                species_ids.append(row[0])
+        del cursor
+        ecoshape_ids = []
+        with arcpy.da.SearchCursor(param_geodatabase + '/RangeMapEcoshape', ['EcoshapeID'],
+                                   'RangeMapID = ' + str(range_map_id)) as cursor:
+            for row in cursor:
+                ecoshape_ids.append(row[0])
+        del cursor
+
+        # replace any records from an earlier attempt
+        with EBARUtils.BulkWriter(param_geodatabase + '/RangeMapInput', quiet=True) as writer:
+            writer.deleteRows('RangeMapID = ' + str(range_map_id))
+        if len(ecoshape_ids) > 0:
+            # inputs in the range map's final ecoshapes
+            ecoshapes = EBARUtils.localEcoshapes(param_geodatabase, 'EcoshapeCoastalBuffer', messages)
+            temp_all_inputs, temp_pairwise_intersect = self.intersectInputs(
+                param_geodatabase, range_map_id, table_name_prefix, ','.join(map(str, species_ids)),
+                datetime.datetime.now(), ecoshapes, 'EcoshapeID IN (' + ','.join(map(str, sorted(ecoshape_ids))) + ')',
+                None, scratch, profile, messages)
+            self.addRangeMapInputAttributes(param_geodatabase, temp_pairwise_intersect, profile)
+            arcpy.MakeFeatureLayer_management(temp_pairwise_intersect, 'pending_intersect_layer')
+            scratch.track('pending_intersect_layer')
+            profile.stage('Range Map Inputs')
+            # (no joins, so no field prefix)
+            self.saveRangeMapInputs(param_geodatabase, 'pending_intersect_layer', '', temp_all_inputs, scratch,
+                                    profile, messages)
+
+        with arcpy.da.UpdateCursor(param_geodatabase + '/RangeMap', ['RangeMapInputPending'],
+                                   'RangeMapID = ' + str(range_map_id)) as cursor:
+            for row in cursor:
+                cursor.updateRow([None])
+        del cursor
+
+    def addRangeMapInputAttributes(self, param_geodatabase, temp_pairwise_intersect, profile):
+        """add names and permissions for Range Map Input records to intersected inputs, from cached lookups instead
+        of joins"""
+        profile.stage('Range Map Input Attributes')
+        for field_name, field_type in EBARUtils.range_map_input_attribute_fields:
+            EBARUtils.checkAddField(temp_pairwise_intersect, field_name, field_type)
+        EBARUtils.calculateFields(temp_pairwise_intersect, EBARUtils.rangeMapInputCalculations(param_geodatabase),
+                                  ['SpeciesID', 'SynonymID', 'InputDatasetID'])
+
+    def saveRangeMapInputs(self, param_geodatabase, pairwise_intersect_layer, pairwise_prefix, temp_all_inputs,
+                           scratch, profile, messages):
+        """create RangeMapInput records for overlay display in EBAR Reviewer from the selected intersected inputs (with
+        attributes from addRangeMapInputAttributes), rebuilding inputs split by the ecoshape intersect and simplifying
+        point-derived polygons"""
+        EBARUtils.displayMessage(messages, 'Creating Range Map Input records for overlay display in EBAR Reviewer')
+        # temp_restrictions = 'TempRestrictions' + str(start_time.year) + str(start_time.month) + \
+        #     str(start_time.day) + str(start_time.hour) + str(start_time.minute) + str(start_time.second)
+        # arcpy.TableToTable_conversion(param_geodatabase + '/RestrictedJurisdictionSpecies', param_geodatabase,
+        #                             temp_restrictions, 'SpeciesID IN (' + species_ids + ')')
+        # arcpy.AddJoin_management(pairwise_intersect_layer, table_name_prefix + 'DatasetSource.CDCJurisdictionID',
+        #                         param_geodatabase + '/' + temp_restrictions, 'CDCJurisdictionID', 'KEEP_ALL')
+        # arcpy.SelectLayerByAttribute_management(pairwise_intersect_layer, 'SUBSET_SELECTION',
+        #                                         '(' + table_name_prefix + "InputDataset.Restrictions = 'N') OR" +
+        #                                         '(' + table_name_prefix + "InputDataset.Restrictions = 'R' AND " +
+        #                                         table_name_prefix + "DatasetSource.RestrictionBySpecies = 1 AND " +
+        #                                         table_name_prefix + "DatasetSource.CDCJurisdictionID IS NOT NULL AND " +
+        #                                         table_name_prefix + temp_restrictions + '.SpeciesID IS NULL)')
+        arcpy.SelectLayerByAttribute_management(pairwise_intersect_layer, 'SUBSET_SELECTION',
+                                                pairwise_prefix + 'RangeMapInputPermitted = 1')
+        # first dissolve on FID_TempAllIinputs to rebuild polygons split during Ecoshape intersect
+        temp_dissolve = scratch.name('TempDissolve')
+        arcpy.Dissolve_management(pairwise_intersect_layer, temp_dissolve,
+                                  [pairwise_prefix + 'FID_' + scratch.tableName(temp_all_inputs)],
+                                  [[pairwise_prefix + 'RangeMapID', 'FIRST'],
+                                   [pairwise_prefix + 'OriginalGeometryType', 'FIRST'],
+                                   [pairwise_prefix + 'NationalScientificName', 'FIRST'],
+                                   [pairwise_prefix + 'SynonymName', 'FIRST'],
+                                   [pairwise_prefix + 'DatasetSourceName', 'FIRST'],
+                                   [pairwise_prefix + 'DatasetType', 'FIRST'],
+                                   [pairwise_prefix + 'Accuracy', 'FIRST'],
+                                   [pairwise_prefix + 'MaxDate', 'FIRST'],
+                                   [pairwise_prefix + 'CoordinatesObscured', 'FIRST'],
+                                   [pairwise_prefix + 'EORank', 'FIRST'],
+                                   [pairwise_prefix + 'DatasetSourceUniqueID', 'FIRST'],
+                                   [pairwise_prefix + 'BreedingAndBehaviourCode', 'FIRST']])
+        # simplify point-derived polygons, by accuracy class, in partitions across worker processes
+        temp_simplified = scratch.name('TempSimplified')
+        # arc ends up with different field names under Enterprise gdb after joining
+        field_names = EBARUtils.resolveFieldNames(temp_dissolve, ['FIRST_OriginalGeometryType', 'FIRST_Accuracy'])
+        with profile.block('Simplify Inputs'):
+            simplify_stats = SimplifyInputs.simplifyInputs(temp_dissolve, temp_simplified,
+                                                           field_names['FIRST_Accuracy'],
+                                                           field_names['FIRST_OriginalGeometryType'] + " = 'P'",
+                                                           messages=messages)
+            profile.addRows(sum(stat['Inputs'] for stat in simplify_stats))
+        if arcpy.Exists(temp_simplified):
+            # append simplified point-derived polygons
+            with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapInput',
+                                       ['SHAPE@',
+                                        'RangeMapID',
+                                        'OriginalGeometryType',
+                                        'NationalScientificName',
+                                        'SynonymName',
+                                        'DatasetSourceName',
+                                        'DatasetType',
+                                        'Accuracy',
+                                        'MaxDate',
+                                        'CoordinatesObscured',
+                                        'EORank',
+                                        'DatasetSourceUniqueID',
+                                        'BreedingAndBehaviourCode']) as insert_cursor:
+                # arc ends up with different field names under Enterprise gdb after joining
+                simplified_field_names = EBARUtils.resolveFieldNames(
+                    temp_simplified, ['FIRST_RangeMapID', 'FIRST_OriginalGeometryType',
+                                      'FIRST_NationalScientificName', 'FIRST_SynonymName',
+                                      'FIRST_DatasetSourceName', 'FIRST_DatasetType', 'FIRST_Accuracy',
+                                      'FIRST_MaxDate', 'FIRST_CoordinatesObscured', 'FIRST_EORank',
+                                      'FIRST_DatasetSourceUniqueID', 'FIRST_BreedingAndBehaviourCode'])
+                with arcpy.da.SearchCursor(temp_simplified,
+                                           ['SHAPE@'] + list(simplified_field_names.values())) as search_cursor:
+                    search_row = None
+                    for search_row in EBARUtils.searchCursor(search_cursor):
+                        insert_cursor.insertRow([search_row['SHAPE@']] +
+                                                [search_row[field_name] for field_name in
+                                                 simplified_field_names.values()])
+                    if search_row:
+                        del search_row
+                    del search_cursor
+            del insert_cursor
+        # append line- and polygon-derived polygons
+        with arcpy.da.InsertCursor(param_geodatabase + '/RangeMapInput',
+                                   ['SHAPE@',
+                                    'RangeMapID',
+                                    'OriginalGeometryType',
+                                    'NationalScientificName',
+                                    'SynonymName',
+                                    'DatasetSourceName',
+                                    'DatasetType',
+                                    'Accuracy',
+                                    'MaxDate',
+                                    'CoordinatesObscured',
+                                    'EORank',
+                                    'DatasetSourceUniqueID',
+                                    'BreedingAndBehaviourCode']) as insert_cursor:
+            with arcpy.da.SearchCursor(pairwise_intersect_layer,
+                                       ['SHAPE@',
+                                        pairwise_prefix + 'RangeMapID',
+                                        pairwise_prefix + 'OriginalGeometryType',
+                                        pairwise_prefix + 'NationalScientificName',
+                                        pairwise_prefix + 'SynonymName',
+                                        pairwise_prefix + 'DatasetSourceName',
+                                        pairwise_prefix + 'DatasetType',
+                                        pairwise_prefix + 'Accuracy',
+                                        pairwise_prefix + 'MaxDate',
+                                        pairwise_prefix + 'CoordinatesObscured',
+                                        pairwise_prefix + 'EORank',
+                                        pairwise_prefix + 'DatasetSourceUniqueID',
+                                        pairwise_prefix + 'BreedingAndBehaviourCode'],
+                                       pairwise_prefix + "OriginalGeometryType <> 'P'") as search_cursor:
+                search_row = None
+                for search_row in EBARUtils.searchCursor(search_cursor):
+                    insert_cursor.insertRow([search_row['SHAPE@'],
+                                            search_row[pairwise_prefix + 'RangeMapID'],
+                                            search_row[pairwise_prefix + 'OriginalGeometryType'],
+                                            search_row[pairwise_prefix + 'NationalScientificName'],
+                                            search_row[pairwise_prefix + 'SynonymName'],
+                                            search_row[pairwise_prefix + 'DatasetSourceName'],
+                                            search_row[pairwise_prefix + 'DatasetType'],
+                                            search_row[pairwise_prefix + 'Accuracy'],
+                                            search_row[pairwise_prefix + 'MaxDate'],
+                                            search_row[pairwise_prefix + 'CoordinatesObscured'],
+                                            search_row[pairwise_prefix + 'EORank'],
+                                            search_row[pairwise_prefix + 'DatasetSourceUniqueID'],
+                                            search_row[pairwise_prefix + 'BreedingAndBehaviourCode']])
+                if search_row:
+                    del search_row
+                del search_cursor
+        del insert_cursor
+
+    def writeRangeMapEcoshapes(self, geodatabase, range_map_id, ecoshape_rows, input_dataset_rows, messages):
+        """apply only the inserts, updates and deletes needed to make the RangeMapEcoshape records (by EcoshapeID) and
+        RangeMapEcoshapeInputDataset records (by EcoshapeID and InputDatasetID) of a range map match those built in
+        memory, and report counts of each"""
+        # existing range map ecoshapes
+        existing_rme_ids = {}
+        with arcpy.da.SearchCursor(geodatabase + '/RangeMapEcoshape', ['EcoshapeID', 'RangeMapEcoshapeID'],
+                                   'RangeMapID = ' + str(range_map_id)) as cursor:
+            for row in cursor:
+                existing_rme_ids[row[0]] = row[1]
+        del cursor
+
+        # input datasets of existing ecoshapes first, which also removes those of ecoshapes about to be deleted
+        kept_dataset_rows = {}
+        for (ecoshape_id, input_dataset_id), values in input_dataset_rows.items():
+            if ecoshape_id in existing_rme_ids:
+                kept_dataset_rows[(existing_rme_ids[ecoshape_id], input_dataset_id)] = values
+        with EBARUtils.BulkWriter(geodatabase + '/RangeMapEcoshapeInputDataset', messages=messages,
+                                  quiet=True) as writer:
+            dataset_changes = list(writer.syncRows(['RangeMapEcoshapeID', 'InputDatasetID'],
+                                                   range_map_ecoshape_input_dataset_fields, kept_dataset_rows,
+                                                   'RangeMapEcoshapeID IN (SELECT RangeMapEcoshapeID FROM ' +
+                                                   'RangeMapEcoshape WHERE RangeMapID = ' + str(range_map_id) + ')'))
+
+        # range map ecoshapes
+        new_rows = {}
+        for ecoshape_id, ecoshape_row in ecoshape_rows.items():
+            new_rows[(ecoshape_id,)] = [ecoshape_row[field] for field in range_map_ecoshape_fields]
+        with EBARUtils.BulkWriter(geodatabase + '/RangeMapEcoshape', messages=messages, quiet=True) as writer:
+            ecoshape_changes = writer.syncRows(['EcoshapeID'], range_map_ecoshape_fields, new_rows,
+                                               'RangeMapID = ' + str(range_map_id), {'RangeMapID': range_map_id})
+
+        # input datasets of new ecoshapes
+        if ecoshape_changes[0] > 0:
+            new_rme_ids = {}
+            with arcpy.da.SearchCursor(geodatabase + '/RangeMapEcoshape', ['EcoshapeID', 'RangeMapEcoshapeID'],
+                                       'RangeMapID = ' + str(range_map_id)) as cursor:
+                for row in cursor:
+                    if row[0] not in existing_rme_ids:
+                        new_rme_ids[row[0]] = row[1]
+            del cursor
+            with EBARUtils.BulkWriter(geodatabase + '/RangeMapEcoshapeInputDataset',
+                                      ['RangeMapEcoshapeID', 'InputDatasetID'] +
+                                      range_map_ecoshape_input_dataset_fields, messages=messages,
+                                      quiet=True) as writer:
+                for (ecoshape_id, input_dataset_id), values in input_dataset_rows.items():
+                    if ecoshape_id in new_rme_ids:
+                        writer.insertRow([new_rme_ids[ecoshape_id], input_dataset_id] + values)
+                        dataset_changes[0] += 1
+
+        EBARUtils.displayMessage(messages, 'Range Map Ecoshape records - ' + str(ecoshape_changes[0]) +
+                                 ' inserted, ' + str(ecoshape_changes[1]) + ' updated, ' + str(ecoshape_changes[2]) +
+                                 ' deleted')
+        EBARUtils.displayMessage(messages, 'Range Map Ecoshape Input Dataset records - ' + str(dataset_changes[0]) +
+                                 ' inserted, ' + str(dataset_changes[1]) + ' updated, ' + str(dataset_changes[2]) +
+                                 ' deleted')
             
 
 # controlling process
@@ -1329,6 +1289,12 @@ if __name__ == '__main__':
     param_differentiate_usage_type = arcpy.Parameter()
     param_differentiate_usage_type.value = 'true'
     param_save_range_map_inputs = arcpy.Parameter()
+    param_force_regeneration = arcpy.Parameter()
+    param_force_regeneration.value = 'false'
+    param_defer_range_map_inputs = arcpy.Parameter()
+    param_defer_range_map_inputs.value = 'false'
+    param_use_input_ecoshapes = arcpy.Parameter()
+    param_use_input_ecoshapes.value = 'false'
 
     for version in ['1.1', '1.2', '1.5']:
     #    for species in ['Ardea herodias', 'Botaurus exilis', 'Branta canadensis', 'Centronyx henslowii', 'Charadrius melodus', 'Falco peregrinus', 'Melanerpes lewis', 'Setophaga cerulea', 'Tringa solitaria', 'Zonotrichia querula']:
@@ -1354,6 +1320,7 @@ if __name__ == '__main__':
             param_save_range_map_inputs.value = 'false'
             parameters = [param_geodatabase, param_species, param_secondary, param_version, param_stage, param_scope,
                           param_jurisdictions_covered, param_custom_polygons_covered, param_differentiate_usage_type,
-                          param_save_range_map_inputs]
+                          param_save_range_map_inputs, param_force_regeneration, param_defer_range_map_inputs,
+                          param_use_input_ecoshapes]
             grm.runGenerateRangeMapTool(parameters, None)
     
\ No newline at end of file
@@ -319,6 +319,7 @@ class ImportSpatialDataTool:
         added = 0
         bad_data = 0
         duplicates = 0
+        updated_ids = []
         inaccurate = 0
         individual_count_0 = 0
         no_coords = 0
@@ -624,6 +625,7 @@ class ImportSpatialDataTool:
                     del row
                 del cursor
                 input_dataset_ids += ')'
+                id_field = destination.rsplit('/', 1)[-1] + 'ID'
                 # use most fields from dict to automate
                 src_fields = []
                 for key in field_dict:
@@ -659,18 +661,30 @@ class ImportSpatialDataTool:
                             dsuid = str(int(dsuid))
                         except:
                             pass
-                        with arcpy.da.UpdateCursor(destination, dst_fields, "DatasetSourceUniqueID = '" + dsuid +
-                                                   "' AND InputDatasetID IN " +
+                        with arcpy.da.UpdateCursor(destination, dst_fields + [id_field],
+                                                   "DatasetSourceUniqueID = '" + dsuid + "' AND InputDatasetID IN " +
                                                    input_dataset_ids) as update_cursor:
                             update_row = None
                             for update_row in EBARUtils.updateCursor(update_cursor):
-                                update_cursor.updateRow(values)
+                                update_cursor.updateRow(values + [update_row[id_field]])
+                                updated_ids.append(update_row[id_field])
                             if update_row:
                                 del update_row
                 if row:
                     del row
                 del cursor
 
+        # keep input/ecoshape associations current for range maps
+        if EBARUtils.checkInputEcoshapeTable(param_geodatabase) and (added > 0 or len(updated_ids) > 0):
+            EBARUtils.displayMessage(messages, 'Associating imported features with Ecoshapes')
+            input_features = destination.rsplit('/', 1)[-1]
+            if added > 0:
+                EBARUtils.updateInputEcoshapes(param_geodatabase, input_features,
+                                               'InputDatasetID = ' + str(input_dataset_id), messages=messages)
+            if len(updated_ids) > 0:
+                EBARUtils.updateInputEcoshapes(param_geodatabase, input_features, input_ids=updated_ids,
+                                               messages=messages)
+
         # temp clean-up
         arcpy.Delete_management('import_features')
         if arcpy.Exists(temp_import_features):
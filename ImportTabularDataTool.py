@@ -32,6 +32,11 @@ class ImportTabularDataTool:
         pass
 
     def runImportTabularDataTool(self, parameters, messages):
+        # with per stage timings written to a JSON run profile
+        with EBARUtils.RunProfile('ImportTabularData', messages) as profile:
+            return self.importTabularData(parameters, messages, profile)
+
+    def importTabularData(self, parameters, messages, profile):
         ## debugging/testing
         #print(locale.getpreferredencoding())
         #print(str(EBARUtils.estimateAccuracy(48.0, 0.0003)))
@@ -52,6 +57,7 @@ class ImportTabularDataTool:
         #arcpy.gp.overwriteOutput = True
 
         # make variables for parms
+        profile.stage('Parameters')
         EBARUtils.displayMessage(messages, 'Processing parameters')
         param_geodatabase = parameters[0].valueAsText
         param_raw_data_file = parameters[1].valueAsText
@@ -91,6 +97,7 @@ class ImportTabularDataTool:
 
         # check/add InputDataset row
         dataset = param_dataset_name + ', ' + param_dataset_source + ', ' + str(param_date_received)
+        profile.stage('Input Dataset')
         EBARUtils.displayMessage(messages, 'Checking for dataset [' + dataset + '] and adding if new')
         input_dataset_id, dataset_exists = EBARUtils.checkAddInputDataset(param_geodatabase, param_dataset_name,
                                                                           dataset_source_id, param_date_received,
@@ -99,12 +106,14 @@ class ImportTabularDataTool:
         #param_restrictions)
 
         # read existing species into dict
+        profile.stage('Species and Synonyms')
         EBARUtils.displayMessage(messages, 'Reading full list of Species and Synonyms')
         species_dict = EBARUtils.readSpecies(param_geodatabase)
         synonym_dict = EBARUtils.readSynonyms(param_geodatabase)
         synonym_species_dict = EBARUtils.readSynonymSpecies(param_geodatabase)
 
         # read existing unique IDs into dict
+        profile.stage('Existing Unique IDs')
         EBARUtils.displayMessage(messages, 'Reading existing Unique IDs for the Dataset Source')
         id_dict = EBARUtils.readDatasetSourceUniqueIDs(param_geodatabase, table_name_prefix, dataset_source_id, 'Point',
                                                        False)
@@ -128,6 +137,7 @@ class ImportTabularDataTool:
         reader = csv.DictReader(infile)
 
         # process all file lines
+        profile.stage('File Lines')
         EBARUtils.displayMessage(messages, 'Processing file lines')
         count = 0
         no_species_match = 0
@@ -145,6 +155,8 @@ class ImportTabularDataTool:
         bad_bbcs_list = []
         bad_date = 0
         #partial_date = 0
+        changed_object_ids = []
+        deleted_ids = []
         try:
             for file_line in reader:
                 # check/add point for current line
@@ -184,6 +196,20 @@ class ImportTabularDataTool:
                     bad_bbc += 1
                 if status in ('new', 'updated') and not max_date:
                     bad_date += 1
+                if status in ('new', 'updated'):
+                    changed_object_ids.append(object_id)
+                elif status == 'deleted':
+                    deleted_ids.append(object_id)
+
+            # keep input/ecoshape associations current for range maps
+            if EBARUtils.checkInputEcoshapeTable(param_geodatabase):
+                profile.stage('Input Ecoshapes')
+                EBARUtils.displayMessage(messages, 'Associating imported points with Ecoshapes')
+                EBARUtils.deleteInputEcoshapes(param_geodatabase, 'InputPoint', deleted_ids)
+                changed_ids = EBARUtils.getUniqueIDs(param_geodatabase + '/InputPoint', 'InputPointID',
+                                                     changed_object_ids)
+                EBARUtils.updateInputEcoshapes(param_geodatabase, 'InputPoint', input_ids=changed_ids.values(),
+                                               messages=messages)
         except:
             # output error messages in exception so that summary of processing thus far gets displayed in finally
             EBARUtils.displayMessage(messages, '\nERROR processing file row ' + str(count + 1))
@@ -199,6 +225,7 @@ class ImportTabularDataTool:
 
         finally:
             # summary and end time
+            profile.addRows(count)
             EBARUtils.displayMessage(messages, 'Summary:')
             EBARUtils.displayMessage(messages, 'Processed - ' + str(count))
             EBARUtils.displayMessage(messages, 'Species not matched (rejected) - ' + str(no_species_match))
@@ -0,0 +1,124 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: PresenceRules.py
+# Rules that turn inputs overlapping ecoshapes into Presence and UsageType (see docs/PresenceRules.xlsx),
+# applied to whole columns at once with NumPy and without arcpy
+
+# Notes:
+# - Inputs are parallel sequences (one element per input/ecoshape overlap); dates may be datetime/None or numpy
+#   datetime64 (NaT for missing)
+# - Results are per unique EcoshapeID, sorted ascending
+# - tests/test_PresenceRules.py checks the rules against the cases in docs/PresenceRules.xlsx
+
+
+import datetime
+import numpy as np
+
+
+# number of years beyond which Presence gets set to Historical
+age_for_historical = 40
+
+# dataset types by their effect on Presence
+present_if_recent_types = ['Element Occurrences', 'Source Features', 'Species Observations', 'Range']
+present_types = ['Critical Habitat']
+presence_expected_types = ['Habitat Suitability', 'Range Estimate']
+
+# EO ranks that make an input Historical regardless of date; any other non-blank rank makes it current
+historical_eo_ranks = ['H', 'H?', 'X', 'X?']
+blank_eo_ranks = ['', ' ']
+
+# breeding LocUseClass values
+breeding_land_use_classes = ['breeding',
+                             'maternity colony',
+                             'roost',
+                             'nesting area',
+                             'calving area',
+                             'nursery area']
+
+# codes, in priority order (higher wins within an ecoshape)
+presence_codes = np.array(['H', 'X', 'P'])
+usage_type_codes = np.array([None, 'P', 'B'], dtype=object)
+
+
+def _dates(dates):
+    """dates as datetime64[s] array (NaT for missing)"""
+    return np.asarray(dates, dtype='datetime64[s]')
+
+
+def _years(dates):
+    """calendar years of dates as float array (nan for missing)"""
+    dates = _dates(dates)
+    years = dates.astype('datetime64[Y]').astype(np.int64).astype(float) + 1970
+    years[np.isnat(dates)] = np.nan
+    return years
+
+
+def _groupMax(ecoshape_ids, ranks):
+    """unique ecoshape IDs and the highest rank of each"""
+    unique_ids, inverse = np.unique(np.asarray(ecoshape_ids), return_inverse=True)
+    group_ranks = np.zeros(len(unique_ids), dtype=np.int64)
+    np.maximum.at(group_ranks, inverse, ranks)
+    return unique_ids, group_ranks
+
+
+def fakeEORankDates(max_dates, eo_ranks, now=None):
+    """dates used to determine historical: EO ranks, when available, override MaxDate by faking it 1000 years into
+    the past (historical ranks) or future (other non-blank ranks)"""
+    now = now or datetime.datetime.now()
+    temp_dates = _dates(max_dates).copy()
+    eo_ranks = np.asarray(eo_ranks, dtype=object)
+    historical = np.isin(eo_ranks, historical_eo_ranks)
+    current = ~historical & ~np.isin(eo_ranks, blank_eo_ranks) & np.not_equal(eo_ranks, None)
+    temp_dates[historical] = np.datetime64(datetime.datetime(now.year - 1000, 1, 1), 's')
+    temp_dates[current] = np.datetime64(datetime.datetime(now.year + 1000, 1, 1), 's')
+    return temp_dates
+
+
+def classifyPresence(ecoshape_ids, dataset_types, max_dates, now=None):
+    """Presence (H, X or P) per ecoshape from the dataset type and (EO rank adjusted) max date of each overlapping
+    input; returns (unique ecoshape IDs, presence codes)"""
+    now = now or datetime.datetime.now()
+    dataset_types = np.asarray(dataset_types, dtype=object)
+    years = _years(max_dates)
+    dated = ~np.isnan(years)
+    recent = np.zeros(len(years), dtype=bool)
+    recent[dated] = (now.year - years[dated]) <= age_for_historical
+    # start at "lowest" level, then "upgrades"
+    ranks = np.zeros(len(dataset_types), dtype=np.int64)
+    ranks[np.isin(dataset_types, presence_expected_types)] = 1
+    present = dated & (np.isin(dataset_types, present_types) |
+                       (np.isin(dataset_types, present_if_recent_types) & recent))
+    ranks[present] = 2
+    unique_ids, group_ranks = _groupMax(ecoshape_ids, ranks)
+    return unique_ids, presence_codes[group_ranks]
+
+
+def classifyUsageType(ecoshape_ids, bbcs, loc_use_classes, bbc_domain_values):
+    """UsageType (B, P or None) per ecoshape from BreedingAndBehaviourCodes (via their domain descriptions) and
+    LocUseClasses of overlapping inputs; returns (unique ecoshape IDs, usage type codes)"""
+    bbc_domain_values_lower = {}
+    for bbc_domain_value in bbc_domain_values:
+        bbc_domain_values_lower[bbc_domain_value.lower()] = bbc_domain_values[bbc_domain_value]
+    # classify each distinct code/class once
+    bbc_ranks = {}
+    for bbc in set(bbcs):
+        rank = 0
+        if bbc:
+            description = bbc_domain_values_lower.get(bbc.lower(), '')
+            if 'Confirmed' in description:
+                rank = 2
+            elif 'Probable' in description or 'Possible' in description:
+                rank = 1
+        bbc_ranks[bbc] = rank
+    luc_ranks = {}
+    for luc in set(loc_use_classes):
+        luc_ranks[luc] = 2 if luc and luc.lower() in breeding_land_use_classes else 0
+    # any BBC confirmation or relevant LUC in ecoshape prevails
+    ranks = np.maximum(np.array([bbc_ranks[bbc] for bbc in bbcs], dtype=np.int64),
+                       np.array([luc_ranks[luc] for luc in loc_use_classes], dtype=np.int64))
+    unique_ids, group_ranks = _groupMax(ecoshape_ids, ranks)
+    return unique_ids, usage_type_codes[group_ranks]
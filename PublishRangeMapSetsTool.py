@@ -71,6 +71,11 @@ class PublishRangeMapSetsTool:
                             '.pdf')
 
     def runPublishRangeMapSetsTool(self, parameters, messages):
+        # with per stage timings written to a JSON run profile
+        with EBARUtils.RunProfile('PublishRangeMapSets', messages) as profile:
+            return self.publishRangeMapSets(parameters, messages, profile)
+
+    def publishRangeMapSets(self, parameters, messages, profile):
         # start time
         start_time = datetime.datetime.now()
         EBARUtils.displayMessage(messages, 'Start time: ' + str(start_time))
@@ -79,6 +84,7 @@ class PublishRangeMapSetsTool:
         #arcpy.gp.overwriteOutput = True
 
         # make variables for parms
+        profile.stage('Parameters')
         EBARUtils.displayMessage(messages, 'Processing parameters')
         param_category = parameters[0].valueAsText
         if param_category:
@@ -88,6 +94,7 @@ class PublishRangeMapSetsTool:
             EBARUtils.displayMessage(messages, 'Taxa Group: ' + param_taxagroup)
 
         # generate metadata
+        profile.stage('Metadata')
         EBARUtils.displayMessage(messages, 'Generating metadata')
         md = arcpy.metadata.Metadata()
         md.tags = 'Species Range, NatureServe Canada, Ecosystem-based Automated Range'
@@ -137,8 +144,9 @@ class PublishRangeMapSetsTool:
                 # new category_taxagroup
                 if category_taxagroup != '':
                     # previous category_taxagroup
-                    self.processCategoryTaxaGroup(messages, category_taxagroup, range_map_ids, attributes_dict,
-                                                  zip_folder, md, only_deficient_partial)
+                    with profile.block('Zips ' + category_taxagroup, len(range_map_ids)):
+                        self.processCategoryTaxaGroup(messages, category_taxagroup, range_map_ids, attributes_dict,
+                                                      zip_folder, md, only_deficient_partial)
                 # if all range maps in group have no spatial data then exclude spatial download
                 only_deficient_partial = True
                 processed += 1
@@ -147,6 +155,7 @@ class PublishRangeMapSetsTool:
 
                 # make zip folder
                 category_taxagroup = row[0] + ' - ' + row[1]
+                profile.stage('Range Maps ' + category_taxagroup)
                 EBARUtils.displayMessage(messages, 'Category - Taxa Group: ' + category_taxagroup)
                 zip_folder = EBARUtils.temp_folder + '/EBAR - ' + category_taxagroup
                 EBARUtils.createReplaceFolder(zip_folder)
@@ -158,6 +167,7 @@ class PublishRangeMapSetsTool:
 
             # copy pdf
             EBARUtils.displayMessage(messages, 'Range Map ID: ' + str(row[8]))
+            profile.addRows(1)
             element_global_id = str(row[5])
             if row[7] == 'N':
                 element_global_id += 'N'
@@ -183,6 +193,7 @@ class PublishRangeMapSetsTool:
 
         if row:
             # final category_taxagroup
+            profile.stage('Zips ' + category_taxagroup, len(range_map_ids))
             self.processCategoryTaxaGroup(messages, category_taxagroup, range_map_ids, attributes_dict, zip_folder, md,
                                           only_deficient_partial)
 
@@ -26,6 +26,11 @@ class PublishRangeMapTool:
         pass
 
     def runPublishRangeMapTool(self, parameters, messages):
+        # with per stage timings written to a JSON run profile
+        with EBARUtils.RunProfile('PublishRangeMap', messages) as profile:
+            return self.publishRangeMap(parameters, messages, profile)
+
+    def publishRangeMap(self, parameters, messages, profile):
         # start time
         start_time = datetime.datetime.now()
         EBARUtils.displayMessage(messages, 'Start time: ' + str(start_time))
@@ -40,6 +45,7 @@ class PublishRangeMapTool:
         #    '%21447909&authkey=AGzKOrgGlB1SHSE'
 
         # make variables for parms
+        profile.stage('Parameters')
         EBARUtils.displayMessage(messages, 'Processing parameters')
         param_range_map_id = parameters[0].valueAsText
         EBARUtils.displayMessage(messages, 'Range Map ID: ' + param_range_map_id)
@@ -47,6 +53,7 @@ class PublishRangeMapTool:
         EBARUtils.displayMessage(messages, 'Include Spatial: ' + param_spatial)
 
         # replace metadata html tags with real data
+        profile.stage('Metadata Templates')
         EBARUtils.displayMessage(messages, 'Filling metadata templates')
         pdf_template_en = open(pdf_template_file_en)
         pdf_html_en = pdf_template_en.read()
@@ -82,6 +89,7 @@ class PublishRangeMapTool:
                                           '/credits_header_fr.png')
 
         # get species_id
+        profile.stage('Species')
         EBARUtils.displayMessage(messages, 'Getting SpeciesID from database')
         species_id = None
         arcpy.MakeTableView_management(EBARUtils.ebar_feature_service + '/11', 'range_map_view',
@@ -110,6 +118,7 @@ class PublishRangeMapTool:
         pdf_html_fr = pdf_html_fr.replace('[Species.Endemism_Type]', endemism_type)
 
         # get biotics data from database
+        profile.stage('Biotics')
         EBARUtils.displayMessage(messages, 'Getting Biotics data from database')
         arcpy.MakeTableView_management(EBARUtils.ebar_feature_service + '/4', 'biotics_view',
                                        'SpeciesID = ' + str(species_id))
@@ -177,6 +186,7 @@ class PublishRangeMapTool:
             del row
 
         # get input citations
+        profile.stage('Input Citations')
         EBARUtils.displayMessage(messages, 'Getting Input Citations from database')
         input_references = ''
         previous_dataset_source_name = ''
@@ -229,6 +239,7 @@ class PublishRangeMapTool:
         pdf_html_fr = pdf_html_fr.replace('[InputReferences]', input_references)
 
         # get range map data from database
+        profile.stage('Range Map')
         EBARUtils.displayMessage(messages, 'Getting RangeMap data from database')
         range_map_scope = None
         differentiate_usage_type = False
@@ -279,6 +290,7 @@ class PublishRangeMapTool:
         del cursor
 
         # get taxon attributes
+        profile.stage('Taxon Attributes')
         EBARUtils.displayMessage(messages, 'Getting taxon attributes')
         attributes = EBARUtils.getTaxonAttributes(global_unique_id, element_global_id, param_range_map_id, messages)
 
@@ -318,6 +330,7 @@ class PublishRangeMapTool:
         pdf_html_fr = pdf_html_fr.replace('[NSE.esaStatus]', attributes['esa_status'])
 
         # generate jpg and insert into pdf template
+        profile.stage('JPG Maps')
         EBARUtils.displayMessage(messages, 'Generating JPG maps')
         for suffix in ('_en', '_fr'):
             if suffix == '_fr':
@@ -358,6 +371,7 @@ class PublishRangeMapTool:
                                               suffix + '.jpg')
 
         # generate pdf
+        profile.stage('PDFs')
         EBARUtils.displayMessage(messages, 'Generating PDFs')
         pdf_options = {
             'quiet': '',
@@ -380,6 +394,7 @@ class PublishRangeMapTool:
         if param_spatial == 'true':
             # generate metadata
             for suffix in ('_en', '_fr'):
+                profile.stage('Spatial Zip ' + suffix)
                 EBARUtils.displayMessage(messages, 'Generating zip for ' + suffix)
                 EBARUtils.displayMessage(messages, 'Generating metadata')
                 md = arcpy.metadata.Metadata()
@@ -471,6 +486,7 @@ class PublishRangeMapTool:
                                     EBARUtils.download_folder + '/EBAR' + element_global_id + suffix + '.zip', None)
 
         # set publish date
+        profile.stage('Publish Date')
         with arcpy.da.UpdateCursor('range_map_view', ['PublishDate']) as update_cursor:
             for update_row in EBARUtils.updateCursor(update_cursor):
                 update_cursor.updateRow([datetime.datetime.now()])
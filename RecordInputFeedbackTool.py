@@ -111,6 +111,9 @@ class RecordInputFeedbackTool:
                 insert_cursor.insertRow([id_value, param_notes, param_exclude_from_range_map_id,
                                          exclude_from_all_range_maps, param_justification])
         del insert_cursor
+        if exclude_from_all_range_maps:
+            # no longer associated with ecoshapes (until the feedback is deleted)
+            EBARUtils.deleteInputEcoshapes(param_geodatabase, id_field[:-2], id_values)
 
         # end time
         end_time = datetime.datetime.now()
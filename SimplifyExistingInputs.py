@@ -1,8 +1,9 @@
 # encoding: utf-8
-# simplify polygons in batches
+# simplify point-derived polygons by accuracy class, in partitions across worker processes (see SimplifyInputs.py)
 
 import arcpy
 import datetime
+import SimplifyInputs
 
 
 # controlling process
@@ -18,48 +19,17 @@ if __name__ == '__main__':
     output_gdb = folder + output_name
     min_objectid = 0
     max_objectid = 10000
-    batch_size = 10000
-    min_accuracy = 1
-    max_accuracy = 5
-    tolerance = '0.1'
+    processes = 4
 
     # create output gdb
     if not arcpy.Exists(output_gdb):
         arcpy.CreateFileGDB_management(folder, output_name)
 
-    # layer to allow selections
-    arcpy.MakeFeatureLayer_management(input_gdb + input_fc, 'rmi_lyr')
-    current_min = min_objectid
-    # batch loop
     print(datetime.datetime.now())
-    while current_min < max_objectid:
-        print(current_min)
-        # selection for current batch
-        arcpy.SelectLayerByAttribute_management('rmi_lyr', 'NEW_SELECTION',
-                                                'objectid >= ' + str(current_min) +
-                                                ' AND objectid < ' + str(current_min + batch_size) +
-                                                ' AND Accuracy >= ' + str(min_accuracy) +
-                                                ' AND Accuracy < ' + str(max_accuracy) +
-                                                " AND OriginalGeometryType = 'P'")
-        # default to 10 meter accuracy (1 meter toloerance) if not provided
-        if tolerance == '1 meters':
-            arcpy.SelectLayerByAttribute_management('rmi_lyr', 'ADD_TO_SELECTION',
-                                                    'objectid >= ' + str(current_min) +
-                                                    ' AND objectid < ' + str(current_min + batch_size) +
-                                                    ' AND Accuracy IS NULL'
-                                                    " AND OriginalGeometryType = 'P'")
-            arcpy.SelectLayerByAttribute_management('rmi_lyr', 'ADD_TO_SELECTION',
-                                                    'objectid >= ' + str(current_min) +
-                                                    ' AND objectid < ' + str(current_min + batch_size) +
-                                                    ' AND Accuracy <= 0'
-                                                    " AND OriginalGeometryType = 'P'")
-        result = arcpy.GetCount_management('rmi_lyr')
-        print(result[0])
-        if int(result[0]) > 0:
-            arcpy.SimplifyPolygon_cartography('rmi_lyr', output_gdb + '/' + input_fc + str(current_min), 'POINT_REMOVE',
-                                            tolerance, collapsed_point_option='NO_KEEP', error_option='RESOLVE_ERRORS')
-        print(datetime.datetime.now())
-        current_min += batch_size
+    SimplifyInputs.simplifyInputs(input_gdb + input_fc, output_gdb + '/' + input_fc + str(min_objectid), 'Accuracy',
+                                  'objectid >= ' + str(min_objectid) + ' AND objectid < ' + str(max_objectid) +
+                                  " AND OriginalGeometryType = 'P'", processes)
+    print(datetime.datetime.now())
 
     # input = 'C:\GIS\EBAR\EBAR-KBA-Dev.gdb\RangeMapInput'
     # temp = 'C:\GIS\EBAR\EBAR-KBA-Dev.gdb\TempRangeMapInputX'
@@ -0,0 +1,275 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: SimplifyInputs.py
+# Simplify point-derived RangeMapInput polygons by accuracy class, in partitions run in parallel worker processes
+
+# Notes:
+# - Used by GenerateRangeMapTool and SimplifyExistingInputs.py
+# - Output approximately matches the serial path (SimplifyPolygon per tolerance class over objectid batches of
+#   serial_batch_size). SimplifyPolygon only resolves errors between features that come within tolerance of each
+#   other, so each serial batch is split into groups of features with connected extents (grown by the tolerance),
+#   and a group is never split across partitions
+# - Groups are packed, largest first, into partitions of up to partition_vertex_budget vertices; a group over the
+#   budget (e.g. one huge polygon) is a partition on its own, so it no longer holds up the small ones; partitions
+#   never mix serial batches, whose features the serial path kept apart
+# - Optionally (skip_at_target_density), a feature alone in its group is passed through unchanged when it is already
+#   at the target vertex density, i.e. when Geometry.generalize (Douglas-Peucker, as is SimplifyPolygon POINT_REMOVE)
+#   at the tolerance removes nothing; this assumes the two remove the same vertices, which is not verified
+# - Each worker writes to its own file geodatabase under the local scratch folder; the parent merges the results
+# - Small jobs (under parallel_min_vertices) run in process, as starting workers that import arcpy takes seconds
+
+
+import EBARUtils
+import arcpy
+import datetime
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+
+# tolerance (metres) -> (accuracy below, accuracy at or above)
+tolerance_specs = {'100': (100000, 500),
+                   '10': (500, 50),
+                   '1': (50, 5),
+                   '0.1': (5, 1)}
+
+# tolerance used when accuracy is not provided (default to 10 metre accuracy)
+default_tolerance = '1'
+
+# objectid batch size of the serial path, which bounds the features SimplifyPolygon considers together
+serial_batch_size = 10000
+
+# pass features already at the target vertex density through without SimplifyPolygon
+skip_at_target_density = False
+
+# most vertices per partition (unless a single group has more)
+partition_vertex_budget = 250000
+
+# fewest vertices worth starting worker processes for
+parallel_min_vertices = 500000
+
+# default number of worker processes
+simplify_processes = 4
+
+
+def toleranceFor(accuracy):
+    """tolerance class for an accuracy, or None if outside all classes"""
+    if accuracy is None or accuracy <= 0:
+        return default_tolerance
+    for tolerance, (below, at_or_above) in tolerance_specs.items():
+        if at_or_above <= accuracy < below:
+            return tolerance
+    return None
+
+
+def atTargetDensity(shape, tolerance):
+    """True if point removal at tolerance would not remove any vertices"""
+    # cheap check first: densely vertexed shapes (e.g. buffers) always lose vertices
+    if shape.length / shape.pointCount < float(tolerance):
+        return False
+    return shape.generalize(float(tolerance)).pointCount == shape.pointCount
+
+
+def readFeatures(input_fc, accuracy_field, where_clause=None, check_target=False):
+    """oid, tolerance, vertex count, extent and (if check_target) target density check of each feature to simplify"""
+    features = []
+    with arcpy.da.SearchCursor(input_fc, ['OID@', accuracy_field, 'SHAPE@'], where_clause) as cursor:
+        row = None
+        for row in cursor:
+            tolerance = toleranceFor(row[1])
+            if not tolerance or not row[2]:
+                continue
+            extent = row[2].extent
+            features.append({'oid': row[0],
+                             'tolerance': tolerance,
+                             'vertices': row[2].pointCount,
+                             'extent': (extent.XMin, extent.YMin, extent.XMax, extent.YMax),
+                             'at_target': check_target and atTargetDensity(row[2], tolerance)})
+        if row:
+            del row
+    return features
+
+
+def _findRoot(parents, index):
+    """root of index in union-find parents, compressing the path"""
+    root = index
+    while parents[root] != root:
+        root = parents[root]
+    while parents[index] != root:
+        parents[index], index = root, parents[index]
+    return root
+
+
+def groupFeatures(features):
+    """split features into groups SimplifyPolygon could resolve errors between: same serial batch and tolerance
+    class, with extents grown by the tolerance connected"""
+    batches = {}
+    for feature in features:
+        batches.setdefault((feature['oid'] // serial_batch_size, feature['tolerance']), []).append(feature)
+    groups = []
+    for batch_key in sorted(batches):
+        members = sorted(batches[batch_key], key=lambda feature: feature['extent'][0])
+        gap = float(batch_key[1]) * 2
+        parents = list(range(len(members)))
+        # sweep by XMin, comparing with members whose XMax is still within reach
+        active = []
+        for index, member in enumerate(members):
+            xmin, ymin, xmax, ymax = member['extent']
+            active = [other for other in active if members[other]['extent'][2] + gap >= xmin]
+            for other in active:
+                other_extent = members[other]['extent']
+                if other_extent[1] - gap <= ymax and other_extent[3] + gap >= ymin:
+                    parents[_findRoot(parents, other)] = _findRoot(parents, index)
+            active.append(index)
+        batch_groups = {}
+        for index, member in enumerate(members):
+            batch_groups.setdefault(_findRoot(parents, index), []).append(member)
+        for group_members in batch_groups.values():
+            groups.append({'batch': batch_key[0],
+                           'tolerance': batch_key[1],
+                           'oids': [member['oid'] for member in group_members],
+                           'vertices': sum(member['vertices'] for member in group_members),
+                           'skip': len(group_members) == 1 and group_members[0]['at_target']})
+    return groups
+
+
+def buildPartitions(groups):
+    """pack groups (other than skipped ones) into partitions of up to partition_vertex_budget vertices, largest
+    first; groups from different serial batches or tolerance classes never share a partition"""
+    partitions = []
+    batch_groups = {}
+    for group in groups:
+        if not group['skip']:
+            batch_groups.setdefault((group['batch'], group['tolerance']), []).append(group)
+    for batch_key in sorted(batch_groups):
+        partition = None
+        for group in sorted(batch_groups[batch_key], key=lambda group: group['vertices'], reverse=True):
+            if not partition or partition['vertices'] + group['vertices'] > partition_vertex_budget:
+                partition = {'tolerance': batch_key[1], 'oids': [], 'vertices': 0}
+                partitions.append(partition)
+            partition['oids'].extend(group['oids'])
+            partition['vertices'] += group['vertices']
+    partitions.sort(key=lambda partition: partition['vertices'], reverse=True)
+    return partitions
+
+
+def oidWhereClause(input_fc, oids):
+    """where clause selecting oids from input_fc"""
+    oid_field = arcpy.AddFieldDelimiters(input_fc, arcpy.Describe(input_fc).OIDFieldName)
+    return oid_field + ' IN (' + ','.join([str(oid) for oid in sorted(oids)]) + ')'
+
+
+def countVertices(input_fc):
+    """total vertices of features in input_fc"""
+    vertices = 0
+    with arcpy.da.SearchCursor(input_fc, ['SHAPE@']) as cursor:
+        row = None
+        for row in cursor:
+            if row[0]:
+                vertices += row[0].pointCount
+        if row:
+            del row
+    return vertices
+
+
+# output geodatabase of the current worker process
+_worker_gdb = None
+
+
+def _startWorker(run_folder):
+    """worker process: create this worker's output geodatabase"""
+    global _worker_gdb
+    gdb_name = 'Simplify_' + str(os.getpid()) + '.gdb'
+    if not arcpy.Exists(run_folder + '/' + gdb_name):
+        arcpy.CreateFileGDB_management(run_folder, gdb_name)
+    _worker_gdb = run_folder + '/' + gdb_name
+
+
+def _simplifyPartition(job):
+    """worker process: simplify one partition; return (partition number, output, seconds, vertices after)"""
+    input_fc, partition_number, tolerance, where_clause = job
+    start = time.perf_counter()
+    layer = 'simplify_layer_' + str(partition_number)
+    arcpy.MakeFeatureLayer_management(input_fc, layer, where_clause)
+    output = _worker_gdb + '/Partition' + str(partition_number)
+    arcpy.SimplifyPolygon_cartography(layer, output, 'POINT_REMOVE', tolerance, collapsed_point_option='NO_KEEP',
+                                      error_option='RESOLVE_ERRORS')
+    arcpy.Delete_management(layer)
+    return partition_number, output, time.perf_counter() - start, countVertices(output)
+
+
+def _workerContext():
+    """multiprocessing context for workers, started with the environment's python when running within ArcGIS Pro"""
+    context = multiprocessing.get_context('spawn')
+    if os.path.basename(sys.executable).lower() == 'arcgispro.exe':
+        context.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
+    return context
+
+
+def simplifyInputs(input_fc, output_fc, accuracy_field, where_clause=None, processes=None, messages=None,
+                   skip_at_target=None):
+    """simplify features of input_fc (selected by where_clause) into output_fc, with tolerance by accuracy class;
+    return list of per partition stats (empty, with no output_fc created, if there is nothing to simplify)"""
+    processes = processes or simplify_processes
+    if skip_at_target is None:
+        skip_at_target = skip_at_target_density
+    features = readFeatures(input_fc, accuracy_field, where_clause, skip_at_target)
+    groups = groupFeatures(features)
+    partitions = buildPartitions(groups)
+    skipped_oids = [oid for group in groups if group['skip'] for oid in group['oids']]
+    if len(partitions) == 0 and len(skipped_oids) == 0:
+        return []
+    total_vertices = sum(partition['vertices'] for partition in partitions)
+    if total_vertices < parallel_min_vertices:
+        processes = 1
+    processes = min(processes, max(len(partitions), 1))
+    EBARUtils.displayMessage(messages, 'Simplifying ' + str(len(features)) + ' input(s) (' + str(total_vertices) +
+                             ' vertices) in ' + str(len(partitions)) + ' partition(s) across ' + str(processes) +
+                             ' process(es), ' + str(len(skipped_oids)) + ' already at target vertex density')
+
+    run_folder = EBARUtils.scratch_folder + '/' + EBARUtils.tempName('Simplify', datetime.datetime.now()) + '_' + \
+        str(os.getpid())
+    os.makedirs(run_folder, exist_ok=True)
+    try:
+        # the parent's own geodatabase, for in process partitions and skipped inputs
+        _startWorker(run_folder)
+        jobs = [(input_fc, partition_number, partition['tolerance'], oidWhereClause(input_fc, partition['oids']))
+                for partition_number, partition in enumerate(partitions, 1)]
+        if processes > 1:
+            with _workerContext().Pool(processes, _startWorker, (run_folder,)) as pool:
+                results = list(pool.imap_unordered(_simplifyPartition, jobs))
+        else:
+            results = [_simplifyPartition(job) for job in jobs]
+
+        stats = []
+        outputs = []
+        for partition_number, output, seconds, vertices_after in sorted(results):
+            partition = partitions[partition_number - 1]
+            reduction = 0
+            if partition['vertices'] > 0:
+                reduction = round(100 * (1 - vertices_after / partition['vertices']))
+            EBARUtils.displayMessage(messages, 'Partition ' + str(partition_number) + ' (tolerance ' +
+                                     partition['tolerance'] + ', ' + str(len(partition['oids'])) + ' input(s)): ' +
+                                     str(round(seconds, 1)) + 's, ' + str(partition['vertices']) + ' -> ' +
+                                     str(vertices_after) + ' vertices (' + str(reduction) + '% reduction)')
+            stats.append({'Partition': partition_number,
+                          'Tolerance': partition['tolerance'],
+                          'Inputs': len(partition['oids']),
+                          'Seconds': seconds,
+                          'VerticesBefore': partition['vertices'],
+                          'VerticesAfter': vertices_after})
+            outputs.append(output)
+        if len(skipped_oids) > 0:
+            skipped = _worker_gdb + '/Skipped'
+            arcpy.Select_analysis(input_fc, skipped, oidWhereClause(input_fc, skipped_oids))
+            outputs.append(skipped)
+        arcpy.Merge_management(outputs, output_fc)
+    finally:
+        shutil.rmtree(run_folder, ignore_errors=True)
+    return stats
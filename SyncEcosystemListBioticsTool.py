@@ -45,6 +45,7 @@ class SyncEcosystemListBioticsTool:
         updated = 0
         added = 0
         skipped = 0
+        new_ecosystems = []
         # fields that are sync'd whenever changed, overwriting values on update
         regular_fields = ['ELEMENT_NATIONAL_ID',
                           'ELEMENT_GLOBAL_ID',
@@ -157,26 +158,22 @@ class SyncEcosystemListBioticsTool:
                     EBARUtils.displayMessage(messages, msg)
                     skipped += 1
                 else:
-                    with arcpy.da.InsertCursor(param_geodatabase + '/Ecosystem',
-                                               ['ActiveEBAR']) as insert_cursor:
-                        object_id = insert_cursor.insertRow([1])
-                    ecosystem_id = EBARUtils.getUniqueID(param_geodatabase + '/Ecosystem', 'EcosystemID', object_id)
-                    regular_fields.append('EcosystemID')
-                    with arcpy.da.InsertCursor(param_geodatabase + '/BIOTICS_Ecosystem',
-                                               regular_fields) as insert_cursor:
-                        insert_values = []
-                        for field in regular_fields:
-                            if field == 'EcosystemID':
-                                insert_values.append(ecosystem_id)
-                            elif len(file_line[field]) > 0:
-                                insert_values.append(file_line[field])
-                            else:
-                                insert_values.append(None)
-                        insert_cursor.insertRow(insert_values)
-                    regular_fields.remove('EcosystemID')
+                    # Ecosystem and BIOTICS_Ecosystem records added together in chunks at the end
+                    insert_values = []
+                    for field in regular_fields:
+                        if len(file_line[field]) > 0:
+                            insert_values.append(file_line[field])
+                        else:
+                            insert_values.append(None)
+                    new_ecosystems.append(insert_values)
                     added += 1
             count += 1
 
+        # add new Ecosystems with their BIOTICS_Ecosystem records
+        if len(new_ecosystems) > 0:
+            EBARUtils.addRowsWithParents(param_geodatabase + '/Ecosystem', {'ActiveEBAR': 1}, 'EcosystemID',
+                                         param_geodatabase + '/BIOTICS_Ecosystem', regular_fields, new_ecosystems)
+
         # # calculate NSX_URL
         # arcpy.CalculateField_management(param_geodatabase + '/BIOTICS_ECOSYSTEM', 'NSX_URL',
         #                                 "'https://explorer.natureserve.org/Taxon/' + !GLOBAL_UNIQUE_IDENTIFIER!")
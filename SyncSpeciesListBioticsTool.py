@@ -49,6 +49,7 @@ class SyncSpeciesListBioticsTool:
             updated = 0
             added = 0
             skipped = 0
+            new_species = []
             # fields that are sync'd whenever changed, overwriting values on update
             regular_fields = ['ELEMENT_GLOBAL_ID',
                             'ELEMENT_NATIONAL_ID',
@@ -242,32 +243,34 @@ class SyncSpeciesListBioticsTool:
                         EBARUtils.displayMessage(messages, msg)
                         skipped += 1
                     else:
-                        with arcpy.da.InsertCursor(param_geodatabase + '/Species',
-                                                ['ActiveEBAR']) as insert_cursor:
-                            object_id = insert_cursor.insertRow([1])
-                        species_id = EBARUtils.getUniqueID(param_geodatabase + '/Species', 'SpeciesID', object_id)
-                        all_fields.append('SpeciesID')
-                        with arcpy.da.InsertCursor(param_geodatabase + '/BIOTICS_ELEMENT_NATIONAL',
-                                                all_fields + ['NSX_URL']) as insert_cursor:
-                            insert_values = []
-                            for field in all_fields:
-                                if field == 'SpeciesID':
-                                    insert_values.append(species_id)
-                                elif len(file_line[field]) > 0:
-                                    insert_values.append(file_line[field])
-                                else:
-                                    insert_values.append(None)
-                            # calc NSX_URL from GUID
-                            insert_values.append('https://explorer.natureserve.org/Taxon/' +
-                                                file_line['GLOBAL_UNIQUE_IDENTIFIER'])
-                            insert_cursor.insertRow(insert_values)
-                        all_fields.remove('SpeciesID')
+                        # Species and BIOTICS_ELEMENT_NATIONAL records added together in chunks at the end
+                        insert_values = []
+                        for field in all_fields:
+                            if len(file_line[field]) > 0:
+                                insert_values.append(file_line[field])
+                            else:
+                                insert_values.append(None)
+                        # calc NSX_URL from GUID
+                        insert_values.append('https://explorer.natureserve.org/Taxon/' +
+                                            file_line['GLOBAL_UNIQUE_IDENTIFIER'])
+                        new_species.append(insert_values)
                         added += 1
                 count += 1
 
+            # add new Species with their BIOTICS_ELEMENT_NATIONAL records
+            if len(new_species) > 0:
+                EBARUtils.addRowsWithParents(param_geodatabase + '/Species', {'ActiveEBAR': 1}, 'SpeciesID',
+                                             param_geodatabase + '/BIOTICS_ELEMENT_NATIONAL', all_fields + ['NSX_URL'],
+                                             new_species)
+
             # # calculate NSX_URL
             # arcpy.CalculateField_management(param_geodatabase + '/BIOTICS_ELEMENT_NATIONAL', 'NSX_URL',
             #                                 "'https://explorer.natureserve.org/Taxon/' + !GLOBAL_UNIQUE_IDENTIFIER!")
+
+            # refresh names and permissions used for Range Map Inputs
+            EBARUtils.displayMessage(messages, 'Refreshing Range Map Input lookups')
+            EBARUtils.refreshRangeMapInputLookups(param_geodatabase)
+
             # summary and end time
             EBARUtils.displayMessage(messages, 'Summary:')
             EBARUtils.displayMessage(messages, 'Processed - ' + str(count))
@@ -9,7 +9,12 @@
 
 
 import collections
-import arcpy
+try:
+    import arcpy
+except ImportError:
+    # no ArcGIS Pro, so use the in-memory fake
+    import ArcpyFake
+    arcpy = ArcpyFake.install()
 # import math
 # import datetime
 # import os
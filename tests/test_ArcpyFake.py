@@ -0,0 +1,100 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: test_ArcpyFake.py
+# Tests of the in-memory ArcpyFake that the other tests run against, run with pytest
+
+
+import os
+import sys
+import datetime
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ArcpyFake
+try:
+    import arcpy
+except ImportError:
+    arcpy = ArcpyFake.install()
+
+
+pytestmark = pytest.mark.skipif(arcpy is not ArcpyFake, reason='arcpy from ArcGIS Pro in use')
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    ArcpyFake.reset()
+    yield
+    ArcpyFake.reset()
+
+
+def createSpecies():
+    arcpy.createTable('memory/Species', [('SpeciesID', 'LONG'), ('Name', 'TEXT'), ('Added', 'DATE')],
+                      [(1, 'Aa bb', datetime.datetime(2020, 1, 1)),
+                       (2, 'Cc dd', None),
+                       (3, 'Ee ff', datetime.datetime(2024, 6, 1))])
+
+
+def test_install_registers_modules():
+    assert sys.modules['arcpy'] is ArcpyFake
+    assert sys.modules['arcpy.da'].SearchCursor is ArcpyFake.SearchCursor
+    assert sys.modules['arcpy.management'].GetCount is ArcpyFake.GetCount_management
+
+
+def test_tools_not_faked_are_absent():
+    with pytest.raises(AttributeError):
+        arcpy.Buffer_analysis
+    assert not hasattr(arcpy, 'PairwiseIntersect_analysis')
+
+
+@pytest.mark.parametrize('where_clause, expected', [
+    ('SpeciesID IN (1, 3)', [1, 3]),
+    ('SpeciesID NOT IN (1)', [2, 3]),
+    ("LOWER(Name) LIKE 'c%'", [2]),
+    ('Added IS NULL', [2]),
+    ("Added >= date '2021-01-01'", [3]),
+    ('SpeciesID BETWEEN 2 AND 3 AND NOT SpeciesID = 3', [2]),
+    ('SpeciesID = 1 OR Name = \'Ee ff\'', [1, 3])])
+def test_search_cursor_where_clauses(where_clause, expected):
+    createSpecies()
+    with arcpy.da.SearchCursor('memory/Species', ['SpeciesID'], where_clause) as cursor:
+        assert [row[0] for row in cursor] == expected
+
+
+def test_search_cursor_order_by_and_oid_token():
+    createSpecies()
+    with arcpy.da.SearchCursor('memory/Species', ['OID@', 'SpeciesID'],
+                               sql_clause=(None, 'ORDER BY SpeciesID DESC')) as cursor:
+        assert [tuple(row) for row in cursor] == [(3, 3), (2, 2), (1, 1)]
+
+
+def test_insert_cursor_returns_oid_and_checks_length():
+    createSpecies()
+    with arcpy.da.InsertCursor('memory/Species', ['SpeciesID', 'Name']) as cursor:
+        assert cursor.insertRow([4, 'Gg hh']) == 4
+        with pytest.raises(TypeError):
+            cursor.insertRow([5])
+    assert arcpy.GetCount_management('memory/Species')[0] == '4'
+
+
+def test_update_cursor_updates_and_deletes():
+    createSpecies()
+    with arcpy.da.UpdateCursor('memory/Species', ['SpeciesID', 'Name']) as cursor:
+        for row in cursor:
+            if row[0] == 1:
+                cursor.deleteRow()
+            else:
+                cursor.updateRow([row[0], row[1].upper()])
+    with arcpy.da.SearchCursor('memory/Species', ['Name']) as cursor:
+        assert [row[0] for row in cursor] == ['CC DD', 'EE FF']
+
+
+def test_layer_selection_limits_cursors():
+    createSpecies()
+    arcpy.MakeTableView_management('memory/Species', 'species_view', 'SpeciesID > 1')
+    assert arcpy.GetCount_management('species_view')[0] == '2'
+    arcpy.SelectLayerByAttribute_management('species_view', 'NEW_SELECTION', "Name = 'Cc dd'")
+    with arcpy.da.SearchCursor('species_view', ['SpeciesID']) as cursor:
+        assert [row[0] for row in cursor] == [2]
@@ -0,0 +1,226 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: test_EBARUtils.py
+# Tests of EBARUtils functions, run with pytest
+
+# Notes:
+# - Without ArcGIS Pro, runs against the in-memory ArcpyFake
+
+
+import os
+import sys
+import time
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ArcpyFake
+try:
+    import arcpy
+except ImportError:
+    arcpy = ArcpyFake.install()
+import EBARUtils
+
+
+pytestmark = pytest.mark.skipif(arcpy is not ArcpyFake, reason='fixtures need ArcpyFake')
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    ArcpyFake.reset()
+    EBARUtils.clearReferenceCache()
+    EBARUtils._field_names.clear()
+    yield
+    ArcpyFake.reset()
+
+
+def test_append_using_cursor_raises_on_failed_rows():
+    arcpy.createTable('memory/Source', [('Name', 'TEXT'), ('Extra', 'TEXT')], [('a', 'x'), ('b', 'y')])
+    arcpy.createTable('memory/Target', [('Name', 'TEXT')])
+    with pytest.raises(RuntimeError):
+        EBARUtils.appendUsingCursor('memory/Source', 'memory/Target')
+
+
+def test_append_using_cursor_removes_rows_written_before_failure():
+    arcpy.createTable('memory/Source', [('Count', 'TEXT')], [('1',), ('x',), ('2',)])
+    arcpy.createTable('memory/Target', [('Count', 'LONG')])
+    with pytest.raises(RuntimeError):
+        EBARUtils.appendUsingCursor('memory/Source', 'memory/Target')
+    assert arcpy.GetCount_management('memory/Target')[0] == '0'
+
+
+def test_append_using_cursor_copies_rows():
+    arcpy.createTable('memory/Source', [('Name', 'TEXT')], [('a',), ('b',)])
+    arcpy.createTable('memory/Target', [('Name', 'TEXT')])
+    assert EBARUtils.appendUsingCursor('memory/Source', 'memory/Target') == 2
+    with arcpy.da.SearchCursor('memory/Target', ['Name']) as cursor:
+        assert sorted(row[0] for row in cursor) == ['a', 'b']
+
+
+def createInputEcoshapeTables():
+    arcpy.createTable('memory/Ecoshape', [('EcoshapeID', 'LONG')], [(1,), (2,)], editor_tracking=True)
+    arcpy.createTable('memory/EcoshapeCoastalBuffer', [('EcoshapeID', 'LONG')], [(1,), (2,)], editor_tracking=True)
+    arcpy.createTable('memory/InputEcoshape', [('InputPointID', 'LONG'), ('EcoshapeID', 'LONG')], [(5, 1)])
+    arcpy.createTable('memory/InputEcoshapeStamp', [('Stamp', 'TEXT')])
+
+
+def test_input_ecoshapes_cleared_when_ecoshapes_change():
+    createInputEcoshapeTables()
+    # rows with no stamp are not trusted, and are cleared
+    assert not EBARUtils.checkInputEcoshapeStamp('memory')
+    assert EBARUtils.validateInputEcoshapes('memory')
+    assert EBARUtils.checkInputEcoshapeStamp('memory')
+    with arcpy.da.SearchCursor('memory/InputEcoshape', ['InputPointID']) as cursor:
+        assert len(list(cursor)) == 0
+    # an ecoshape edit invalidates them again
+    with arcpy.da.InsertCursor('memory/EcoshapeCoastalBuffer', ['EcoshapeID']) as cursor:
+        cursor.insertRow([3])
+    assert not EBARUtils.checkInputEcoshapeStamp('memory')
+
+
+def test_input_ecoshapes_not_trusted_without_editor_tracking():
+    createInputEcoshapeTables()
+    arcpy.createTable('memory/Ecoshape', [('EcoshapeID', 'LONG')], [(1,), (2,)])
+    assert not EBARUtils.validateInputEcoshapes('memory')
+    assert not EBARUtils.checkInputEcoshapeStamp('memory')
+
+
+def test_related_range_maps_need_same_secondary_species():
+    arcpy.createTable('memory/RangeMap', [('RangeMapID', 'LONG'), ('SpeciesID', 'LONG'), ('RangeMapScope', 'TEXT')],
+                      [(1, 10, 'N'), (2, 10, 'N'), (3, 10, 'N'), (4, 10, 'N'), (5, 10, 'G'), (6, 11, 'N')])
+    # 2 matches, 3 has an extra secondary species, 4 is missing one, 5 and 6 differ in scope and species
+    arcpy.createTable('memory/SecondarySpecies', [('RangeMapID', 'LONG'), ('SpeciesID', 'LONG')],
+                      [(1, 20), (1, 21), (2, 20), (2, 21), (3, 20), (3, 21), (3, 22), (4, 20), (5, 20), (5, 21),
+                       (6, 20), (6, 21)])
+    assert EBARUtils.getRelatedRangeMapIDs('memory', 1) == '1,2'
+
+
+def test_add_rows_with_parents():
+    arcpy.createTable('memory/Species', [('SpeciesID', 'LONG'), ('ActiveEBAR', 'SHORT')],
+                      unique_id_field='SpeciesID')
+    arcpy.createTable('memory/BIOTICS_ELEMENT_NATIONAL', [('NAME', 'TEXT'), ('SpeciesID', 'LONG')])
+    assert EBARUtils.addRowsWithParents('memory/Species', {'ActiveEBAR': 1}, 'SpeciesID',
+                                        'memory/BIOTICS_ELEMENT_NATIONAL', ['NAME'], [['a'], ['b'], ['c']],
+                                        chunk_size=2) == 3
+    with arcpy.da.SearchCursor('memory/BIOTICS_ELEMENT_NATIONAL', ['NAME', 'SpeciesID']) as cursor:
+        assert sorted(cursor) == [('a', 1), ('b', 2), ('c', 3)]
+
+
+def test_add_rows_with_parents_removes_chunk_on_failure():
+    arcpy.createTable('memory/Species', [('SpeciesID', 'LONG'), ('ActiveEBAR', 'SHORT')],
+                      unique_id_field='SpeciesID')
+    arcpy.createTable('memory/BIOTICS_ELEMENT_NATIONAL', [('NAME', 'TEXT'), ('SpeciesID', 'LONG')])
+    # second row of second chunk is malformed
+    with pytest.raises(TypeError):
+        EBARUtils.addRowsWithParents('memory/Species', {'ActiveEBAR': 1}, 'SpeciesID',
+                                     'memory/BIOTICS_ELEMENT_NATIONAL', ['NAME'], [['a'], ['b'], ['c'], ['d', 'x']],
+                                     chunk_size=2)
+    with arcpy.da.SearchCursor('memory/Species', ['SpeciesID']) as cursor:
+        assert sorted(row[0] for row in cursor) == [1, 2]
+    with arcpy.da.SearchCursor('memory/BIOTICS_ELEMENT_NATIONAL', ['SpeciesID']) as cursor:
+        assert sorted(row[0] for row in cursor) == [1, 2]
+
+
+def test_remove_excluded_above_list_limit():
+    arcpy.createTable('memory/InputPoint', [('InputPointID', 'LONG')], [(i,) for i in range(1, 3001)])
+    arcpy.MakeTableView_management('memory/InputPoint', 'input_layer')
+    arcpy.SelectLayerByAttribute_management('input_layer', 'NEW_SELECTION', 'InputPointID <= 2500')
+    excluded_ids = set(range(2, 2601, 2))
+    assert len(excluded_ids) > EBARUtils.exclusion_list_max_ids
+    EBARUtils.removeExcluded('input_layer', 'InputPoint', excluded_ids, '')
+    with arcpy.da.SearchCursor('input_layer', ['InputPointID']) as cursor:
+        assert sorted(row[0] for row in cursor) == list(range(1, 2501, 2))
+
+
+def test_resolve_field_names_ambiguous_and_qualified():
+    arcpy.createTable('memory/TempJoined', [ArcpyFake.Field('ebarkba.sde.InputDataset.DatasetType', 'TEXT'),
+                                            ArcpyFake.Field('ebarkba.sde.DatasetSource.DatasetType', 'TEXT'),
+                                            ArcpyFake.Field('MAX_TempDate', 'DATE')])
+    assert EBARUtils.resolveFieldNames('memory/TempJoined', ['MAX_TempDate'])['MAX_TempDate'] == 'MAX_TempDate'
+    with pytest.raises(ValueError, match='ambiguous'):
+        EBARUtils.resolveFieldNames('memory/TempJoined', ['DatasetType'])
+    assert EBARUtils.resolveFieldNames('memory/TempJoined', ['DatasetSource.DatasetType']) == \
+        {'DatasetSource.DatasetType': 'ebarkba.sde.DatasetSource.DatasetType'}
+
+
+def createFingerprintTables():
+    for input_features in ['InputPoint', 'InputLine', 'InputPolygon']:
+        arcpy.createTable('memory/' + input_features, [(input_features + 'ID', 'LONG'), ('SpeciesID', 'LONG'),
+                                                       ('InputDatasetID', 'LONG')],
+                          [(1, 5, 10), (2, 6, 11)], editor_tracking=True)
+    arcpy.createTable('memory/InputFeedback', [('InputPointID', 'LONG'), ('InputLineID', 'LONG'),
+                                               ('InputPolygonID', 'LONG')])
+    arcpy.createTable('memory/InputDataset', [('InputDatasetID', 'LONG'), ('DatasetSourceID', 'LONG'),
+                                              ('DatasetName', 'TEXT')], [(10, 100, 'a'), (11, 101, 'b')])
+    arcpy.createTable('memory/DatasetSource', [('DatasetSourceID', 'LONG'), ('DatasetType', 'TEXT')],
+                      [(100, 'x'), (101, 'y')])
+    arcpy.createTable('memory/BIOTICS_ELEMENT_NATIONAL', [('SpeciesID', 'LONG')], [(5,)])
+    arcpy.createTable('memory/Synonym', [('SpeciesID', 'LONG')])
+    arcpy.createTable('memory/ESTH', [('SpeciesID', 'LONG')])
+    for ecoshape_table in ['Ecoshape', 'EcoshapeCoastalBuffer']:
+        arcpy.createTable('memory/' + ecoshape_table, [('EcoshapeID', 'LONG')], [(1,)], editor_tracking=True)
+
+
+def updateValue(table, field, where_clause, value):
+    with arcpy.da.UpdateCursor(table, [field], where_clause) as cursor:
+        for row in cursor:
+            cursor.updateRow([value])
+
+
+def test_input_fingerprint_covers_only_related_datasets_and_sources():
+    createFingerprintTables()
+    fingerprint = EBARUtils.computeInputFingerprint('memory', None, '5', None, ['a'])
+    # datasets and sources of another species' inputs don't matter
+    updateValue('memory/InputDataset', 'DatasetName', 'InputDatasetID = 11', 'c')
+    updateValue('memory/DatasetSource', 'DatasetType', 'DatasetSourceID = 101', 'z')
+    assert EBARUtils.computeInputFingerprint('memory', None, '5', None, ['a']) == fingerprint
+    # those of the species' inputs do, as do settings
+    assert EBARUtils.computeInputFingerprint('memory', None, '5', None, ['b']) != fingerprint
+    updateValue('memory/DatasetSource', 'DatasetType', 'DatasetSourceID = 100', 'z')
+    assert EBARUtils.computeInputFingerprint('memory', None, '5', None, ['a']) != fingerprint
+
+
+def test_reference_lookups_without_editor_tracking_cached_for_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(EBARUtils, 'profile_folder', str(tmp_path))
+    arcpy.createTable('memory/Synonym', [('SynonymID', 'LONG'), ('SynonymName', 'TEXT'), ('SpeciesID', 'LONG')],
+                      [(1, 'Aa bb', 5)])
+
+    def addSynonym(synonym_id, synonym_name):
+        with arcpy.da.InsertCursor('memory/Synonym', ['SynonymID', 'SynonymName', 'SpeciesID']) as cursor:
+            cursor.insertRow([synonym_id, synonym_name, 6])
+
+    # outside a run, read every time
+    assert EBARUtils.readSynonyms('memory') == {'aa bb': 1}
+    addSynonym(2, 'Cc dd')
+    assert EBARUtils.readSynonyms('memory') == {'aa bb': 1, 'cc dd': 2}
+    # within a run, read once
+    with EBARUtils.RunProfile('Test', print_stages=False):
+        assert EBARUtils.readSynonyms('memory') == {'aa bb': 1, 'cc dd': 2}
+        addSynonym(3, 'Ee ff')
+        assert EBARUtils.readSynonyms('memory') == {'aa bb': 1, 'cc dd': 2}
+    # next run reads afresh
+    with EBARUtils.RunProfile('Test', print_stages=False):
+        assert EBARUtils.readSynonyms('memory') == {'aa bb': 1, 'cc dd': 2, 'ee ff': 3}
+
+
+def test_input_fingerprint_covers_esth():
+    createFingerprintTables()
+    fingerprint = EBARUtils.computeInputFingerprint('memory', None, '5', None, ['a'])
+    with arcpy.da.InsertCursor('memory/ESTH', ['SpeciesID']) as cursor:
+        cursor.insertRow([5])
+    assert EBARUtils.computeInputFingerprint('memory', None, '5', None, ['a']) != fingerprint
+
+
+def test_buffer_store_takes_over_stale_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(EBARUtils, 'buffer_cache_folder', str(tmp_path))
+    lock_file = tmp_path / (EBARUtils._bufferCacheName('InputPoint', [5], 'abc') + '.lock')
+    lock_file.write_text(str(os.getpid()))
+    assert not EBARUtils._staleLock(str(lock_file), EBARUtils.buffer_cache_lock_seconds)
+    # a lock left by a killed process ages out
+    stale_time = time.time() - EBARUtils.buffer_cache_lock_seconds - 1
+    os.utime(lock_file, (stale_time, stale_time))
+    assert EBARUtils._staleLock(str(lock_file), EBARUtils.buffer_cache_lock_seconds)
+    EBARUtils._storeBuffer('InputPoint', [5], 'abc', 'memory/Buffer')
+    assert not lock_file.exists()
@@ -0,0 +1,35 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: test_GenerateRangeMapBatch.py
+# Tests of GenerateRangeMapBatch functions, run with pytest
+
+# Notes:
+# - Without ArcGIS Pro, runs against the in-memory ArcpyFake
+
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import arcpy
+except ImportError:
+    import ArcpyFake
+    arcpy = ArcpyFake.install()
+import GenerateRangeMapBatch
+
+
+def test_read_jobs_skips_lines_without_required_fields(tmp_path):
+    jobs_file = tmp_path / 'Jobs.csv'
+    jobs_file.write_text('Species,Version,Stage,Scope\n'
+                         'Ardea herodias,1.0,Auto-generated,Canadian\n'
+                         'Branta canadensis,,Auto-generated,\n'
+                         ',1.0,Auto-generated,\n', encoding='utf-8-sig')
+    jobs = GenerateRangeMapBatch.readJobs(str(jobs_file))
+    assert len(jobs) == 1
+    assert jobs[0]['Species'] == 'Ardea herodias'
+    assert jobs[0]['Scope'] == 'Canadian'
+    assert jobs[0]['Secondary'] is None
@@ -0,0 +1,63 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: test_PresenceRules.py
+# Tests of PresenceRules against the cases in docs/PresenceRules.xlsx, run with pytest
+
+
+import os
+import sys
+import datetime
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PresenceRules
+
+
+now = datetime.datetime(2025, 6, 1)
+
+# (dataset type, EO rank, years old, expected presence)
+golden_cases = [('Element Occurrences', 'A', 60, 'P'),
+                ('Element Occurrences', None, 10, 'P'),
+                ('Source Features', None, 40, 'P'),
+                ('Species Observations', None, 5, 'P'),
+                ('Critical Habitat', None, 100, 'P'),
+                ('Range Estimate', None, 5, 'X'),
+                ('Habitat Suitability', None, 100, 'X'),
+                ('Element Occurrences', 'H', 5, 'H'),
+                ('Element Occurrences', 'X?', 5, 'H'),
+                ('Element Occurrences', None, 41, 'H'),
+                ('Element Occurrences', ' ', 50, 'H'),
+                ('Source Features', None, 60, 'H'),
+                ('Species Observations', None, 41, 'H')]
+
+
+def _tempDates(cases):
+    max_dates = [datetime.datetime(now.year - case[2], 1, 1) for case in cases]
+    return PresenceRules.fakeEORankDates(max_dates, [case[1] for case in cases], now)
+
+
+@pytest.mark.parametrize('case', golden_cases, ids=[str(case) for case in golden_cases])
+def test_presence_case(case):
+    unique_ids, presence = PresenceRules.classifyPresence([1], [case[0]], _tempDates([case]), now)
+    assert list(presence) == [case[3]]
+
+
+def test_present_prevails_when_all_cases_overlap_one_ecoshape():
+    unique_ids, presence = PresenceRules.classifyPresence([1] * len(golden_cases),
+                                                          [case[0] for case in golden_cases],
+                                                          _tempDates(golden_cases), now)
+    assert list(presence) == ['P']
+
+
+def test_usage_type():
+    bbc_domain = {'CB': 'Confirmed breeding', 'PR': 'Probable breeding', 'PO': 'Possible breeding',
+                  'OB': 'Observed'}
+    unique_ids, usage_types = PresenceRules.classifyUsageType([1, 1, 2, 2, 3, 4, 5],
+                                                              ['PO', 'CB', 'PR', 'OB', 'ob', None, None],
+                                                              [None, None, None, None, None, 'Nesting Area',
+                                                               'wintering'],
+                                                              bbc_domain)
+    assert list(usage_types) == ['B', 'P', None, 'B', None]
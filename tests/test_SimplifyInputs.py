@@ -0,0 +1,41 @@
+# encoding: utf-8
+
+# Project: Ecosytem-based Automated Range Mapping (EBAR)
+# Credits: Randal Greene, Christine Terwissen
+# © NatureServe Canada 2026 under CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)
+
+# Program: test_SimplifyInputs.py
+# Tests of SimplifyInputs functions, run with pytest
+
+# Notes:
+# - Without ArcGIS Pro, runs against the in-memory ArcpyFake
+
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import arcpy
+except ImportError:
+    import ArcpyFake
+    arcpy = ArcpyFake.install()
+import SimplifyInputs
+
+
+def feature(oid, at_target=False):
+    return {'oid': oid, 'tolerance': '1', 'vertices': 10, 'extent': (0, 0, 10, 10), 'at_target': at_target}
+
+
+def test_groups_follow_serial_batches():
+    # same objectid ranges as SimplifyExistingInputs (objectid >= min AND objectid < max)
+    size = SimplifyInputs.serial_batch_size
+    groups = SimplifyInputs.groupFeatures([feature(1), feature(size - 1), feature(size), feature(2 * size - 1)])
+    assert sorted((group['batch'], sorted(group['oids'])) for group in groups) == \
+        [(0, [1, size - 1]), (1, [size, 2 * size - 1])]
+
+
+def test_only_lone_features_at_target_density_skipped():
+    groups = SimplifyInputs.groupFeatures([feature(1, True), feature(2, True),
+                                           dict(feature(3, True), extent=(100, 100, 110, 110))])
+    assert sorted((sorted(group['oids']), group['skip']) for group in groups) == [([1, 2], False), ([3], True)]
+    assert [partition['oids'] for partition in SimplifyInputs.buildPartitions(groups)] == [[1, 2]]